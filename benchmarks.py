@@ -0,0 +1,215 @@
+""" Benchmarks for the DRMAA2 Python language binding.
+
+    Measures the cost of the API calls against the configured backend (the default)
+    or any backend module, and prints the results as JSON:
+
+        python benchmarks.py [--backend drmaa2.backend.local] [--quick] [--output results.json]
+
+    Jobs are submitted on hold where possible, so that the numbers reflect the binding
+    and not the started processes.
+"""
+
+import sys
+import json
+import time
+import timeit
+import argparse
+import platform
+import subprocess
+import importlib
+import threading
+
+import drmaa2
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+SIZES = {'import': 20, 'submit': 10000, 'bulk': 100000, 'wait': (10, 1000, 100000), 'query': (100, 10000),
+         'notify': 10000, 'struct': 100000}
+QUICK_SIZES = {'import': 3, 'submit': 100, 'bulk': 1000, 'wait': (10, 100), 'query': (10, 100),
+               'notify': 100, 'struct': 1000}
+
+# Template of the submitted jobs
+TEMPLATE = drmaa2.JobTemplate(remote_command='true', job_name='benchmark', submit_as_hold=True)
+
+
+class Benchmark(object):
+    """ Runs the benchmarks against one backend, collecting the results. """
+
+    def __init__(self, backend, sizes):
+        self.backend = backend
+        self.sizes = sizes
+        self.results = []
+
+    def record(self, name, value, unit, **params):
+        self.results.append({'name': name, 'value': value, 'unit': unit, 'params': params})
+
+    def _session(self):
+        return self.backend.create_job_session()
+
+    def _dispose(self, session):
+        name = session.session_name
+        session.close()
+        if name is not None:
+            self.backend.destroy_session(name)
+
+    def _cleanup(self, jobs):
+        for job in jobs:
+            try:
+                job.terminate()
+            except drmaa2.InvalidArgumentException:
+                pass
+
+    def import_time(self):
+        # Fresh interpreters, the startup time of an empty one being subtracted
+        count = self.sizes['import']
+        timings = {}
+        for name, code in (('empty', 'pass'), ('import', 'import drmaa2'),
+                           ('struct', 'import drmaa2; drmaa2.JobTemplate(remote_command="true")')):
+            samples = []
+            for _ in range(count):
+                start = _clock()
+                subprocess.check_call([sys.executable, '-c', code])
+                samples.append(_clock() - start)
+            timings[name] = sorted(samples)[count // 2]
+        self.record('import_time', (timings['import'] - timings['empty']) * 1e3, 'ms')
+        self.record('import_time_with_struct', (timings['struct'] - timings['empty']) * 1e3, 'ms')
+
+    def structs(self):
+        count = self.sizes['struct']
+        for struct, kwargs in ((drmaa2.JobTemplate, {'remote_command': '/bin/true', 'args': ['1']}),
+                               (drmaa2.JobInfo, {'job_id': '1', 'job_state': drmaa2.JobState.RUNNING})):
+            seconds = timeit.timeit(lambda: struct(**kwargs), number=count)
+            self.record('%s_construction' % struct.__name__, seconds / count * 1e9, 'ns/op')
+
+    def run_job(self):
+        count = self.sizes['submit']
+        session = self._session()
+        start = _clock()
+        jobs = [session.run_job(TEMPLATE) for _ in range(count)]
+        seconds = _clock() - start
+        self.record('run_job_throughput', count / seconds, 'jobs/s', jobs=count)
+        self._cleanup(jobs)
+        self._dispose(session)
+
+    def run_bulk_jobs(self):
+        count = self.sizes['bulk']
+        session = self._session()
+        start = _clock()
+        array = session.run_bulk_jobs(TEMPLATE, 1, count, 1)
+        returned = _clock() - start
+        jobs = session.get_jobs()
+        seconds = _clock() - start
+        self.record('run_bulk_jobs_return_latency', returned * 1e3, 'ms', tasks=count)
+        self.record('run_bulk_jobs_throughput', count / seconds, 'tasks/s', tasks=count)
+        if array is not None and array.jobs is not None:
+            array.terminate()
+        del jobs
+        self._dispose(session)
+
+    def wait_any_terminated(self):
+        for count in self.sizes['wait']:
+            session = self._session()
+            jobs = [session.run_job(TEMPLATE) for _ in range(count)]
+            last = jobs[-1]
+            terminated = []
+            # Cost of one call, without any waiting
+            start = _clock()
+            try:
+                session.wait_any_terminated(jobs, drmaa2.ZERO_TIME)
+            except drmaa2.TimeoutException:
+                pass
+            scan = _clock() - start
+            self.record('wait_any_terminated_call_overhead', scan * 1e6, 'us', jobs=count)
+
+            def terminate():
+                # Terminate after the waiting call has registered for all jobs
+                time.sleep(0.05 + 4 * scan)
+                terminated.append(_clock())
+                last.terminate()
+            thread = threading.Thread(target=terminate)
+            thread.start()
+            session.wait_any_terminated(jobs, 10)
+            woken = _clock()
+            thread.join()
+            # Backends not really waiting return before the termination
+            latency = max(0.0, woken - terminated[0])
+            self.record('wait_any_terminated_wakeup_latency', latency * 1e6, 'us', jobs=count)
+            self._cleanup(jobs)
+            self._dispose(session)
+
+    def get_all_jobs(self):
+        for count in self.sizes['query']:
+            session = self._session()
+            jobs = [session.run_job(TEMPLATE) for _ in range(count)]
+            if count > 1:
+                jobs[0].release()
+            monitoring = self.backend.open_monitoring_session()
+            job_filter = drmaa2.JobInfo(job_state=drmaa2.JobState.QUEUED, job_name='benchmark')
+            for name, filter in (('get_all_jobs', None), ('get_all_jobs_filtered', job_filter)):
+                start = _clock()
+                monitoring.get_all_jobs(filter)
+                self.record('%s_latency' % name, (_clock() - start) * 1e3, 'ms', jobs=count)
+            monitoring.close()
+            self._cleanup(jobs)
+            self._dispose(session)
+
+    def notifications(self):
+        count = self.sizes['notify']
+        received = []
+        done = threading.Event()
+
+        def callback(notification):
+            received.append(notification)
+            if len(received) >= count:
+                done.set()
+        session = self._session()
+        jobs = [session.run_job(TEMPLATE) for _ in range(count)]
+        try:
+            self.backend.register_event_notification(callback)
+        except drmaa2.UnsupportedOperationException:
+            self._dispose(session)
+            return
+        try:
+            # Each termination of a held job is one state change
+            start = _clock()
+            self._cleanup(jobs)
+            if done.wait(10):
+                self.record('notification_delivery_rate', count / (_clock() - start), 'events/s', jobs=count)
+        finally:
+            self.backend.register_event_notification(None)
+            self._dispose(session)
+
+    def run(self):
+        for benchmark in (self.import_time, self.structs, self.run_job, self.run_bulk_jobs, self.wait_any_terminated,
+                          self.get_all_jobs, self.notifications):
+            benchmark()
+        return self.results
+
+
+def run(backend=drmaa2, quick=False):
+    """ Runs all benchmarks against the backend module, returning a JSON-compatible dictionary. """
+    results = Benchmark(backend, QUICK_SIZES if quick else SIZES).run()
+    return {'backend': backend.__name__,
+            'drms_name': getattr(backend, 'drms_name', drmaa2.drms_name),
+            'python': platform.python_version(),
+            'timestamp': time.time(),
+            'results': results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--backend', default='drmaa2', help="module offering the DRMAA2 functions")
+    parser.add_argument('--quick', action='store_true', help="use small problem sizes")
+    parser.add_argument('--output', help="file for the JSON results, instead of stdout")
+    args = parser.parse_args(argv)
+    report = run(importlib.import_module(args.backend), args.quick)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
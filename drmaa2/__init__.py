@@ -5,6 +5,7 @@
     For further information, please visit drmaa.org.
 """
 
+import sys
 from enum import Enum
 from collections import namedtuple
 from abc import ABCMeta, abstractmethod
@@ -169,6 +170,7 @@ class JobArray:
         with the same semantic as in the Job object.
     """
     __metaclass__ = ABCMeta
+    __slots__ = ()
 
     job_array_id = None
     jobs = None
@@ -312,6 +314,7 @@ class Job:
         of the job in the DRM system.
     """
     __metaclass__ = ABCMeta
+    __slots__ = ()
 
     job_id = None
     session_name = None
@@ -482,74 +485,7 @@ class MonitoringSession:
 
 from drmaa2.backend import impl
 
-# Implementation-dependent constants
-
-CORE_FILE_SIZE = impl.CORE_FILE_SIZE
-CPU_TIME = impl.CPU_TIME
-DATA_SIZE = impl.DATA_SIZE
-FILE_SIZE = impl.FILE_SIZE
-OPEN_FILES = impl.OPEN_FILES
-STACK_SIZE = impl.STACK_SIZE
-VIRTUAL_MEMORY = impl.VIRTUAL_MEMORY
-WALLCLOCK_TIME = impl.WALLCLOCK_TIME
-
-# Implementation-dependent constants determined at module loading
-
-drms_name = impl.drms_name
-drms_version = impl.drms_version
-drmaa_name = impl.drmaa_name
-drmaa_version = impl.drmaa_version
-job_template_impl_spec = impl.job_template_impl_spec
-job_info_impl_spec = impl.job_info_impl_spec
-reservation_template_impl_spec = impl.reservation_template_impl_spec
-reservation_info_impl_spec = impl.reservation_info_impl_spec
-queue_info_impl_spec = impl.queue_info_impl_spec
-machine_info_impl_spec = impl.machine_info_impl_spec
-notification_impl_spec = impl.notification_impl_spec
-
-# Extensible data structures
-
-# TODO: Distinguish mandatory and optional ones, fetch optional from implementation
-
-Notification = namedtuple('Notification', ['event', 'job_id', 'session_name', 'job_state']
-                          + impl.notification_impl_spec)
-Notification.__new__.__defaults__ = tuple([None]*len(Notification._fields))
-
-JobTemplate = namedtuple('JobTemplate', ['remote_command', 'args', 'submit_as_hold', 'rerunnable',
-                                         'job_environment', 'working_directory', 'job_category',
-                                         'email', 'email_on_started', 'email_on_terminated', 'job_name',
-                                         'input_path', 'output_path', 'error_path', 'join_files',
-                                         'reservation_id', 'queue_name', 'min_slots', 'max_slots',
-                                         'priority', 'candidate_machines', 'min_phys_memory', 'machine_os',
-                                         'machine_arch', 'start_time', 'deadline_time', 'stage_in_files',
-                                         'stage_out_files', 'resource_limits', 'accounting_id']
-                         + impl.job_template_impl_spec)
-JobTemplate.__new__.__defaults__ = tuple([None]*len(JobTemplate._fields))
-
-QueueInfo = namedtuple('QueueInfo', ['name'] + impl.queue_info_impl_spec)
-QueueInfo.__new__.__defaults__ = tuple([None]*len(QueueInfo._fields))
-
-JobInfo = namedtuple('JobInfo', ['job_id', 'job_name', 'exit_status', 'terminating_signal', 'annotation', 'job_state',
-                                 'job_sub_state', 'allocated_machines', 'submission_machine', 'job_owner', 'slots',
-                                 'queue_name', 'wallclock_time', 'cpu_time', 'submission_time', 'dispatch_time',
-                                 'finish_time'] + impl.job_info_impl_spec)
-JobInfo.__new__.__defaults__ = tuple([None]*len(JobInfo._fields))
-
-MachineInfo = namedtuple('MachineInfo', ['name', 'available', 'sockets', 'cores_per_socket', 'threads_per_core',
-                                         'load', 'phys_memory', 'virt_memory', 'machine_os', 'machine_os_version',
-                                         'machine_arch'] + impl.machine_info_impl_spec)
-MachineInfo.__new__.__defaults__ = tuple([None]*len(MachineInfo._fields))
-
-ReservationInfo = namedtuple('ReservationInfo', ['reservation_id', 'reservation_name', 'reserved_start_time',
-                                                 'reserved_end_time', 'users_acl', 'reserved_slots',
-                                                 'reserved_machines'] + impl.reservation_info_impl_spec)
-ReservationInfo.__new__.__defaults__ = tuple([None]*len(ReservationInfo._fields))
-
-ReservationTemplate = namedtuple('ReservationTemplate', ['reservation_name', 'start_time', 'end_time', 'duration',
-                                                         'min_slots', 'max_slots', 'job_category', 'users_acl',
-                                                         'candidate_machines', 'min_phys_memory', 'machine_os',
-                                                         'machine_arch'] + impl.reservation_template_impl_spec)
-ReservationTemplate.__new__.__defaults__ = tuple([None]*len(ReservationTemplate._fields))
+# Implementation-dependent constants and extensible data structures, created by the backend package on first use
 
 SlotInfo = namedtuple('SlotInfo', ['machine_name', 'slots'])
 SlotInfo.__new__.__defaults__ = (None, None)
@@ -558,6 +494,11 @@ Version = namedtuple('Version', ['major', 'minor'])
 Version.__new__.__defaults__ = (None, None)
 
 
+def __getattr__(name):
+    # Called for missing module attributes only, starting with Python 3.7
+    return impl.module_attribute(sys.modules[__name__], name)
+
+
 class DeniedByDrmsException(Exception):
     """ The DRM system rejected the operation due to security issues. """
     pass
@@ -728,3 +669,7 @@ def describe_attribute(instance, name):
         Returns a human-readable description of an attributes purpose in the instance.
     """
     return impl.describe_attribute(instance, name)
+
+
+if sys.version_info < (3, 7):
+    impl.module_attribute(sys.modules[__name__])
@@ -0,0 +1,331 @@
+""" DRMAA2 Python language binding.
+
+    This is the asyncio interface, mirroring the module functions and session classes
+    with coroutines. It requires Python 3.5 or later.
+
+    Blocking backend calls are run in the default executor of the event loop.
+
+    For further information, please visit drmaa.org.
+"""
+
+import asyncio
+import functools
+import threading
+
+import drmaa2
+from drmaa2 import bulk
+from drmaa2 import completion
+
+TERMINATED_STATES = frozenset([drmaa2.JobState.DONE, drmaa2.JobState.FAILED])
+STARTED_STATES = frozenset([drmaa2.JobState.RUNNING, drmaa2.JobState.SUSPENDED]) | TERMINATED_STATES
+
+
+def _get_loop():
+    """ Returns the running event loop, or the event loop set if called outside a coroutine. """
+    try:
+        return asyncio.get_running_loop()
+    except (AttributeError, RuntimeError):
+        return asyncio.get_event_loop()
+
+
+async def _call(function, *args):
+    loop = _get_loop()
+    return await loop.run_in_executor(None, functools.partial(function, *args))
+
+
+async def _wait_any(session, jobs, states, timeout, blocking_wait):
+    """ Waits for the first of the backend jobs to reach one of the states, and returns it.
+        With add_state_callback() of the session, the wait does not occupy a thread of the executor.
+    """
+    add_state_callback = getattr(session, 'add_state_callback', None)
+    if add_state_callback is None:
+        return await _call(blocking_wait, jobs, timeout)
+    if timeout is None or timeout == drmaa2.INFINITE_TIME:
+        timeout = None
+    elif timeout < 0:
+        raise drmaa2.InvalidArgumentException("Invalid timeout %r." % (timeout,))
+    loop = _get_loop()
+    future = loop.create_future()
+    loop_thread = threading.current_thread()
+
+    def resolve(job):
+        if not future.done():
+            future.set_result(job)
+
+    def fired(job):
+        if threading.current_thread() is loop_thread:
+            resolve(job)
+        else:
+            loop.call_soon_threadsafe(resolve, job)
+    cancel = add_state_callback(jobs, states, fired)
+    try:
+        if future.done():
+            return future.result()
+        if timeout == drmaa2.ZERO_TIME:
+            raise drmaa2.TimeoutException("Job state was not reached.")
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise drmaa2.TimeoutException("Timeout of %s seconds expired." % timeout)
+    finally:
+        cancel()
+
+
+class Job(object):
+    """ Coroutine wrapper for a Job object of the backend. """
+
+    def __init__(self, job, session):
+        self.job = job
+        self._session = session
+
+    @property
+    def job_id(self):
+        return self.job.job_id
+
+    @property
+    def session_name(self):
+        return self.job.session_name
+
+    @property
+    def job_template(self):
+        return self.job.job_template
+
+    async def suspend(self):
+        await _call(self.job.suspend)
+
+    async def resume(self):
+        await _call(self.job.resume)
+
+    async def hold(self):
+        await _call(self.job.hold)
+
+    async def release(self):
+        await _call(self.job.release)
+
+    async def terminate(self):
+        await _call(self.job.terminate)
+
+    async def reap(self):
+        await _call(self.job.reap)
+
+    async def get_state(self):
+        return await _call(self.job.get_state)
+
+    async def get_info(self):
+        return await _call(self.job.get_info)
+
+    async def wait_started(self, timeout):
+        await _wait_any(self._session, [self.job], STARTED_STATES, timeout,
+                        lambda jobs, timeout: self.job.wait_started(timeout))
+
+    async def wait_terminated(self, timeout):
+        await _wait_any(self._session, [self.job], TERMINATED_STATES, timeout,
+                        lambda jobs, timeout: self.job.wait_terminated(timeout))
+
+
+class _Jobs(object):
+    """ Sequence of the jobs of a job array, wrapping the backend jobs when they are accessed. """
+
+    def __init__(self, jobs, session):
+        self._jobs = jobs
+        self._session = session
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [Job(job, self._session) for job in self._jobs[index]]
+        return Job(self._jobs[index], self._session)
+
+    def __iter__(self):
+        for job in self._jobs:
+            yield Job(job, self._session)
+
+
+class JobArray(object):
+    """ Coroutine wrapper for a JobArray object of the backend. """
+
+    def __init__(self, job_array, session):
+        self.job_array = job_array
+        self._session = session
+
+    @property
+    def job_array_id(self):
+        return self.job_array.job_array_id
+
+    @property
+    def jobs(self):
+        return _Jobs(self.job_array.jobs, self._session)
+
+    @property
+    def session_name(self):
+        return self.job_array.session_name
+
+    @property
+    def job_template(self):
+        return self.job_array.job_template
+
+    async def suspend(self):
+        await _call(self.job_array.suspend)
+
+    async def resume(self):
+        await _call(self.job_array.resume)
+
+    async def hold(self):
+        await _call(self.job_array.hold)
+
+    async def release(self):
+        await _call(self.job_array.release)
+
+    async def terminate(self):
+        await _call(self.job_array.terminate)
+
+    async def reap(self):
+        await _call(self.job_array.reap)
+
+
+class JobSession(object):
+    """ Coroutine wrapper for a JobSession object of the backend. """
+
+    def __init__(self, session):
+        self.session = session
+
+    @property
+    def contact(self):
+        return self.session.contact
+
+    @property
+    def session_name(self):
+        return self.session.session_name
+
+    @property
+    def job_categories(self):
+        return self.session.job_categories
+
+    async def get_jobs(self, filter=None):
+        jobs = await _call(self.session.get_jobs, filter)
+        return [Job(job, self.session) for job in jobs]
+
+    async def get_job_changes(self, cursor=None):
+        return await _call(self.session.get_job_changes, cursor)
+
+    async def get_job_array(self, job_array_id):
+        return JobArray(await _call(self.session.get_job_array, job_array_id), self.session)
+
+    async def run_job(self, job_template):
+        return Job(await _call(self.session.run_job, job_template), self.session)
+
+    async def run_bulk_jobs(self, job_template, begin_index, end_index, step, max_parallel=None):
+        job_array = await _call(self.session.run_bulk_jobs, job_template, begin_index, end_index, step,
+                                max_parallel)
+        return JobArray(job_array, self.session)
+
+    async def _wait_any(self, jobs, states, timeout, blocking_wait):
+        if not jobs:
+            raise drmaa2.InvalidArgumentException("No jobs to wait for.")
+        wrappers = dict((job.job_id, job) for job in jobs)
+        job = await _wait_any(self.session, [job.job for job in jobs], states, timeout, blocking_wait)
+        return wrappers[job.job_id]
+
+    async def wait_any_started(self, jobs, timeout):
+        return await self._wait_any(jobs, STARTED_STATES, timeout, self.session.wait_any_started)
+
+    async def wait_any_terminated(self, jobs, timeout):
+        return await self._wait_any(jobs, TERMINATED_STATES, timeout, self.session.wait_any_terminated)
+
+    async def wait_all_terminated(self, jobs, timeout):
+        wrappers = dict((job.job_id, job) for job in jobs)
+        done = await _call(completion.wait_all_terminated, self.session, [job.job for job in jobs], timeout)
+        return [wrappers[job.job_id] for job in done]
+
+    async def control_jobs(self, operation, jobs=None, filter=None):
+        if jobs is not None:
+            jobs = [job.job for job in jobs]
+        return await _call(bulk.control_jobs, self.session, operation, jobs, filter)
+
+    async def close(self):
+        await _call(self.session.close)
+
+
+class MonitoringSession(object):
+    """ Coroutine wrapper for a MonitoringSession object of the backend. """
+
+    def __init__(self, session):
+        self.session = session
+
+    async def get_all_reservations(self):
+        return await _call(self.session.get_all_reservations)
+
+    async def get_all_jobs(self, filter=None):
+        return await _call(self.session.get_all_jobs, filter)
+
+    async def get_job_changes(self, cursor=None):
+        return await _call(self.session.get_job_changes, cursor)
+
+    async def get_all_queues(self, names=None):
+        return await _call(self.session.get_all_queues, names)
+
+    async def get_all_machines(self, names=None):
+        return await _call(self.session.get_all_machines, names)
+
+    async def close(self):
+        await _call(self.session.close)
+
+
+class Notifications(object):
+    """ Asynchronous iterator over the Notification events of the DRM system.
+
+        Registers itself as event notification callback of the backend, replacing
+        any previously registered callback. Events arriving while the internal queue
+        is full are dropped and counted in the dropped attribute.
+    """
+
+    def __init__(self, backend=drmaa2, maxsize=0):
+        self._loop = _get_loop()
+        self._queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+        backend.register_event_notification(self._callback)
+
+    def _callback(self, notification):
+        self._loop.call_soon_threadsafe(self._put, notification)
+
+    def _put(self, notification):
+        try:
+            self._queue.put_nowait(notification)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self._queue.get()
+
+
+# Module-level functions, the backend argument being drmaa2 or a backend module
+
+
+async def create_job_session(session_name=None, contact=None, backend=drmaa2):
+    return JobSession(await _call(backend.create_job_session, session_name, contact))
+
+
+async def open_job_session(session_name, backend=drmaa2):
+    return JobSession(await _call(backend.open_job_session, session_name))
+
+
+async def open_monitoring_session(contact=None, backend=drmaa2):
+    return MonitoringSession(await _call(backend.open_monitoring_session, contact))
+
+
+async def destroy_session(session, backend=drmaa2):
+    await _call(backend.destroy_session, session)
+
+
+def notifications(backend=drmaa2, maxsize=0):
+    """ notifications(module, int) -> Notifications
+
+        Returns an asynchronous iterator over the events of the DRM system.
+        Must be called from a coroutine or with the event loop being set.
+    """
+    return Notifications(backend, maxsize)
@@ -2,6 +2,156 @@
 
     This is the implementation part.
 
+    The backend used by the drmaa2 module is named by the DRMAA2_BACKEND environment variable,
+    and is the mock otherwise. Backend names are the built-in ones, names of entry points in the
+    'drmaa2.backends' group, or full module names. Backends are imported on first use,
+    several of them can be used side by side through load().
+
     For further information, please visit drmaa.org.
 """
-from . import mock as impl
+
+import os
+import threading
+from collections import namedtuple
+
+ENVIRONMENT = 'DRMAA2_BACKEND'
+ENTRY_POINT_GROUP = 'drmaa2.backends'
+DEFAULT = 'mock'
+
+# Backends shipped with this package
+BUILTIN = {'mock': 'drmaa2.backend.mock', 'local': 'drmaa2.backend.local'}
+
+# Attributes of the drmaa2 module taken from the default backend
+CONSTANTS = ('CORE_FILE_SIZE', 'CPU_TIME', 'DATA_SIZE', 'FILE_SIZE', 'OPEN_FILES', 'STACK_SIZE', 'VIRTUAL_MEMORY',
+             'WALLCLOCK_TIME', 'drms_name', 'drms_version', 'drmaa_name', 'drmaa_version', 'job_template_impl_spec',
+             'job_info_impl_spec', 'reservation_template_impl_spec', 'reservation_info_impl_spec',
+             'queue_info_impl_spec', 'machine_info_impl_spec', 'notification_impl_spec')
+
+# Extensible data structures of the drmaa2 module, as (name, standard fields, backend attribute
+# with the implementation-specific fields) tuples
+
+# TODO: Distinguish mandatory and optional ones, fetch optional from implementation
+
+STRUCTS = (
+    ('Notification', ['event', 'job_id', 'session_name', 'job_state'], 'notification_impl_spec'),
+    ('JobTemplate', ['remote_command', 'args', 'submit_as_hold', 'rerunnable',
+                     'job_environment', 'working_directory', 'job_category',
+                     'email', 'email_on_started', 'email_on_terminated', 'job_name',
+                     'input_path', 'output_path', 'error_path', 'join_files',
+                     'reservation_id', 'queue_name', 'min_slots', 'max_slots',
+                     'priority', 'candidate_machines', 'min_phys_memory', 'machine_os',
+                     'machine_arch', 'start_time', 'deadline_time', 'stage_in_files',
+                     'stage_out_files', 'resource_limits', 'accounting_id'], 'job_template_impl_spec'),
+    ('QueueInfo', ['name'], 'queue_info_impl_spec'),
+    ('JobInfo', ['job_id', 'job_name', 'exit_status', 'terminating_signal', 'annotation', 'job_state',
+                 'job_sub_state', 'allocated_machines', 'submission_machine', 'job_owner', 'slots',
+                 'queue_name', 'wallclock_time', 'cpu_time', 'submission_time', 'dispatch_time',
+                 'finish_time'], 'job_info_impl_spec'),
+    ('MachineInfo', ['name', 'available', 'sockets', 'cores_per_socket', 'threads_per_core',
+                     'load', 'phys_memory', 'virt_memory', 'machine_os', 'machine_os_version',
+                     'machine_arch'], 'machine_info_impl_spec'),
+    ('ReservationInfo', ['reservation_id', 'reservation_name', 'reserved_start_time',
+                         'reserved_end_time', 'users_acl', 'reserved_slots',
+                         'reserved_machines'], 'reservation_info_impl_spec'),
+    ('ReservationTemplate', ['reservation_name', 'start_time', 'end_time', 'duration',
+                             'min_slots', 'max_slots', 'job_category', 'users_acl',
+                             'candidate_machines', 'min_phys_memory', 'machine_os',
+                             'machine_arch'], 'reservation_template_impl_spec'),
+)
+
+_struct_names = frozenset(struct[0] for struct in STRUCTS)
+
+_lock = threading.RLock()
+_modules = {}
+_entry_points = None
+
+
+def _find_entry_points():
+    """ Returns the entry points of the drmaa2.backends group by name. """
+    try:
+        from importlib import metadata
+    except ImportError:
+        try:
+            import pkg_resources
+        except ImportError:
+            return {}
+        return dict((entry_point.name, entry_point) for entry_point in pkg_resources.iter_entry_points(ENTRY_POINT_GROUP))
+    entry_points = metadata.entry_points()
+    if hasattr(entry_points, 'select'):
+        group = entry_points.select(group=ENTRY_POINT_GROUP)
+    else:
+        group = entry_points.get(ENTRY_POINT_GROUP, ())
+    return dict((entry_point.name, entry_point) for entry_point in group)
+
+
+def entry_points():
+    # Only read when needed, reading the package metadata takes long
+    global _entry_points
+    with _lock:
+        if _entry_points is None:
+            _entry_points = _find_entry_points()
+        return _entry_points
+
+
+def names():
+    """ Returns the names of the built-in and the registered backends. """
+    return sorted(set(BUILTIN) | set(entry_points()))
+
+
+def default_name():
+    return os.environ.get(ENVIRONMENT) or DEFAULT
+
+
+def load(name=None):
+    """ Returns the backend module with the given name, or the default one, importing it if needed. """
+    import importlib
+    if name is None:
+        name = default_name()
+    with _lock:
+        module = _modules.get(name)
+        if module is None:
+            if name in BUILTIN:
+                module = importlib.import_module(BUILTIN[name])
+            elif name in entry_points():
+                module = entry_points()[name].load()
+            else:
+                module = importlib.import_module(name)
+            _modules[name] = module
+        return module
+
+
+class Backend(object):
+    """ Stands in for the default backend module, importing it on the first attribute access. """
+
+    def __init__(self):
+        self.lock = _lock
+        self._module = None
+
+    def module_attribute(self, module, name=None):
+        """ Sets the attributes of the drmaa2 module depending on the default backend, importing it,
+            and returns the named one. Raises AttributeError for names that are none of these attributes.
+        """
+        if name is not None and name not in CONSTANTS and name not in _struct_names:
+            raise AttributeError("module %r has no attribute %r" % (module.__name__, name))
+        with _lock:
+            if 'JobTemplate' not in vars(module):
+                attributes = dict((constant, getattr(self, constant)) for constant in CONSTANTS)
+                for struct_name, fields, impl_spec in STRUCTS:
+                    struct = namedtuple(struct_name, fields + getattr(self, impl_spec))
+                    struct.__new__.__defaults__ = tuple([None]*len(struct._fields))
+                    struct.__module__ = module.__name__
+                    attributes[struct_name] = struct
+                vars(module).update(attributes)
+        return vars(module)[name] if name is not None else None
+
+    def __getattr__(self, name):
+        module = self._module
+        if module is None:
+            with _lock:
+                if self._module is None:
+                    self._module = load()
+                module = self._module
+        return getattr(module, name)
+
+
+impl = Backend()
@@ -0,0 +1,221 @@
+""" DRMAA2 Python language binding.
+
+    Pooled connections to the DRM system by contact string, for usage by backends.
+
+    Backends talking to a DRM system over connections keep one ConnectionPool, and let all their
+    JobSession, ReservationSession and MonitoringSession objects with the same contact borrow
+    connections from it for each request, instead of opening connections per session.
+
+    For further information, please visit drmaa.org.
+"""
+
+import time
+import threading
+
+import drmaa2
+
+
+class PooledConnection(object):
+    """ A backend connection in the pool, with its bookkeeping. Guarded by the pool lock. """
+    __slots__ = ('contact', 'connection', 'in_flight', 'last_used', 'last_checked')
+
+    def __init__(self, contact, connection, now):
+        self.contact = contact
+        self.connection = connection
+        self.in_flight = 0
+        self.last_used = now
+        self.last_checked = now
+
+
+class ConnectionPool(object):
+    """ At most max_connections connections per contact string, shared by all sessions for this contact.
+
+        connect(contact) opens a connection, close(connection) closes it, both being called without
+        the pool lock. Up to max_pipelined requests use one connection at the same time, new connections
+        are only opened when all existing ones are that busy. Requests wait for a connection when the
+        limit is reached, or raise TryLaterException after their timeout.
+        Connections unused for idle_timeout seconds are closed on the next pool access. Connections unused
+        for check_interval seconds are checked with health_check(connection) before being handed out,
+        and replaced if the check fails.
+    """
+
+    def __init__(self, connect, close=None, max_connections=4, max_pipelined=1, idle_timeout=60.0,
+                 health_check=None, check_interval=30.0, clock=time.time):
+        if max_connections < 1 or max_pipelined < 1:
+            raise drmaa2.InvalidArgumentException("Connection and pipeline limits must be positive.")
+        self._connect = connect
+        self._close = close or (lambda connection: connection.close())
+        self.max_connections = max_connections
+        self.max_pipelined = max_pipelined
+        self.idle_timeout = idle_timeout
+        self._health_check = health_check
+        self.check_interval = check_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        # Connections and the number of connections being opened, by contact
+        self._connections = {}
+        self._opening = {}
+        self._closed = False
+        self._counters = dict.fromkeys(('opened', 'reused', 'closed', 'evicted', 'failed_checks', 'waits'), 0)
+
+    def _pick(self, contact):
+        """ Returns the least busy connection for the contact with room for another request, or None. """
+        best = None
+        for pooled in self._connections.get(contact, ()):
+            if pooled.in_flight < self.max_pipelined and (best is None or pooled.in_flight < best.in_flight):
+                best = pooled
+        return best
+
+    def acquire(self, contact, timeout=None):
+        """ Returns a PooledConnection for the contact, to be given back with release(). """
+        deadline = None if timeout is None else self._clock() + timeout
+        self.evict_idle()
+        while True:
+            with self._lock:
+                pooled = None
+                while True:
+                    if self._closed:
+                        raise drmaa2.InvalidStateException("Connection pool was closed.")
+                    pooled = self._pick(contact)
+                    if pooled is not None:
+                        break
+                    count = len(self._connections.get(contact, ())) + self._opening.get(contact, 0)
+                    if count < self.max_connections:
+                        self._opening[contact] = self._opening.get(contact, 0) + 1
+                        break
+                    remaining = None if deadline is None else deadline - self._clock()
+                    if remaining is not None and remaining <= 0:
+                        raise drmaa2.TryLaterException("No connection to %s available." % (contact,))
+                    self._counters['waits'] += 1
+                    self._available.wait(remaining)
+                now = self._clock()
+                if pooled is not None:
+                    pooled.in_flight += 1
+                    check = self._health_check is not None and pooled.in_flight == 1 and \
+                        now - pooled.last_checked >= self.check_interval
+                    if not check:
+                        self._counters['reused'] += 1
+                        return pooled
+            if pooled is None:
+                return self._open(contact)
+            if self._check(pooled):
+                return pooled
+
+    def _open(self, contact):
+        try:
+            connection = self._connect(contact)
+        except Exception:
+            with self._lock:
+                self._opening[contact] -= 1
+                self._available.notify_all()
+            raise
+        with self._lock:
+            self._opening[contact] -= 1
+            pooled = PooledConnection(contact, connection, self._clock())
+            pooled.in_flight = 1
+            self._connections.setdefault(contact, []).append(pooled)
+            self._counters['opened'] += 1
+        return pooled
+
+    def _check(self, pooled):
+        """ Runs the health check for the reserved connection, dropping it if the check fails. """
+        try:
+            healthy = self._health_check(pooled.connection)
+        except Exception:
+            healthy = False
+        with self._lock:
+            if healthy:
+                pooled.last_checked = self._clock()
+                self._counters['reused'] += 1
+                return True
+            self._counters['failed_checks'] += 1
+        self.release(pooled, broken=True)
+        return False
+
+    def release(self, pooled, broken=False):
+        """ Gives the connection back after a request. Broken connections are closed instead of being reused. """
+        with self._lock:
+            pooled.in_flight -= 1
+            pooled.last_used = self._clock()
+            if broken or self._closed:
+                self._discard(pooled)
+            self._available.notify_all()
+            # Dropped connections are closed after their last request
+            close = pooled.in_flight == 0 and pooled not in self._connections.get(pooled.contact, ())
+        if close:
+            self._close_quietly(pooled)
+
+    def connection(self, contact, timeout=None):
+        """ Returns a context manager providing a backend connection for one request.
+            An exception from the request marks the connection as broken if it is a DrmCommunicationException.
+        """
+        return _Borrowed(self, contact, timeout)
+
+    def _discard(self, pooled):
+        """ Removes the connection from the pool. Must be called with the pool lock being held. """
+        connections = self._connections.get(pooled.contact, [])
+        if pooled in connections:
+            connections.remove(pooled)
+            if not connections:
+                del self._connections[pooled.contact]
+        self._available.notify_all()
+
+    def _close_quietly(self, pooled):
+        try:
+            self._close(pooled.connection)
+        except Exception:
+            pass
+        with self._lock:
+            self._counters['closed'] += 1
+
+    def evict_idle(self):
+        """ Closes the connections unused for idle_timeout seconds, and returns their number. """
+        with self._lock:
+            now = self._clock()
+            idle = [pooled for connections in self._connections.values() for pooled in connections
+                    if pooled.in_flight == 0 and now - pooled.last_used >= self.idle_timeout]
+            for pooled in idle:
+                self._discard(pooled)
+                self._counters['evicted'] += 1
+        for pooled in idle:
+            self._close_quietly(pooled)
+        return len(idle)
+
+    def stats(self):
+        """ Returns a dictionary with the connection counters and the current connection numbers. """
+        with self._lock:
+            stats = dict(self._counters)
+            stats['connections'] = dict((contact, len(connections)) for contact, connections in self._connections.items())
+            stats['in_flight'] = sum(pooled.in_flight for connections in self._connections.values()
+                                     for pooled in connections)
+        return stats
+
+    def close(self):
+        """ Closes all unused connections, the others once their requests finished. """
+        with self._lock:
+            self._closed = True
+            idle = [pooled for connections in self._connections.values() for pooled in connections
+                    if pooled.in_flight == 0]
+            for pooled in idle:
+                self._discard(pooled)
+            self._available.notify_all()
+        for pooled in idle:
+            self._close_quietly(pooled)
+
+
+class _Borrowed(object):
+    def __init__(self, pool, contact, timeout):
+        self._pool = pool
+        self._contact = contact
+        self._timeout = timeout
+        self._pooled = None
+
+    def __enter__(self):
+        self._pooled = self._pool.acquire(self._contact, self._timeout)
+        return self._pooled.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._pool.release(self._pooled, broken=exc_type is not None and
+                           issubclass(exc_type, drmaa2.DrmCommunicationException))
+        return False
@@ -0,0 +1,145 @@
+""" DRMAA2 Python language binding.
+
+    Delivery of Notification events to the application callback, for usage by backends.
+
+    For further information, please visit drmaa.org.
+"""
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+import drmaa2
+
+# Policies for a full queue
+
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+BLOCK = 'block'
+
+
+class Dispatcher(object):
+    """ Delivers notifications from a bounded queue in a dedicated thread.
+
+        post() never blocks, so that backends can call it while holding their own locks.
+        Pending NEW_STATE events for the same job are coalesced into the latest one, keeping
+        the queue position of the first one. When the queue is full, the oldest or the newest
+        event is dropped. With the BLOCK policy nothing is dropped; instead throttle() blocks
+        the submitting threads of the backend until the callback caught up.
+        The delivery thread hands out events in batches of up to batch_size, an exception
+        in the callback is counted and does not stop the delivery.
+    """
+
+    def __init__(self, callback=None, maxsize=10000, batch_size=256, policy=DROP_OLDEST):
+        if maxsize < 1 or batch_size < 1:
+            raise drmaa2.InvalidArgumentException("Queue and batch size must be positive.")
+        if policy not in (DROP_OLDEST, DROP_NEWEST, BLOCK):
+            raise drmaa2.InvalidArgumentException("Unknown queue policy %r." % (policy,))
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.policy = policy
+        self._callback = callback
+        self._pending = OrderedDict()
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._arrived = threading.Condition(self._lock)
+        self._drained = threading.Condition(self._lock)
+        self._delivering = 0
+        self._closed = False
+        self._counters = dict.fromkeys(('posted', 'delivered', 'coalesced', 'dropped', 'errors'), 0)
+        self._thread = threading.Thread(target=self._run, name="drmaa2-notification-dispatcher")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def set_callback(self, callback):
+        with self._lock:
+            self._callback = callback
+
+    def post(self, notification):
+        """ Queues the notification for delivery, without blocking. """
+        with self._lock:
+            if self._callback is None or self._closed:
+                return
+            self._counters['posted'] += 1
+            if notification.event == drmaa2.Event.NEW_STATE and notification.job_id is not None:
+                key = (notification.session_name, notification.job_id)
+                if key in self._pending:
+                    self._pending[key] = notification
+                    self._counters['coalesced'] += 1
+                    return
+            else:
+                key = next(self._sequence)
+            if len(self._pending) >= self.maxsize:
+                if self.policy == DROP_NEWEST:
+                    self._counters['dropped'] += 1
+                    return
+                if self.policy == DROP_OLDEST:
+                    self._pending.popitem(last=False)
+                    self._counters['dropped'] += 1
+            self._pending[key] = notification
+            self._arrived.notify()
+
+    def throttle(self, timeout=None):
+        """ With the BLOCK policy, waits until the queue is below its size limit again.
+            Must not be called while holding locks the callback may need.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._lock:
+            if self.policy != BLOCK:
+                return
+            while len(self._pending) >= self.maxsize and not self._closed:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return
+                self._drained.wait(remaining)
+
+    def flush(self, timeout=None):
+        """ Waits until all queued notifications were delivered. Returns False on timeout. """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._lock:
+            while self._pending or self._delivering:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._drained.wait(remaining)
+        return True
+
+    def stats(self):
+        """ Returns a dictionary with the event counters and the current queue length. """
+        with self._lock:
+            stats = dict(self._counters)
+            stats['pending'] = len(self._pending)
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._arrived.notify()
+            self._drained.notify_all()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._pending and not self._closed:
+                    self._arrived.wait()
+                if self._closed:
+                    return
+                batch = []
+                while self._pending and len(batch) < self.batch_size:
+                    batch.append(self._pending.popitem(last=False)[1])
+                callback = self._callback
+                self._delivering = len(batch)
+                self._drained.notify_all()
+            delivered = errors = 0
+            for notification in batch if callback is not None else ():
+                try:
+                    callback(notification)
+                    delivered += 1
+                except Exception:
+                    errors += 1
+            with self._lock:
+                self._delivering = 0
+                self._counters['delivered'] += delivered
+                self._counters['errors'] += errors
+                self._drained.notify_all()
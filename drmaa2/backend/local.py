@@ -0,0 +1,2225 @@
+""" DRMAA2 Python language binding.
+
+    This is a local implementation that runs jobs as child processes
+    on a bounded pool of worker threads.
+
+    For further information, please visit drmaa.org.
+"""
+
+import os
+import time
+import atexit
+import signal
+import socket
+import getpass
+import platform
+import bisect
+import itertools
+import threading
+import subprocess
+import multiprocessing
+from collections import OrderedDict, deque
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+try:
+    from collections.abc import Sequence
+except ImportError:
+    from collections import Sequence
+
+try:
+    xrange
+except NameError:
+    xrange = range
+
+try:
+    from sys import intern
+except ImportError:
+    pass
+
+try:
+    _string_types = (str, unicode)
+except NameError:
+    _string_types = (str,)
+
+import drmaa2
+from drmaa2.paging import PAGE_SIZE
+from drmaa2.reservations import ReservationCalendar
+from drmaa2.scheduler import expand_template
+from drmaa2.tables import JobInfoTable, MachineInfoTable, QueueInfoTable
+from drmaa2.backend.dispatch import Dispatcher
+from drmaa2.backend.store import SessionStore
+from drmaa2.backend.staging import StagingEngine
+
+# Definition part
+
+job_template_impl_spec = []
+job_info_impl_spec = ['staging_time']
+reservation_template_impl_spec = []
+reservation_info_impl_spec = []
+queue_info_impl_spec = []
+machine_info_impl_spec = []
+notification_impl_spec = []
+
+CORE_FILE_SIZE = "CORE_FILE_SIZE"
+CPU_TIME = "CPU_TIME"
+DATA_SIZE = "DATA_SIZE"
+FILE_SIZE = "FILE_SIZE"
+OPEN_FILES = "OPEN_FILES"
+STACK_SIZE = "STACK_SIZE"
+VIRTUAL_MEMORY = "VIRTUAL_MEMORY"
+WALLCLOCK_TIME = "WALLCLOCK_TIME"
+
+drms_name = "Local Process Pool"
+drms_version = {'major': '1', 'minor': '0'}
+drmaa_name = "Local Process Pool DRMAA Implementation"
+drmaa_version = {'major': '2', 'minor': '0'}
+
+QUEUE_NAME = "local"
+
+# Number of worker threads, each of them running one child process at a time.
+# Can be overridden with the DRMAA2_LOCAL_WORKERS environment variable.
+DEFAULT_WORKERS = multiprocessing.cpu_count()
+
+# Number of threads copying the stage_in_files and stage_out_files of all jobs.
+# Can be overridden with the DRMAA2_LOCAL_STAGING_WORKERS environment variable. Inputs of array tasks
+# are deduplicated through a cache in DRMAA2_LOCAL_STAGING_CACHE, or in a temporary directory removed
+# at exit. They are placed as hard links to the read-only cached files if DRMAA2_LOCAL_STAGING_LINK is 1.
+DEFAULT_STAGING_WORKERS = 4
+
+# Sessions and jobs are only kept in memory, unless the DRMAA2_LOCAL_STORE
+# environment variable names an SQLite database file, or open_store() was called.
+STORE_ENVIRONMENT = 'DRMAA2_LOCAL_STORE'
+
+TERMINATED_STATES = frozenset([drmaa2.JobState.DONE, drmaa2.JobState.FAILED])
+STARTED_STATES = frozenset([drmaa2.JobState.RUNNING, drmaa2.JobState.SUSPENDED]) | TERMINATED_STATES
+
+# States of tasks occupying one of the max_parallel slots of their array
+_ACTIVE_STATES = frozenset([drmaa2.JobState.QUEUED, drmaa2.JobState.RUNNING, drmaa2.JobState.SUSPENDED])
+
+# Number of array tasks expanded and queued in one step by run_bulk_jobs.
+# The first chunk is queued before run_bulk_jobs returns, the others by a feeder thread.
+BULK_CHUNK_SIZE = 1024
+
+# Memory budget of a Job handle in bytes, without its job ID string
+HANDLE_SIZE = 64
+
+_capabilities = frozenset([drmaa2.Capability.ADVANCE_RESERVATION, drmaa2.Capability.RESERVE_SLOTS,
+                           drmaa2.Capability.CALLBACK,
+                           drmaa2.Capability.BULK_JOBS_MAXPARALLEL, drmaa2.Capability.JT_STAGING,
+                           drmaa2.Capability.RT_STARTNOW, drmaa2.Capability.RT_DURATION,
+                           drmaa2.Capability.RT_MACHINEOS, drmaa2.Capability.RT_MACHINEARCH])
+
+# Template attributes that have no meaning for local child processes
+_unsupported_attributes = ('email', 'email_on_started', 'email_on_terminated', 'reservation_id',
+                           'deadline_time', 'accounting_id')
+
+# Macros replaced in the attributes of a job template
+_macros = (drmaa2.PARAMETRIC_INDEX, drmaa2.HOME_DIR, drmaa2.WORKING_DIR)
+
+# Implementation part
+
+app_callback = None
+_dispatcher = None
+
+_hostname = socket.gethostname()
+_session_ids = itertools.count(1)
+
+_registry_lock = threading.RLock()
+_job_sessions = {}
+_reservation_sessions = {}
+_calendar = None
+_pool = None
+_stager = None
+_store = None
+_cleanups = None
+
+# Waits for more jobs than this remove their waiter table entries in a background thread,
+# so that the woken thread returns without touching every job again
+_CLEANUP_THRESHOLD = 1024
+
+
+class IdCounter(object):
+    """ Hands out increasing numbers for identifiers, reporting them to the session store. """
+
+    def __init__(self, name, start=1):
+        self.name = name
+        self.value = start - 1
+        self._lock = threading.Lock()
+
+    def next(self):
+        with self._lock:
+            self.value += 1
+            value = self.value
+        if _store is not None:
+            _store.put_counter(self.name, value)
+        return value
+
+    __next__ = next
+
+
+_job_ids = IdCounter('job')
+_array_ids = IdCounter('array')
+
+# Numbers of job changes across all sessions, valid for the lifetime of the process only
+_change_numbers = itertools.count(1)
+_change_epoch = "%x%x" % (os.getpid(), int(time.time() * 1e6))
+
+
+def _wait_seconds(timeout):
+    """ Converts a DRMAA timeout into seconds for threading waits, None meaning infinite. """
+    if timeout is None or timeout == drmaa2.INFINITE_TIME:
+        return None
+    if timeout < 0:
+        raise drmaa2.InvalidArgumentException("Invalid timeout %r." % (timeout,))
+    return timeout
+
+
+def _owner():
+    try:
+        return getpass.getuser()
+    except Exception:
+        return str(os.getuid())
+
+
+def _signal_name(signum):
+    try:
+        return signal.Signals(signum).name
+    except (AttributeError, ValueError):
+        return str(signum)
+
+
+def _local_path(path):
+    """ Strips the optional '[hostname]:' prefix from a DRMAA path specification. """
+    host, sep, rest = path.partition(':')
+    if sep and os.sep not in host:
+        return rest
+    return path
+
+
+def _matches(info, filter):
+    """ Checks if the JobInfo instance matches all attributes given in the filter. """
+    for name, wanted in zip(filter._fields, filter):
+        if wanted is None:
+            continue
+        value = getattr(info, name, None)
+        if name == 'allocated_machines':
+            if not value or not set(wanted).issubset(value):
+                return False
+        elif value != wanted:
+            return False
+    return True
+
+
+class WorkerPool(object):
+    """ A fixed number of daemon threads, each one running one job record at a time. """
+
+    def __init__(self, size):
+        if size < 1:
+            raise drmaa2.InvalidArgumentException("Worker pool needs at least one worker.")
+        self.size = size
+        self._queue = queue.Queue()
+        self._threads = []
+        for number in range(size):
+            thread = threading.Thread(target=self._work, name="drmaa2-local-worker-%u" % number)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, record):
+        self._queue.put(record)
+
+    def _work(self):
+        while True:
+            record = self._queue.get()
+            if record is None:
+                return
+            # The thread must survive any error, otherwise the pool shrinks for good
+            try:
+                record.execute()
+            except Exception as e:
+                try:
+                    record.fail("Job execution failed: %s" % e)
+                except Exception:
+                    pass
+
+    def shutdown(self):
+        for thread in self._threads:
+            self._queue.put(None)
+
+
+def get_pool():
+    """ Returns the process-wide worker pool, creating it on first use. """
+    global _pool
+    with _registry_lock:
+        if _pool is None:
+            _pool = WorkerPool(int(os.environ.get('DRMAA2_LOCAL_WORKERS', DEFAULT_WORKERS)))
+        return _pool
+
+
+def get_stager():
+    """ Returns the process-wide staging engine, creating it on first use. """
+    global _stager
+    with _registry_lock:
+        if _stager is None:
+            _stager = StagingEngine(int(os.environ.get('DRMAA2_LOCAL_STAGING_WORKERS', DEFAULT_STAGING_WORKERS)),
+                                    os.environ.get('DRMAA2_LOCAL_STAGING_CACHE'),
+                                    os.environ.get('DRMAA2_LOCAL_STAGING_LINK') == '1')
+            if not os.environ.get('DRMAA2_LOCAL_STAGING_CACHE'):
+                atexit.register(_stager.clear)
+        return _stager
+
+
+class JobRecord(object):
+    """ The backend-side state of one job. All state changes happen under the session lock. """
+    __slots__ = ('state', 'job_id', 'template', 'index', 'array_id', 'job_state', 'sub_state', 'process',
+                 'kill_requested', 'exit_status', 'terminating_signal', 'annotation', 'cpu_time', 'submission_time',
+                 'dispatch_time', 'finish_time', 'staging_time', 'change')
+
+    def __init__(self, state, job_id, template, index=None, array_id=None, submission_time=None):
+        self.state = state
+        self.job_id = job_id
+        self.template = template
+        self.index = index
+        self.array_id = array_id
+        self.job_state = drmaa2.JobState.QUEUED_HELD if template.submit_as_hold else drmaa2.JobState.QUEUED
+        self.sub_state = ""
+        self.process = None
+        self.kill_requested = False
+        self.exit_status = None
+        self.terminating_signal = None
+        self.annotation = None
+        self.cpu_time = None
+        self.submission_time = submission_time or time.time()
+        self.dispatch_time = None
+        self.finish_time = None
+        self.staging_time = None
+        self.change = 0
+
+    def info(self):
+        template = self.template
+        wallclock_time = None
+        if self.dispatch_time is not None:
+            wallclock_time = (self.finish_time or time.time()) - self.dispatch_time
+        info = drmaa2.JobInfo(job_id=self.job_id,
+                             job_name=template.job_name,
+                             exit_status=self.exit_status,
+                             terminating_signal=self.terminating_signal,
+                             annotation=self.annotation,
+                             job_state=self.job_state,
+                             job_sub_state=self.sub_state,
+                             allocated_machines=[_hostname] if self.dispatch_time is not None else None,
+                             submission_machine=_hostname,
+                             job_owner=self.state.owner,
+                             slots=1,
+                             queue_name=QUEUE_NAME,
+                             wallclock_time=wallclock_time,
+                             cpu_time=self.cpu_time,
+                             submission_time=self.submission_time,
+                             dispatch_time=self.dispatch_time,
+                             finish_time=self.finish_time)
+        # Only part of JobInfo if the local backend was loaded as the default one
+        if self.staging_time is not None and 'staging_time' in info._fields:
+            info = info._replace(staging_time=self.staging_time)
+        return info
+
+    def row(self, store):
+        """ Returns the record as tuple for the session store, following store.JOB_COLUMNS. """
+        return (self.job_id, store.template_id(self.template), self.index, self.array_id, self.job_state.value,
+                self.sub_state, self.exit_status, self.terminating_signal, self.annotation, self.cpu_time,
+                self.submission_time, self.dispatch_time, self.finish_time, self.staging_time)
+
+    @classmethod
+    def restore(cls, state, row, template):
+        """ Creates the record from a session store row. """
+        (job_id, template_id, index, array_id, job_state, sub_state, exit_status, terminating_signal, annotation,
+         cpu_time, submission_time, dispatch_time, finish_time, staging_time) = row
+        record = cls(state, job_id, template, index, array_id, submission_time)
+        record.job_state = drmaa2.JobState(job_state)
+        record.sub_state = sub_state
+        record.exit_status = exit_status
+        record.terminating_signal = terminating_signal
+        record.annotation = annotation
+        record.cpu_time = cpu_time
+        record.dispatch_time = dispatch_time
+        record.finish_time = finish_time
+        record.staging_time = staging_time
+        return record
+
+    def _stage(self, compiled, staging, cwd):
+        """ Transfers the files, adding the time taken to the staging time. Inputs of array tasks are deduplicated. """
+        transfers = compiled.transfers(staging, self.index, cwd, staging is compiled.stage_in and
+                                       self.array_id is not None)
+        seconds = get_stager().stage(transfers)
+        with self.state.lock:
+            self.staging_time = (self.staging_time or 0.0) + seconds
+
+    def fail(self, annotation):
+        """ Moves the job to FAILED, unless it terminated already. """
+        with self.state.lock:
+            process, self.process = self.process, None
+            if self.job_state in TERMINATED_STATES:
+                return
+            self.annotation = annotation
+            self.finish_time = time.time()
+            self.state.set_job_state(self, drmaa2.JobState.FAILED)
+        if process is not None:
+            try:
+                process.kill()
+            except OSError:
+                pass
+
+    def execute(self):
+        """ Runs the job in the calling worker thread, until it terminates. """
+        state = self.state
+        with state.lock:
+            if self.job_state != drmaa2.JobState.QUEUED:
+                return
+            self.dispatch_time = time.time()
+            state.set_job_state(self, drmaa2.JobState.RUNNING)
+        files = []
+        try:
+            compiled = _templates.compile(self.template)
+            cwd = compiled.working_directory(self.index)
+            if compiled.stage_in:
+                self._stage(compiled, compiled.stage_in, cwd)
+            command, kwargs, files = compiled.popen_args(self.template.args, self.index, cwd)
+            process = subprocess.Popen(command, **kwargs)
+        except Exception as e:
+            for handle in files:
+                handle.close()
+            self.fail("Job could not be started: %s" % e)
+            return
+        for handle in files:
+            handle.close()
+        with state.lock:
+            self.process = process
+            kill = self.kill_requested
+        if kill:
+            process.kill()
+        returncode, cpu_time = self._wait(process)
+        staging_error = None
+        if compiled.stage_out:
+            try:
+                self._stage(compiled, compiled.stage_out, cwd)
+            except Exception as e:
+                staging_error = e
+        with state.lock:
+            self.process = None
+            self.cpu_time = cpu_time
+            self.finish_time = time.time()
+            if returncode < 0:
+                self.terminating_signal = _signal_name(-returncode)
+            else:
+                self.exit_status = returncode
+            if self.kill_requested:
+                self.annotation = "Job was terminated."
+            elif staging_error is not None:
+                self.annotation = "Output files could not be staged: %s" % staging_error
+            if returncode == 0 and not self.kill_requested and staging_error is None:
+                state.set_job_state(self, drmaa2.JobState.DONE)
+            else:
+                state.set_job_state(self, drmaa2.JobState.FAILED)
+
+    @staticmethod
+    def _wait(process):
+        """ Waits for the child process, returning its exit code and consumed CPU time. """
+        if not hasattr(os, 'wait4'):
+            return process.wait(), None
+        pid, status, usage = os.wait4(process.pid, 0)
+        if os.WIFSIGNALED(status):
+            process.returncode = -os.WTERMSIG(status)
+        else:
+            process.returncode = os.WEXITSTATUS(status)
+        return process.returncode, usage.ru_utime + usage.ru_stime
+
+    def signal(self, signum):
+        if self.process is not None:
+            try:
+                self.process.send_signal(signum)
+            except OSError:
+                pass
+
+
+class Waiter(object):
+    """ A blocked wait call, registered in the waiter table for each job it waits for.
+
+        The first state change of one of these jobs into one of the awaited states
+        wakes the waiting thread directly, without any polling. Instead of waking a thread,
+        the waiter can also call a function with the job ID, under the session lock.
+    """
+    __slots__ = ('states', 'record', '_event', '_callback')
+
+    def __init__(self, states, callback=None):
+        self.states = states
+        self.record = None
+        self._callback = callback
+        self._event = threading.Event() if callback is None else None
+
+    def notify(self, record):
+        if self.record is None and record.job_state in self.states:
+            self.record = record
+            if self._callback is None:
+                self._event.set()
+            else:
+                self._callback(record.job_id)
+
+    def wait(self, timeout):
+        return self._event.wait(timeout)
+
+
+def _cleanup_waiters(cleanups):
+    """ Removes finished waiters from the waiter table, releasing the session lock now and then. """
+    while True:
+        state, records, waiter = cleanups.get()
+        for start in xrange(0, len(records), _CLEANUP_THRESHOLD):
+            with state.lock:
+                for record in records[start:start + _CLEANUP_THRESHOLD]:
+                    state.waiters.discard(record.job_id, waiter)
+
+
+def _cleanup_queue():
+    global _cleanups
+    with _registry_lock:
+        if _cleanups is None:
+            _cleanups = queue.Queue()
+            thread = threading.Thread(target=_cleanup_waiters, args=(_cleanups,), name="drmaa2-local-cleanup")
+            thread.daemon = True
+            thread.start()
+        return _cleanups
+
+
+class WaiterTable(object):
+    """ Maps job IDs to the waiters interested in their state changes. Guarded by the session lock. """
+
+    def __init__(self):
+        self._waiters = {}
+
+    def add(self, job_id, waiter):
+        self._waiters.setdefault(job_id, set()).add(waiter)
+
+    def discard(self, job_id, waiter):
+        waiters = self._waiters.get(job_id)
+        if waiters is not None:
+            waiters.discard(waiter)
+            if not waiters:
+                del self._waiters[job_id]
+
+    def signal(self, record):
+        waiters = self._waiters.get(record.job_id)
+        if waiters:
+            for waiter in list(waiters):
+                waiter.notify(record)
+
+    def __len__(self):
+        return len(self._waiters)
+
+
+class CompletionSet(object):
+    """ Collects the terminated jobs out of a set of jobs, in the order of their termination.
+
+        The set stays registered in the waiter table for its not yet terminated jobs, and drops each
+        registration when the job terminates. Collecting all of n jobs therefore costs O(n) in total,
+        instead of one scan of the remaining jobs per wait_any_terminated() call.
+    """
+
+    def __init__(self, state, jobs, states=TERMINATED_STATES):
+        self.states = states
+        self._state = state
+        # The job objects of the caller, by job ID
+        self._jobs = OrderedDict((job.job_id, job) for job in jobs)
+        records = [job._record() for job in self._jobs.values()]
+        self._pending = set()
+        self._done = deque()
+        self._condition = threading.Condition(state.lock)
+        with state.lock:
+            for record in records:
+                if record.job_state in states:
+                    self._done.append(record.job_id)
+                else:
+                    self._pending.add(record.job_id)
+                    state.waiters.add(record.job_id, self)
+
+    def notify(self, record):
+        """ Called by the waiter table, with the session lock being held. """
+        if record.job_state in self.states and record.job_id in self._pending:
+            self._pending.discard(record.job_id)
+            self._state.waiters.discard(record.job_id, self)
+            self._done.append(record.job_id)
+            self._condition.notify_all()
+
+    def remaining(self):
+        """ Returns the number of jobs not yet returned by drain(). """
+        with self._state.lock:
+            return len(self._pending) + len(self._done)
+
+    def drain(self, max_jobs=None, timeout=drmaa2.INFINITE_TIME):
+        """ drain(self, int, float) -> list
+
+            Returns up to max_jobs terminated jobs not returned before, in the order of their termination.
+            Blocks until at least one job terminated, and raises TimeoutException if none did within the
+            timeout. Returns an empty list once all jobs were returned.
+        """
+        if max_jobs is not None and max_jobs < 1:
+            raise drmaa2.InvalidArgumentException("Invalid maximum number of jobs %r." % (max_jobs,))
+        seconds = _wait_seconds(timeout)
+        deadline = None if seconds is None else time.time() + seconds
+        with self._condition:
+            while not self._done:
+                if not self._pending:
+                    return []
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    raise drmaa2.TimeoutException("Timeout of %s seconds expired." % timeout)
+                self._condition.wait(remaining)
+            count = len(self._done) if max_jobs is None else min(max_jobs, len(self._done))
+            return [self._jobs[self._done.popleft()] for _ in xrange(count)]
+
+    def __iter__(self):
+        while True:
+            jobs = self.drain()
+            if not jobs:
+                return
+            for job in jobs:
+                yield job
+
+    def close(self):
+        """ Removes the remaining registrations from the waiter table. """
+        with self._condition:
+            for job_id in self._pending:
+                self._state.waiters.discard(job_id, self)
+            self._pending.clear()
+            self._condition.notify_all()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+class JobTable(object):
+    """ The job records of a session, with secondary indexes on the commonly filtered JobInfo attributes.
+
+        Filters on indexed attributes are answered by intersecting the index entries, starting with
+        the smallest one, so that the effort depends on the result size and not on the number of jobs.
+        Only the remaining candidates are checked against the other filter attributes, and sorted
+        into submission order. Guarded by the session lock.
+    """
+    indexed = ('job_state', 'queue_name', 'job_owner', 'job_name', 'allocated_machines')
+
+    def __init__(self):
+        self._records = {}
+        self._keys = {}
+        self._indexes = dict((name, {}) for name in self.indexed)
+        # Job IDs in the order of their addition, with increasing sequence numbers as paging cursors.
+        # Removed jobs stay in there until they make up half of the entries.
+        self._sequence = itertools.count()
+        self._sequences = []
+        self._order = []
+        self._removed = 0
+        # Sequence numbers by job ID
+        self._positions = {}
+
+    @staticmethod
+    def _index_keys(record):
+        machines = (_hostname,) if record.dispatch_time is not None else ()
+        return (record.job_state,), (QUEUE_NAME,), (record.state.owner,), (record.template.job_name,), machines
+
+    def _update(self, job_id, old_keys, new_keys):
+        for name, old, new in zip(self.indexed, old_keys, new_keys):
+            if old == new:
+                continue
+            index = self._indexes[name]
+            for key in old:
+                entries = index[key]
+                entries.discard(job_id)
+                if not entries:
+                    del index[key]
+            for key in new:
+                index.setdefault(key, set()).add(job_id)
+
+    def add(self, record):
+        keys = self._index_keys(record)
+        self._records[record.job_id] = record
+        self._keys[record.job_id] = keys
+        self._update(record.job_id, ((),) * len(keys), keys)
+        sequence = self._positions[record.job_id] = next(self._sequence)
+        self._sequences.append(sequence)
+        self._order.append(record.job_id)
+
+    def remove(self, record):
+        del self._records[record.job_id]
+        del self._positions[record.job_id]
+        keys = self._keys.pop(record.job_id)
+        self._update(record.job_id, keys, ((),) * len(keys))
+        self._removed += 1
+        if self._removed > BULK_CHUNK_SIZE and 2 * self._removed > len(self._order):
+            kept = [position for position, job_id in enumerate(self._order) if job_id in self._records]
+            self._sequences = [self._sequences[position] for position in kept]
+            self._order = [self._order[position] for position in kept]
+            self._removed = 0
+
+    def reindex(self, record):
+        """ Updates the indexes after attributes of the job record changed. """
+        keys = self._index_keys(record)
+        old_keys = self._keys.get(record.job_id)
+        if old_keys is not None and old_keys != keys:
+            self._keys[record.job_id] = keys
+            self._update(record.job_id, old_keys, keys)
+
+    def get(self, job_id):
+        return self._records.get(job_id)
+
+    def values(self):
+        """ Returns the job records in the order of their addition. """
+        records = self._records
+        return [records[job_id] for job_id in self._order if job_id in records]
+
+    def __len__(self):
+        return len(self._records)
+
+    def select(self, filter):
+        """ Returns the job records matching the JobInfo filter, in the order of their addition. """
+        entries = []
+        for name in self.indexed:
+            wanted = getattr(filter, name)
+            if wanted is None:
+                continue
+            index = self._indexes[name]
+            for key in (wanted if name == 'allocated_machines' else (wanted,)):
+                entries.append(index.get(key, ()))
+        if not entries:
+            return [record for record in self.values() if _matches(record.info(), filter)]
+        entries.sort(key=len)
+        job_ids = set(entries[0])
+        for entry in entries[1:]:
+            if not job_ids:
+                break
+            job_ids.intersection_update(entry)
+        records = [self._records[job_id] for job_id in sorted(job_ids, key=self._positions.__getitem__)]
+        rest = filter._replace(**dict((name, None) for name in self.indexed))
+        if any(value is not None for value in rest):
+            records = [record for record in records if _matches(record.info(), rest)]
+        return records
+
+    def matches(self, record, filter):
+        """ Checks the job record against the JobInfo filter, the indexed attributes first. """
+        if filter is None:
+            return True
+        for name, keys in zip(self.indexed, self._keys[record.job_id]):
+            wanted = getattr(filter, name)
+            if wanted is None:
+                continue
+            if name == 'allocated_machines':
+                if not wanted or not set(wanted).issubset(keys):
+                    return False
+            elif wanted not in keys:
+                return False
+        rest = filter._replace(**dict((name, None) for name in self.indexed))
+        return not any(value is not None for value in rest) or _matches(record.info(), rest)
+
+    def page(self, filter, cursor, count):
+        """ Returns up to count job records matching the JobInfo filter, being added after the cursor,
+            in the order of their addition, and the cursor for the next page, or None after the last job.
+            The cursor for the first page is -1.
+        """
+        records = []
+        position = bisect.bisect_right(self._sequences, cursor)
+        while position < len(self._order) and len(records) < count:
+            record = self._records.get(self._order[position])
+            if record is not None and self.matches(record, filter):
+                records.append(record)
+            position += 1
+        if position >= len(self._order):
+            return records, None
+        return records, self._sequences[position - 1]
+
+
+class ChangeLog(object):
+    """ The job records of a session in the order of their last change.
+
+        Each change takes the next number from a process-wide counter, so that the records
+        changed after a given number are found at the end, without looking at the other ones.
+        Guarded by the session lock.
+    """
+
+    def __init__(self):
+        self._records = OrderedDict()
+
+    def touch(self, record):
+        record.change = next(_change_numbers)
+        self._records.pop(record.job_id, None)
+        self._records[record.job_id] = record
+
+    def discard(self, job_id):
+        self._records.pop(job_id, None)
+
+    def since(self, number):
+        """ Returns the records changed after the given change number, in the order of their change. """
+        records = []
+        for job_id in reversed(self._records):
+            record = self._records[job_id]
+            if record.change <= number:
+                break
+            records.append(record)
+        records.reverse()
+        return records
+
+
+def _change_cursor():
+    """ Returns a cursor for the changes from now on. """
+    return "%s:%u" % (_change_epoch, next(_change_numbers))
+
+
+def _cursor_number(cursor):
+    """ Returns the change number of the cursor, 0 for all jobs if the cursor is from another process. """
+    if cursor is None:
+        return 0
+    epoch, sep, number = str(cursor).partition(':')
+    if not sep or not number.isdigit():
+        raise drmaa2.InvalidArgumentException("Invalid cursor %r." % (cursor,))
+    return int(number) if epoch == _change_epoch else 0
+
+
+class SessionState(object):
+    """ The backend-side state of one job session, shared by all JobSession objects opened for it. """
+
+    def __init__(self, session_name, contact, store=None):
+        # Shared by all handles of the session
+        self.session_name = intern(session_name)
+        self.contact = contact
+        self.store = store
+        self.owner = _owner()
+        self.lock = threading.RLock()
+        self.waiters = WaiterTable()
+        self.jobs = JobTable()
+        self.changes = ChangeLog()
+        self.arrays = {}
+
+    def add(self, record):
+        """ Must be called with the session lock being held. """
+        self.jobs.add(record)
+        self.changes.touch(record)
+        if self.store is not None:
+            self.store.put_job(self.session_name, record.row(self.store))
+
+    def remove(self, record):
+        """ Must be called with the session lock being held. """
+        self.jobs.remove(record)
+        self.changes.discard(record.job_id)
+        if self.store is not None:
+            self.store.delete_job(self.session_name, record.job_id)
+
+    def add_array(self, array):
+        """ Must be called with the session lock being held. """
+        self.arrays[array.job_array_id] = array
+        self.save_array(array)
+
+    def save_array(self, array):
+        if self.store is not None:
+            self.store.put_array(self.session_name, array.row(self.store))
+
+    def queue(self, record):
+        """ Hands the queued job to the worker pool, unless the max_parallel limit of its array holds it back.
+            Must be called with the session lock being held.
+        """
+        array = self.arrays.get(record.array_id) if record.array_id is not None else None
+        if array is not None and array.max_parallel is not None:
+            array.throttle(record)
+        else:
+            get_pool().submit(record)
+
+    def set_job_state(self, record, job_state, sub_state=""):
+        """ Must be called with the session lock being held. """
+        old_state = record.job_state
+        record.job_state = job_state
+        record.sub_state = sub_state
+        self.jobs.reindex(record)
+        self.changes.touch(record)
+        if self.store is not None:
+            self.store.put_job(self.session_name, record.row(self.store))
+        self.waiters.signal(record)
+        if record.array_id is not None and record.array_id in self.arrays:
+            self.arrays[record.array_id].task_changed(record, old_state)
+        if app_callback is not None:
+            _dispatcher.post(drmaa2.Notification(drmaa2.Event.NEW_STATE, record.job_id, self.session_name, job_state))
+
+    def wait_any(self, records, states, timeout):
+        """ Blocks until one of the job records is in one of the given states, and returns it.
+
+            Jobs that already reached such a state are found with one scan, all later
+            state changes wake the waiting thread through the waiter table.
+        """
+        seconds = _wait_seconds(timeout)
+        with self.lock:
+            for record in records:
+                if record.job_state in states:
+                    return record
+            if seconds == drmaa2.ZERO_TIME:
+                raise drmaa2.TimeoutException("Job state was not reached.")
+            waiter = Waiter(states)
+            for record in records:
+                self.waiters.add(record.job_id, waiter)
+        try:
+            waiter.wait(seconds)
+        finally:
+            self.unregister(records, waiter)
+        if waiter.record is None:
+            raise drmaa2.TimeoutException("Timeout of %s seconds expired." % timeout)
+        return waiter.record
+
+    def unregister(self, records, waiter):
+        """ Removes the waiter from the waiter table, leaving it to a background thread for many jobs. """
+        if len(records) <= _CLEANUP_THRESHOLD:
+            with self.lock:
+                for record in records:
+                    self.waiters.discard(record.job_id, waiter)
+        else:
+            _cleanup_queue().put((self, records, waiter))
+
+    def watch(self, records, states, callback):
+        """ Calls the function with the job ID once one of the job records is in one of the given states.
+
+            The call happens immediately if a job already reached such a state, otherwise from the thread
+            changing the job state. Returns a function that removes the registration.
+        """
+        with self.lock:
+            for record in records:
+                if record.job_state in states:
+                    callback(record.job_id)
+                    return lambda: None
+            waiter = Waiter(states, callback)
+            for record in records:
+                self.waiters.add(record.job_id, waiter)
+
+        return lambda: self.unregister(records, waiter)
+
+    def record(self, job_id):
+        """ Returns the job record, expanding it first if it is a not yet queued array task. """
+        with self.lock:
+            record = self.jobs.get(job_id)
+            if record is None:
+                array_id, sep, index = job_id.partition('.')
+                array = self.arrays.get(array_id) if sep else None
+                if array is not None:
+                    record = array.materialize_task(int(index))
+            if record is None:
+                raise drmaa2.InvalidArgumentException("Job %s is unknown or was reaped." % job_id)
+            return record
+
+    def restore(self):
+        """ Loads arrays and jobs from the session store, continuing where the previous process stopped.
+
+            Queued jobs and array tasks are queued again. Jobs that were running in the previous process
+            are reported as failed, since their processes are gone.
+        """
+        store = self.store
+        templates = {}
+
+        def template(template_id):
+            if template_id not in templates:
+                templates[template_id] = store.template(template_id)
+            return templates[template_id]
+        get_pool()
+        arrays = []
+        with self.lock:
+            for row in store.arrays(self.session_name):
+                array = JobArray.restore(self, row, template(row[4]))
+                self.arrays[array.job_array_id] = array
+                arrays.append(array)
+            for row in store.jobs(self.session_name):
+                record = JobRecord.restore(self, row, template(row[1]))
+                self.jobs.add(record)
+                self.changes.touch(record)
+                if record.array_id in self.arrays:
+                    self.arrays[record.array_id].count(record)
+                if record.job_state == drmaa2.JobState.QUEUED:
+                    self.queue(record)
+                elif record.job_state in (drmaa2.JobState.RUNNING, drmaa2.JobState.SUSPENDED):
+                    record.annotation = "Job was lost when its process ended."
+                    record.finish_time = record.finish_time or time.time()
+                    self.set_job_state(record, drmaa2.JobState.FAILED)
+        for array in arrays:
+            array.schedule()
+
+    def changed_since(self, number):
+        """ Returns the JobInfo of the jobs created or changed after the change number.
+            Not yet queued array tasks count as created with their array, and are reported after the others.
+        """
+        with self.lock:
+            infos = [record.info() for record in self.changes.since(number)]
+            for array in self.arrays.values():
+                if array.change > number:
+                    infos.extend(record.info() for record in array.pending(None))
+            return infos
+
+    def pages(self, filter, page_size):
+        """ Yields the job records select() would return as lists of up to page_size records, taking the
+            session lock for each page only. Jobs are paged in the order of their addition, and then the array
+            tasks not yet created when the last job was seen, so that each job is returned once.
+        """
+        cursor = -1
+        while cursor is not None:
+            with self.lock:
+                records, cursor = self.jobs.page(filter, cursor, page_size)
+                if cursor is None:
+                    arrays = [(array, array._next) for array in self.arrays.values()]
+            if records:
+                yield records
+        for array, position in arrays:
+            while position is not None:
+                with self.lock:
+                    records, position = array.page(filter, position, page_size)
+                if records:
+                    yield records
+
+    def select(self, filter):
+        """ Returns the job records matching the JobInfo filter, including the not yet queued array tasks.
+            The latter are answered from their array without creating them, as records not in the job table.
+        """
+        with self.lock:
+            records = list(self.jobs.values()) if filter is None else self.jobs.select(filter)
+            for array in self.arrays.values():
+                records.extend(array.pending(filter))
+            return records
+
+
+def _check_string(name, value, numbers=False):
+    if numbers and isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = str(value)
+    if not isinstance(value, _string_types):
+        raise drmaa2.InvalidArgumentException("Attribute '%s' contains %r, which is not a string." % (name, value))
+    if '\0' in value:
+        raise drmaa2.InvalidArgumentException("Attribute '%s' contains a NUL character." % name)
+
+
+def _check_args(args):
+    """ Raises the errors of the args, which are not part of the template cache key. """
+    if args is not None:
+        if not isinstance(args, (list, tuple)):
+            raise drmaa2.InvalidArgumentException("Attribute 'args' must be a list.")
+        for arg in args:
+            _check_string('args', arg, numbers=True)
+
+
+def _check_template(job_template):
+    """ Raises the errors the job would otherwise only hit when being started in a worker thread. """
+    if job_template is None or not job_template.remote_command:
+        raise drmaa2.InvalidArgumentException("Job template has no remote command.")
+    for name in _unsupported_attributes:
+        if getattr(job_template, name) is not None:
+            raise drmaa2.UnsupportedAttributeException("Attribute '%s' is not supported." % name)
+    for name in ('remote_command', 'working_directory', 'input_path', 'output_path', 'error_path'):
+        value = getattr(job_template, name)
+        if value is not None:
+            _check_string(name, value)
+    _check_args(job_template.args)
+    if job_template.job_environment is not None:
+        if not isinstance(job_template.job_environment, dict):
+            raise drmaa2.InvalidArgumentException("Attribute 'job_environment' must be a dictionary.")
+        for key, value in job_template.job_environment.items():
+            _check_string('job_environment', key)
+            if not key or '=' in key:
+                raise drmaa2.InvalidArgumentException("Invalid environment variable name %r." % (key,))
+            _check_string('job_environment', value, numbers=True)
+    for name in ('stage_in_files', 'stage_out_files'):
+        files = getattr(job_template, name)
+        if files is not None:
+            if not isinstance(files, dict):
+                raise drmaa2.InvalidArgumentException("Attribute '%s' must be a dictionary." % name)
+            for source, target in files.items():
+                _check_string(name, source)
+                _check_string(name, target)
+
+
+def _has_macro(value):
+    return any(macro in value for macro in _macros)
+
+
+def _substitute(value, index, cwd):
+    """ Replaces the PARAMETRIC_INDEX, HOME_DIR and WORKING_DIR macros in the string. """
+    if index is not None:
+        value = value.replace(drmaa2.PARAMETRIC_INDEX, str(index))
+    value = value.replace(drmaa2.HOME_DIR, os.path.expanduser('~'))
+    return value.replace(drmaa2.WORKING_DIR, cwd)
+
+
+class CompiledTemplate(object):
+    """ A validated job template, prepared for starting processes.
+
+        The attributes relevant for the child process are checked for macros once,
+        so that only the ones containing macros are substituted for each job.
+        The args are not part of the compiled template, but passed for each job.
+    """
+    __slots__ = ('template', '_working_directory', '_command', '_environment', '_streams', 'stage_in', 'stage_out')
+
+    def __init__(self, template):
+        _check_template(template)
+        self.template = template
+        working_directory = template.working_directory or None
+        self._working_directory = (working_directory, working_directory is not None and _has_macro(working_directory))
+        self._command = (template.remote_command, _has_macro(template.remote_command))
+        self._environment = None
+        if template.job_environment:
+            self._environment = [(key, str(value), _has_macro(str(value)))
+                                 for key, value in template.job_environment.items()]
+        self._streams = []
+        for key, path, mode in (('stdin', template.input_path, 'rb'),
+                                ('stdout', template.output_path, 'wb'),
+                                ('stderr', template.error_path, 'wb')):
+            if key == 'stderr' and template.join_files:
+                self._streams.append((key, None, mode, False))
+            elif path:
+                path = _local_path(path)
+                self._streams.append((key, path, mode, _has_macro(path)))
+            else:
+                self._streams.append((key, os.devnull, mode, False))
+        self.stage_in = self._staging(template.stage_in_files)
+        self.stage_out = self._staging(template.stage_out_files)
+
+    @staticmethod
+    def _staging(files):
+        """ Returns the (source, target, dynamic) tuples of a stage_in_files or stage_out_files dictionary. """
+        staging = []
+        for source, target in (files or {}).items():
+            source, target = _local_path(source), _local_path(target)
+            staging.append((source, target, _has_macro(source) or _has_macro(target)))
+        return staging
+
+    def working_directory(self, index):
+        cwd, dynamic = self._working_directory
+        if cwd is None:
+            return os.getcwd()
+        if dynamic:
+            return _substitute(cwd, index, os.getcwd())
+        return cwd
+
+    def transfers(self, staging, index, cwd, deduplicate):
+        """ Returns the (source, target, deduplicate) transfers for one job, with paths relative to cwd.
+            Sources depending on the PARAMETRIC_INDEX macro are never deduplicated.
+        """
+        transfers = []
+        for source, target, dynamic in staging:
+            shared = deduplicate and drmaa2.PARAMETRIC_INDEX not in source
+            if dynamic:
+                source, target = _substitute(source, index, cwd), _substitute(target, index, cwd)
+            transfers.append((os.path.join(cwd, source), os.path.join(cwd, target), shared))
+        return transfers
+
+    def popen_args(self, args, index, cwd=None):
+        """ Returns the subprocess.Popen arguments for one job, and the files opened for it. """
+        if cwd is None:
+            cwd = self.working_directory(index)
+        command, dynamic = self._command
+        command = [_substitute(command, index, cwd) if dynamic else command]
+        for arg in args or ():
+            arg = str(arg)
+            command.append(_substitute(arg, index, cwd) if _has_macro(arg) else arg)
+        env = None
+        if self._environment is not None:
+            env = dict(os.environ)
+            for key, value, dynamic in self._environment:
+                env[key] = _substitute(value, index, cwd) if dynamic else value
+        files = []
+        kwargs = {'cwd': cwd, 'env': env, 'close_fds': True}
+        try:
+            for key, path, mode, dynamic in self._streams:
+                if path is None:
+                    kwargs[key] = subprocess.STDOUT
+                    continue
+                if dynamic:
+                    path = _substitute(path, index, cwd)
+                handle = open(os.path.join(cwd, path), mode)
+                files.append(handle)
+                kwargs[key] = handle
+        except (OSError, IOError):
+            for handle in files:
+                handle.close()
+            raise
+        return command, kwargs, files
+
+
+def _template_key(value):
+    """ Returns a hashable equivalent of the template attribute value, None if there is none. """
+    if isinstance(value, (list, tuple)):
+        return tuple(_template_key(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _template_key(item)) for key, item in value.items()))
+    if isinstance(value, set):
+        return frozenset(value)
+    hash(value)
+    return value
+
+
+# Position of args in JobTemplate, the standard attributes coming before the implementation-specific ones
+_ARGS_POSITION = 1
+
+
+class TemplateCache(object):
+    """ Compiled templates by template content, args excluded, the least recently used ones being dropped.
+
+        The same template object, or a template with equal content, is validated and compiled only once,
+        only the args being checked again for each submission.
+        Templates are compiled on submission, so that the worker threads only look them up again.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._compiled = OrderedDict()
+        self._identities = {}
+        self.hits = self.misses = 0
+
+    def compile(self, template):
+        """ Returns the compiled template, raising the validation errors of the template. """
+        cached = self._identities.get(id(template))
+        if cached is not None and cached[0] is template:
+            _check_args(template.args)
+            self.hits += 1
+            return cached[1]
+        if template is None:
+            _check_template(template)
+        _check_args(template.args)
+        try:
+            # Most attributes are None, keying the others only is faster
+            key = tuple((position, _template_key(value)) for position, value in enumerate(template)
+                        if value is not None and position != _ARGS_POSITION)
+        except TypeError:
+            key = None
+        with self._lock:
+            compiled = self._compiled.pop(key, None) if key is not None else None
+            if compiled is None:
+                compiled = CompiledTemplate(template)
+                self.misses += 1
+                if len(self._compiled) >= self.maxsize:
+                    self._compiled.popitem(last=False)
+            else:
+                self.hits += 1
+            if key is not None:
+                self._compiled[key] = compiled
+            if len(self._identities) >= self.maxsize:
+                self._identities.clear()
+            self._identities[id(template)] = (template, compiled)
+        return compiled
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._compiled)}
+
+
+_templates = TemplateCache()
+
+
+def get_calendar():
+    """ Returns the ReservationCalendar of the local machine, shared by all reservation sessions of the process. """
+    global _calendar
+    with _registry_lock:
+        if _calendar is None:
+            _calendar = ReservationCalendar.from_machines([_machine_info()])
+        return _calendar
+
+
+def _check_reservation_template(template):
+    """ Raises DeniedByDrmsException if the local machine does not meet the requirements of the template. """
+    if template is None:
+        raise drmaa2.InvalidArgumentException("No reservation template given.")
+    machine = _machine_info()
+    if template.candidate_machines and machine.name not in template.candidate_machines:
+        raise drmaa2.DeniedByDrmsException("None of the candidate machines is available.")
+    if template.machine_os is not None and template.machine_os != machine.machine_os:
+        raise drmaa2.DeniedByDrmsException("Operating system %s is not available." % template.machine_os)
+    if template.machine_arch is not None and template.machine_arch != machine.machine_arch:
+        raise drmaa2.DeniedByDrmsException("CPU architecture %s is not available." % template.machine_arch)
+    if template.min_phys_memory is not None and machine.phys_memory is not None and \
+            template.min_phys_memory > machine.phys_memory:
+        raise drmaa2.DeniedByDrmsException("Not enough physical memory for the reservation.")
+
+
+class ReservationState(object):
+    """ The reservations of a reservation session by ID, in the order of their admission. """
+
+    def __init__(self, session_name, contact):
+        self.session_name = session_name
+        self.contact = contact
+        self.reservations = OrderedDict()
+
+
+class Reservation(drmaa2.Reservation):
+    def __init__(self, session_name, reservation_template, info):
+        self.reservation_id = info.reservation_id
+        self.session_name = session_name
+        self.reservation_template = reservation_template
+        self._info = info
+
+    def get_info(self):
+        return self._info
+
+    def terminate(self):
+        """ Releases the reserved slots. Terminating a reservation twice has no effect. """
+        get_calendar().remove(self.reservation_id)
+        with _registry_lock:
+            state = _reservation_sessions.get(self.session_name)
+            if state is not None:
+                state.reservations.pop(self.reservation_id, None)
+
+
+class ReservationSession(drmaa2.ReservationSession):
+    """ Reservations of slots of the local machine, admitted by the calendar of get_calendar().
+
+        The reservations do not survive the Python process, and do not restrict the jobs being run.
+    """
+
+    def __init__(self, state):
+        self._state = state
+        self.session_name = state.session_name
+        self.contact = state.contact
+        self._closed = False
+
+    def _check(self):
+        if self._closed:
+            raise drmaa2.InvalidSessionException("Reservation session was closed.")
+        with _registry_lock:
+            if _reservation_sessions.get(self.session_name) is not self._state:
+                raise drmaa2.InvalidSessionException("Reservation session %s was destroyed." % self.session_name)
+        return self._state.reservations
+
+    def get_reservation(self, reservation_id):
+        reservations = self._check()
+        with _registry_lock:
+            reservation = reservations.get(reservation_id)
+        if reservation is None:
+            raise drmaa2.InvalidArgumentException("Reservation %s does not exist." % reservation_id)
+        return reservation
+
+    def request_reservation(self, reservation_template):
+        outcome = self.request_reservations([reservation_template])[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def request_reservations(self, reservation_templates):
+        """ request_reservations(self, list) -> list
+
+            Admits the templates in one pass over the calendar, and returns a Reservation
+            or the raised exception per template.
+        """
+        reservations = self._check()
+        outcomes = []
+        admitted = []
+        for template in reservation_templates:
+            try:
+                _check_reservation_template(template)
+            except (drmaa2.DeniedByDrmsException, drmaa2.InvalidArgumentException) as e:
+                outcomes.append(e)
+            else:
+                outcomes.append(None)
+                admitted.append(template)
+        infos = iter(get_calendar().admit_all(admitted))
+        with _registry_lock:
+            for position, template in enumerate(reservation_templates):
+                if outcomes[position] is not None:
+                    continue
+                info = next(infos)
+                if not isinstance(info, Exception):
+                    info = reservations[info.reservation_id] = Reservation(self.session_name, template, info)
+                outcomes[position] = info
+        return outcomes
+
+    def get_reservations(self):
+        reservations = self._check()
+        with _registry_lock:
+            return list(reservations.values())
+
+    def iter_reservations(self, page_size=PAGE_SIZE):
+        return iter(self.get_reservations())
+
+    def close(self):
+        self._closed = True
+
+
+class MonitoringSession(drmaa2.MonitoringSession):
+    def __init__(self, contact=None):
+        self.contact = contact
+        self._closed = False
+
+    def _check(self):
+        if self._closed:
+            raise drmaa2.InvalidSessionException("Monitoring session was closed.")
+
+    def get_all_reservations(self):
+        self._check()
+        with _registry_lock:
+            return [reservation for state in _reservation_sessions.values()
+                    for reservation in state.reservations.values()]
+
+    def get_all_jobs(self, filter=None):
+        self._check()
+        with _registry_lock:
+            states = list(_job_sessions.values())
+        jobs = []
+        for state in states:
+            jobs.extend(JobSession.matching_jobs(state, filter))
+        return jobs
+
+    def iter_all_jobs(self, filter=None, page_size=PAGE_SIZE):
+        """ iter_all_jobs(self, JobInfo, int) -> generator
+
+            Yields the jobs get_all_jobs() would return, session by session. The matching jobs are looked up
+            page by page while iterating, with the session lock being held for one page at a time.
+        """
+        self._check()
+        with _registry_lock:
+            states = list(_job_sessions.values())
+        for state in states:
+            for records in state.pages(filter, page_size):
+                self._check()
+                for job in [Job.of(record) for record in records]:
+                    yield job
+
+    def iter_all_reservations(self, page_size=PAGE_SIZE):
+        self._check()
+        return iter(self.get_all_reservations())
+
+    def get_job_changes(self, cursor=None):
+        """ get_job_changes(self, str) -> (list, str)
+
+            Returns the JobInfo of all jobs created or changed since the cursor was handed out,
+            of all jobs for None, together with the cursor for the next call.
+            Reaped jobs are not reported. Cursors are opaque strings, a cursor from another
+            process is treated like None.
+        """
+        self._check()
+        number = _cursor_number(cursor)
+        cursor = _change_cursor()
+        with _registry_lock:
+            states = list(_job_sessions.values())
+        infos = []
+        for state in states:
+            infos.extend(state.changed_since(number))
+        return infos, cursor
+
+    def get_all_jobs_table(self, filter=None):
+        """ get_all_jobs_table(self, JobInfo) -> JobInfoTable
+
+            Returns the information about all jobs, as get_all_jobs() would do, in one column-oriented table.
+        """
+        self._check()
+        with _registry_lock:
+            states = list(_job_sessions.values())
+        table = JobInfoTable()
+        for state in states:
+            table.extend(record.info() for record in state.select(filter))
+        return table
+
+    def get_all_queues(self, names=None):
+        self._check()
+        if names is not None and QUEUE_NAME not in names:
+            return []
+        return [drmaa2.QueueInfo(name=QUEUE_NAME)]
+
+    def get_all_machines(self, names=None):
+        self._check()
+        if names is not None and _hostname not in names:
+            return []
+        return [_machine_info()]
+
+    def get_all_queues_table(self, names=None):
+        """ get_all_queues_table(self, list) -> QueueInfoTable """
+        return QueueInfoTable(self.get_all_queues(names))
+
+    def get_all_machines_table(self, names=None):
+        """ get_all_machines_table(self, list) -> MachineInfoTable
+
+            Returns the machines get_all_machines() would return, in one column-oriented table.
+        """
+        return MachineInfoTable(self.get_all_machines(names))
+
+    def close(self):
+        self._closed = True
+
+
+class JobSession(drmaa2.JobSession):
+    def __init__(self, state):
+        self._state = state
+        self._closed = False
+        self.contact = state.contact
+        self.session_name = state.session_name
+        self.job_categories = []
+
+    def _check(self):
+        if self._closed:
+            raise drmaa2.InvalidSessionException("Job session %s was closed." % self.session_name)
+        return self._state
+
+    @staticmethod
+    def matching_jobs(state, filter):
+        return [Job.of(record) for record in state.select(filter)]
+
+    def get_jobs(self, filter=None):
+        return self.matching_jobs(self._check(), filter)
+
+    def get_jobs_table(self, filter=None):
+        """ get_jobs_table(self, JobInfo) -> JobInfoTable
+
+            Returns the information about the session jobs, as get_jobs() would do, in one column-oriented table.
+        """
+        records = self._check().select(filter)
+        return JobInfoTable(record.info() for record in records)
+
+    def get_job_changes(self, cursor=None):
+        """ get_job_changes(self, str) -> (list, str)
+
+            Returns the JobInfo of the session jobs created or changed since the cursor was handed out,
+            as MonitoringSession.get_job_changes() does, together with the cursor for the next call.
+        """
+        state = self._check()
+        number = _cursor_number(cursor)
+        cursor = _change_cursor()
+        return state.changed_since(number), cursor
+
+    def get_job_array(self, job_array_id):
+        state = self._check()
+        with state.lock:
+            if job_array_id not in state.arrays:
+                raise drmaa2.InvalidArgumentException("Job array %s is unknown." % job_array_id)
+            return state.arrays[job_array_id]
+
+    def _submit(self, state, job_template, index=None, array_id=None):
+        record = JobRecord(state, str(next(_job_ids)), job_template, index, array_id)
+        with state.lock:
+            state.add(record)
+        if record.job_state == drmaa2.JobState.QUEUED:
+            get_pool().submit(record)
+        return record
+
+    def run_job(self, job_template):
+        state = self._check()
+        _templates.compile(job_template)
+        _throttle()
+        return Job.of(self._submit(state, job_template))
+
+    def run_bulk_jobs(self, job_template, begin_index, end_index, step, max_parallel=None):
+        state = self._check()
+        _templates.compile(job_template)
+        if begin_index < 1 or end_index < begin_index or step < 1:
+            raise drmaa2.InvalidArgumentException("Invalid bulk job index range.")
+        if max_parallel is not None and max_parallel < 1:
+            raise drmaa2.InvalidArgumentException("Invalid max_parallel value %r." % (max_parallel,))
+        array = JobArray(state, str(next(_array_ids)), begin_index, end_index, step, job_template, max_parallel)
+        with state.lock:
+            state.add_array(array)
+            array.materialize(BULK_CHUNK_SIZE)
+        array.schedule()
+        return array
+
+    def _wait_any(self, jobs, states, timeout):
+        state = self._check()
+        if not jobs:
+            raise drmaa2.InvalidArgumentException("No jobs to wait for.")
+        records = [job._record() for job in jobs]
+        record = state.wait_any(records, states, timeout)
+        # The job object of the caller, found by record identity
+        return jobs[records.index(record)]
+
+    def wait_any_started(self, jobs, timeout):
+        return self._wait_any(jobs, STARTED_STATES, timeout)
+
+    def add_state_callback(self, jobs, states, callback):
+        """ add_state_callback(self, list, set, function) -> function
+
+            Calls the function once with the first of the jobs being in one of the given JobState values,
+            without blocking and without any polling. The call happens either immediately or from the
+            backend thread changing the job state, and must therefore return quickly.
+            The returned function removes the registration, and should be called once the callback fired.
+        """
+        state = self._check()
+        jobs_by_id = dict((job.job_id, job) for job in jobs)
+        records = [job._record() for job in jobs]
+        return state.watch(records, frozenset(states), lambda job_id: callback(jobs_by_id[job_id]))
+
+    def wait_any_terminated(self, jobs, timeout):
+        return self._wait_any(jobs, TERMINATED_STATES, timeout)
+
+    def track_terminated(self, jobs):
+        """ track_terminated(self, list) -> CompletionSet
+
+            Returns a CompletionSet for the jobs, whose drain() method returns the terminated ones
+            in the order of their termination. The set should be closed once it is no longer used.
+        """
+        state = self._check()
+        return CompletionSet(state, jobs)
+
+    def wait_all_terminated(self, jobs, timeout):
+        """ wait_all_terminated(self, list, float) -> list
+
+            Blocks until all jobs terminated, and returns them in the order of their termination.
+            Raises TimeoutException if they did not terminate within the timeout.
+        """
+        return list(self.iter_terminated(jobs, timeout))
+
+    def iter_terminated(self, jobs, timeout=drmaa2.INFINITE_TIME):
+        """ iter_terminated(self, list, float) -> generator
+
+            Yields the jobs in the order of their termination. The generator raises TimeoutException
+            if not all jobs terminated within the timeout, counted from the first step.
+        """
+        seconds = _wait_seconds(timeout)
+        deadline = None if seconds is None else time.time() + seconds
+        with self.track_terminated(jobs) as completions:
+            while True:
+                jobs = completions.drain(None, drmaa2.INFINITE_TIME if deadline is None else
+                                         max(0, deadline - time.time()))
+                if not jobs:
+                    return
+                for job in jobs:
+                    yield job
+
+    def control_jobs(self, operation, jobs=None, filter=None):
+        """ control_jobs(self, str, list, JobInfo) -> dict
+
+            Applies the job control operation ('suspend', 'resume', 'hold', 'release', 'terminate' or 'reap')
+            to the given jobs, or to the session jobs matching the JobInfo filter, in batches under one lock.
+            Returns the outcome by job ID, being None on success or the exception raised for the job.
+        """
+        state = self._check()
+        if operation not in _operations:
+            raise drmaa2.InvalidArgumentException("Unknown job control operation %r." % (operation,))
+        control = _operations[operation]
+        if jobs is None:
+            job_ids = [record.job_id for record in state.select(filter)]
+        else:
+            job_ids = [job.job_id for job in jobs]
+        outcomes = {}
+        # Other threads get the session lock between the batches
+        for start in xrange(0, len(job_ids), BULK_CHUNK_SIZE):
+            with state.lock:
+                for job_id in job_ids[start:start + BULK_CHUNK_SIZE]:
+                    try:
+                        record = state.record(job_id)
+                        if control(state, record):
+                            state.queue(record)
+                        outcomes[job_id] = None
+                    except (drmaa2.InvalidStateException, drmaa2.InvalidArgumentException) as e:
+                        outcomes[job_id] = e
+        return outcomes
+
+    def get_job_infos(self, jobs):
+        """ get_job_infos(self, list) -> dict
+
+            Returns the JobInfo of the given jobs by job ID, in batches under one lock.
+            Jobs that are unknown or were reaped get the raised InvalidArgumentException instead.
+        """
+        state = self._check()
+        job_ids = [job.job_id for job in jobs]
+        infos = {}
+        for start in xrange(0, len(job_ids), BULK_CHUNK_SIZE):
+            with state.lock:
+                for job_id in job_ids[start:start + BULK_CHUNK_SIZE]:
+                    try:
+                        infos[job_id] = state.record(job_id).info()
+                    except drmaa2.InvalidArgumentException as e:
+                        infos[job_id] = e
+        return infos
+
+    def close(self):
+        self._closed = True
+
+
+class Job(drmaa2.Job):
+    """ A handle for one job of a session, as returned to the application.
+
+        Handles have no instance dictionary. Array tasks share the template of their array
+        and only keep their index. A handle takes HANDLE_SIZE bytes, plus the job ID string.
+    """
+    __slots__ = ('_state', '_template', '_index', 'job_id')
+
+    def __init__(self, state, job_id, template, index=None):
+        self._state = state
+        self._template = template
+        self._index = index
+        self.job_id = job_id
+
+    @classmethod
+    def of(cls, record):
+        return cls(record.state, record.job_id, record.template, record.index)
+
+    @property
+    def session_name(self):
+        return self._state.session_name
+
+    @property
+    def job_template(self):
+        """ The job template, with the PARAMETRIC_INDEX macro expanded for array tasks. """
+        if self._index is None:
+            return self._template
+        return expand_template(self._template, self._index)
+
+    def _record(self):
+        return self._state.record(self.job_id)
+
+    def _control(self, operation):
+        with self._state.lock:
+            record = self._record()
+            if operation(self._state, record):
+                self._state.queue(record)
+
+    def suspend(self):
+        self._control(_suspend)
+
+    def resume(self):
+        self._control(_resume)
+
+    def hold(self):
+        self._control(_hold)
+
+    def release(self):
+        self._control(_release)
+
+    def terminate(self):
+        self._control(_terminate)
+
+    def reap(self):
+        self._control(_reap)
+
+    def get_state(self):
+        with self._state.lock:
+            record = self._record()
+            return record.job_state, record.sub_state
+
+    def get_info(self):
+        with self._state.lock:
+            return self._record().info()
+
+    def _wait(self, states, timeout):
+        self._state.wait_any([self._record()], states, timeout)
+
+    def wait_started(self, timeout):
+        self._wait(STARTED_STATES, timeout)
+
+    def wait_terminated(self, timeout):
+        self._wait(TERMINATED_STATES, timeout)
+
+
+# Job control operations on a job record, called with the session lock being held.
+# They return True if the job must be queued afterwards.
+
+
+def _transition(state, record, allowed, new_state, signum=None):
+    if record.job_state not in allowed:
+        raise drmaa2.InvalidStateException("Job %s is in state %s." % (record.job_id, record.job_state.name))
+    state.set_job_state(record, new_state)
+    if signum is not None:
+        record.signal(signum)
+
+
+def _suspend(state, record):
+    _transition(state, record, (drmaa2.JobState.RUNNING,), drmaa2.JobState.SUSPENDED, signal.SIGSTOP)
+
+
+def _resume(state, record):
+    _transition(state, record, (drmaa2.JobState.SUSPENDED,), drmaa2.JobState.RUNNING, signal.SIGCONT)
+
+
+def _hold(state, record):
+    _transition(state, record, (drmaa2.JobState.QUEUED,), drmaa2.JobState.QUEUED_HELD)
+
+
+def _release(state, record):
+    _transition(state, record, (drmaa2.JobState.QUEUED_HELD,), drmaa2.JobState.QUEUED)
+    return True
+
+
+def _terminate(state, record):
+    if record.job_state in TERMINATED_STATES:
+        return
+    if record.job_state in (drmaa2.JobState.RUNNING, drmaa2.JobState.SUSPENDED):
+        # The worker thread notices the exit and moves the job to FAILED.
+        record.kill_requested = True
+        record.signal(signal.SIGKILL)
+        record.signal(signal.SIGCONT)
+    else:
+        record.annotation = "Job was terminated."
+        record.finish_time = time.time()
+        state.set_job_state(record, drmaa2.JobState.FAILED)
+
+
+def _reap(state, record):
+    if record.job_state not in TERMINATED_STATES:
+        raise drmaa2.InvalidStateException("Job %s is not terminated." % record.job_id)
+    state.remove(record)
+
+
+_operations = {'suspend': _suspend, 'resume': _resume, 'hold': _hold, 'release': _release,
+               'terminate': _terminate, 'reap': _reap}
+
+
+class JobRange(Sequence):
+    """ The jobs of a job array, as a sequence that creates the Job objects on access. """
+    __slots__ = ('_array',)
+
+    def __init__(self, array):
+        self._array = array
+
+    def __len__(self):
+        return len(self._array.indices)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in xrange(*position.indices(len(self)))]
+        return self._array.job(self._array.indices[position])
+
+    def __iter__(self):
+        job = self._array.job
+        for index in self._array.indices:
+            yield job(index)
+
+
+class JobArray(drmaa2.JobArray):
+    """ A job array, with its tasks being queued in chunks and stored as an index range.
+
+        Array tasks have the job ID '<job_array_id>.<index>'. Their job records are created
+        on demand or by the feeder thread, whatever comes first.
+
+        With max_parallel, at most that many queued tasks are handed to the worker pool at a time.
+        The others wait in the array, and each task leaving the queued or running states lets
+        the next one go from the thread changing its state. Their job records are then created
+        chunk by chunk when the waiting ones run out, instead of by the feeder thread.
+    """
+    __slots__ = ('_state', '_begin', '_step', '_next', 'indices', 'submission_time', 'job_array_id', 'jobs',
+                 'job_template', 'max_parallel', '_active', '_throttled', '_counts', 'change')
+
+    def __init__(self, state, job_array_id, begin_index, end_index, step, job_template, max_parallel=None):
+        self._state = state
+        self._begin = begin_index
+        self._step = step
+        self._next = 0
+        self.max_parallel = max_parallel
+        # IDs of the tasks given to the worker pool, and the queued ones held back
+        self._active = set()
+        self._throttled = deque()
+        self._counts = dict((job_state, 0) for job_state in drmaa2.JobState)
+        self.indices = xrange(begin_index, end_index + 1, step)
+        self.submission_time = time.time()
+        self.job_array_id = job_array_id
+        self.jobs = JobRange(self)
+        self.job_template = job_template
+        # Change number of the not yet created tasks
+        self.change = next(_change_numbers)
+
+    @property
+    def session_name(self):
+        return self._state.session_name
+
+    def row(self, store):
+        """ Returns the array as tuple for the session store, following store.ARRAY_COLUMNS. """
+        return (self.job_array_id, self.indices[0], self.indices[-1], self._step, store.template_id(self.job_template),
+                self.submission_time, self._next, self.max_parallel)
+
+    @classmethod
+    def restore(cls, state, row, template):
+        """ Creates the array from a session store row. """
+        job_array_id, begin_index, end_index, step, template_id, submission_time, materialized, max_parallel = row
+        array = cls(state, job_array_id, begin_index, end_index, step, template, max_parallel)
+        array.submission_time = submission_time
+        array._next = materialized
+        return array
+
+    def job(self, index):
+        return Job(self._state, "%s.%u" % (self.job_array_id, index), self.job_template, index)
+
+    def materialized(self):
+        return self._next >= len(self.indices)
+
+    def materialize(self, count=None):
+        """ Creates and queues the job records for the next count tasks, or all remaining ones.
+            Must be called with the session lock being held.
+        """
+        end = len(self.indices)
+        if count is not None:
+            end = min(end, self._next + count)
+        if self._next >= end:
+            return
+        state = self._state
+        start, self._next = self._next, end
+        for position in xrange(start, end):
+            record = self._task(position)
+            state.add(record)
+            self.count(record)
+            if record.job_state == drmaa2.JobState.QUEUED:
+                state.queue(record)
+        state.save_array(self)
+
+    def _task(self, position):
+        index = self.indices[position]
+        return JobRecord(self._state, "%s.%u" % (self.job_array_id, index), self.job_template,
+                         index, self.job_array_id, self.submission_time)
+
+    def _pending_span(self, filter):
+        """ Returns the (begin, end) positions of the not yet created tasks matching the JobInfo filter.
+            These tasks differ in their job ID only, so that they match as a contiguous range.
+        """
+        end = len(self.indices)
+        if self._next >= end:
+            return end, end
+        if filter is not None:
+            if not _matches(self._task(self._next).info(), filter._replace(job_id=None)):
+                return end, end
+            if filter.job_id is not None:
+                array_id, sep, index = str(filter.job_id).partition('.')
+                if array_id != self.job_array_id or not index.isdigit():
+                    return end, end
+                position, remainder = divmod(int(index) - self._begin, self._step)
+                if remainder or not self._next <= position < end:
+                    return end, end
+                return position, position + 1
+        return self._next, end
+
+    def pending(self, filter):
+        """ Returns new job records for the not yet created tasks matching the JobInfo filter, without adding
+            them to the session. Must be called with the session lock being held.
+        """
+        begin, end = self._pending_span(filter)
+        return [self._task(position) for position in xrange(begin, end)]
+
+    def page(self, filter, position, count):
+        """ Returns up to count records of the tasks from the position on matching the JobInfo filter, taken
+            from the session for created tasks and from pending() for the others, and the position for the
+            next page, or None after the last task. Must be called with the session lock being held.
+        """
+        jobs = self._state.jobs
+        records = []
+        while position < self._next and len(records) < count:
+            record = jobs.get("%s.%u" % (self.job_array_id, self.indices[position]))
+            if record is not None and jobs.matches(record, filter):
+                records.append(record)
+            position += 1
+        if position < self._next:
+            return records, position
+        begin, end = self._pending_span(filter)
+        begin = max(begin, position)
+        stop = max(begin, min(end, begin + count - len(records)))
+        records.extend(self._task(position) for position in xrange(begin, stop))
+        return records, stop if stop < end else None
+
+    def count(self, record):
+        """ Counts the new task record in the array progress. Must be called with the session lock being held. """
+        self._counts[record.job_state] += 1
+
+    def schedule(self):
+        """ Starts queueing the remaining tasks after submission or restore. """
+        if self.max_parallel is not None:
+            with self._state.lock:
+                self._fill()
+        elif not self.materialized():
+            self.start_feeder()
+
+    def throttle(self, record):
+        """ Gives the queued task to the worker pool, or holds it back if max_parallel tasks are active.
+            Must be called with the session lock being held.
+        """
+        if len(self._active) < self.max_parallel:
+            self._active.add(record.job_id)
+            get_pool().submit(record)
+        else:
+            self._throttled.append(record)
+
+    def _fill(self):
+        """ Gives waiting tasks to the worker pool until max_parallel tasks are active. """
+        jobs = self._state.jobs
+        while len(self._active) < self.max_parallel:
+            if not self._throttled:
+                if self.materialized():
+                    return
+                # Newly created tasks go through throttle()
+                self.materialize(BULK_CHUNK_SIZE)
+                continue
+            record = self._throttled.popleft()
+            # Tasks held, terminated or reaped while waiting are skipped
+            if record.job_state == drmaa2.JobState.QUEUED and jobs.get(record.job_id) is record:
+                self._active.add(record.job_id)
+                get_pool().submit(record)
+
+    def task_changed(self, record, old_state):
+        """ Updates the progress counts, and frees the slot of a task leaving the active states.
+            Must be called with the session lock being held.
+        """
+        self._counts[old_state] -= 1
+        self._counts[record.job_state] += 1
+        if record.job_id in self._active and record.job_state not in _ACTIVE_STATES:
+            self._active.discard(record.job_id)
+            self._fill()
+
+    def progress(self):
+        """ progress(self) -> dict
+
+            Returns the number of tasks in total, the number of tasks given to the worker pool and not yet
+            finished as 'active', the number of not yet created tasks as 'unsubmitted', and the number of tasks
+            in each JobState by lowercase state name. Reaped tasks stay counted in their last state.
+        """
+        with self._state.lock:
+            progress = dict((job_state.name.lower(), count) for job_state, count in self._counts.items())
+            progress['total'] = len(self.indices)
+            progress['unsubmitted'] = len(self.indices) - self._next
+            progress['active'] = len(self._active) if self.max_parallel is not None else \
+                sum(self._counts[job_state] for job_state in _ACTIVE_STATES)
+        return progress
+
+    def materialize_task(self, index):
+        """ Returns the record for the task with the given index, None for invalid or reaped tasks.
+            Must be called with the session lock being held.
+        """
+        position, remainder = divmod(index - self._begin, self._step)
+        if remainder or not 0 <= position < len(self.indices):
+            return None
+        if position >= self._next:
+            self.materialize(position + 1 - self._next)
+        return self._state.jobs.get("%s.%u" % (self.job_array_id, index))
+
+    def start_feeder(self):
+        feeder = threading.Thread(target=self.feed, name="drmaa2-local-feeder-%s" % self.job_array_id)
+        feeder.daemon = True
+        feeder.start()
+
+    def feed(self):
+        """ Queues the remaining tasks chunk by chunk, releasing the session lock in between. """
+        while True:
+            _throttle()
+            with self._state.lock:
+                if self.materialized():
+                    return
+                self.materialize(BULK_CHUNK_SIZE)
+
+    def _each(self, operation, ignored_states):
+        for job in self.jobs:
+            try:
+                operation(job)
+            except drmaa2.InvalidStateException:
+                if job.get_state()[0] not in ignored_states:
+                    raise
+
+    def suspend(self):
+        self._each(Job.suspend, STARTED_STATES - frozenset([drmaa2.JobState.RUNNING]))
+
+    def resume(self):
+        self._each(Job.resume, STARTED_STATES - frozenset([drmaa2.JobState.SUSPENDED]))
+
+    def hold(self):
+        self._each(Job.hold, STARTED_STATES | frozenset([drmaa2.JobState.QUEUED_HELD]))
+
+    def release(self):
+        self._each(Job.release, STARTED_STATES | frozenset([drmaa2.JobState.QUEUED]))
+
+    def terminate(self):
+        self._each(Job.terminate, TERMINATED_STATES)
+
+    def reap(self):
+        self._each(Job.reap, frozenset())
+
+
+_os_names = {'Linux': drmaa2.OperatingSystem.LINUX, 'Darwin': drmaa2.OperatingSystem.MACOS,
+             'FreeBSD': drmaa2.OperatingSystem.BSD, 'NetBSD': drmaa2.OperatingSystem.BSD,
+             'OpenBSD': drmaa2.OperatingSystem.BSD, 'SunOS': drmaa2.OperatingSystem.SUNOS,
+             'AIX': drmaa2.OperatingSystem.AIX, 'HP-UX': drmaa2.OperatingSystem.HPUX,
+             'Windows': drmaa2.OperatingSystem.WIN}
+
+_arch_names = {'x86_64': drmaa2.CpuArchitecture.X64, 'amd64': drmaa2.CpuArchitecture.X64,
+               'i386': drmaa2.CpuArchitecture.X86, 'i686': drmaa2.CpuArchitecture.X86,
+               'x86': drmaa2.CpuArchitecture.X86, 'aarch64': drmaa2.CpuArchitecture.ARM64,
+               'arm64': drmaa2.CpuArchitecture.ARM64, 'ia64': drmaa2.CpuArchitecture.IA64,
+               'ppc': drmaa2.CpuArchitecture.PPC, 'ppc64': drmaa2.CpuArchitecture.PPC64,
+               'ppc64le': drmaa2.CpuArchitecture.PPC64LE, 'mips': drmaa2.CpuArchitecture.MIPS,
+               'mips64': drmaa2.CpuArchitecture.MIPS64, 'sparc': drmaa2.CpuArchitecture.SPARC,
+               'sparc64': drmaa2.CpuArchitecture.SPARC64}
+
+
+def _machine_info():
+    machine = platform.machine().lower()
+    arch = _arch_names.get(machine, drmaa2.CpuArchitecture.OTHER_CPU)
+    if arch == drmaa2.CpuArchitecture.OTHER_CPU and machine.startswith('arm'):
+        arch = drmaa2.CpuArchitecture.ARM
+    release = [int(part) for part in platform.release().split('-')[0].split('.')[:2] if part.isdigit()]
+    release += [None, None]
+    try:
+        phys_memory = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // 1024
+    except (AttributeError, ValueError, OSError):
+        phys_memory = None
+    try:
+        load = os.getloadavg()[0]
+    except (AttributeError, OSError):
+        load = None
+    return drmaa2.MachineInfo(name=_hostname,
+                              available=True,
+                              sockets=1,
+                              cores_per_socket=multiprocessing.cpu_count(),
+                              threads_per_core=1,
+                              load=load,
+                              phys_memory=phys_memory,
+                              virt_memory=None,
+                              machine_os=_os_names.get(platform.system(), drmaa2.OperatingSystem.OTHER_OS),
+                              machine_os_version=drmaa2.Version(release[0], release[1]),
+                              machine_arch=arch)
+
+# Module-level functions
+
+
+def describe_attribute(instance, name):
+    return name
+
+
+def supports(capability):
+    return capability in _capabilities
+
+
+def open_store(path):
+    """ open_store(str) -> SessionStore
+
+        Keeps sessions and jobs in the given SQLite database file from now on, so that
+        a later process can continue with open_job_session(). Job and array identifiers
+        continue after the ones handed out by earlier processes.
+    """
+    global _store
+    store = SessionStore(path)
+    with _registry_lock:
+        if _store is not None:
+            _store.close()
+        _store = store
+        for counter in (_job_ids, _array_ids):
+            counter.value = max(counter.value, store.counter(counter.name))
+    return store
+
+
+def close_store():
+    """ Writes all pending changes and stops using the session store. """
+    global _store
+    with _registry_lock:
+        if _store is not None:
+            for state in _job_sessions.values():
+                state.store = None
+            _store.close()
+            _store = None
+
+
+def get_store():
+    """ Returns the session store, opening the one given by the environment on first use, or None. """
+    if _store is None and os.environ.get(STORE_ENVIRONMENT):
+        open_store(os.environ[STORE_ENVIRONMENT])
+    return _store
+
+
+def _session_exists(session_name, store):
+    return session_name in _job_sessions or session_name in _reservation_sessions or \
+        (store is not None and store.session(session_name) is not None)
+
+
+def _new_session_name(store):
+    session_name = "local-%u-%u" % (os.getpid(), next(_session_ids))
+    while _session_exists(session_name, store):
+        session_name = "local-%u-%u" % (os.getpid(), next(_session_ids))
+    return session_name
+
+
+def create_job_session(session_name=None, contact=None):
+    store = get_store()
+    with _registry_lock:
+        if session_name is None:
+            session_name = _new_session_name(store)
+        elif _session_exists(session_name, store):
+            raise drmaa2.InvalidArgumentException("Job session %s already exists." % session_name)
+        if store is not None:
+            store.add_session(session_name, 'job', contact)
+        state = SessionState(session_name, contact, store)
+        _job_sessions[session_name] = state
+    return JobSession(state)
+
+
+def create_reservation_session(session_name=None, contact=None):
+    store = get_store()
+    with _registry_lock:
+        if session_name is None:
+            session_name = _new_session_name(store)
+        elif _session_exists(session_name, store):
+            raise drmaa2.InvalidArgumentException("Reservation session %s already exists." % session_name)
+        state = ReservationState(session_name, contact)
+        _reservation_sessions[session_name] = state
+    return ReservationSession(state)
+
+
+def open_job_session(session_name):
+    store = get_store()
+    with _registry_lock:
+        state = _job_sessions.get(session_name)
+        if state is None:
+            stored = store.session(session_name) if store is not None else None
+            if stored is None or stored[0] != 'job':
+                raise drmaa2.InvalidArgumentException("Job session %s does not exist." % session_name)
+            state = SessionState(session_name, stored[1], store)
+            state.restore()
+            _job_sessions[session_name] = state
+        return JobSession(state)
+
+
+def open_reservation_session(session_name):
+    with _registry_lock:
+        state = _reservation_sessions.get(session_name)
+        if state is None:
+            raise drmaa2.InvalidArgumentException("Reservation session %s does not exist." % session_name)
+    return ReservationSession(state)
+
+
+def open_monitoring_session(contact=None):
+    return MonitoringSession(contact)
+
+
+def destroy_session(session):
+    store = get_store()
+    with _registry_lock:
+        if not _session_exists(session, store):
+            raise drmaa2.InvalidArgumentException("Session %s does not exist." % session)
+        state = _job_sessions.pop(session, None)
+        if state is not None:
+            state.store = None
+        reservation_state = _reservation_sessions.pop(session, None)
+        if reservation_state is not None:
+            for reservation_id in reservation_state.reservations:
+                get_calendar().remove(reservation_id)
+        if store is not None:
+            store.remove_session(session)
+
+
+def get_job_session_names():
+    store = get_store()
+    with _registry_lock:
+        names = set(_job_sessions)
+        if store is not None:
+            names.update(store.session_names('job'))
+        return list(names)
+
+
+def get_reservation_session_names():
+    with _registry_lock:
+        return list(_reservation_sessions)
+
+
+def get_dispatcher():
+    """ Returns the notification dispatcher, for adjusting its queue policy and reading its statistics. """
+    global _dispatcher
+    with _registry_lock:
+        if _dispatcher is None:
+            _dispatcher = Dispatcher()
+        return _dispatcher
+
+
+def _throttle():
+    """ Applies the backpressure of the notification dispatcher to job submission. """
+    if app_callback is not None:
+        _dispatcher.throttle()
+
+
+def register_event_notification(callback):
+    global app_callback
+    get_dispatcher().set_callback(callback)
+    app_callback = callback
@@ -44,10 +44,10 @@ class MonitoringSession(drmaa2.MonitoringSession):
     def get_all_reservations(self):
         return []
 
-    def get_all_jobs(self, filter):
+    def get_all_jobs(self, filter=None):
         return []
 
-    def get_all_queues(self, names):
+    def get_all_queues(self, names=None):
         return []
 
     def get_all_machines(self, names):
@@ -62,7 +62,7 @@ class JobSession:
     session_name = None
     job_categories = None
 
-    def get_jobs(self, filter):
+    def get_jobs(self, filter=None):
         return []
 
     def get_job_array(self, job_array_id):
@@ -71,7 +71,7 @@ class JobSession:
     def run_job(self, job_template):
         return Job()
 
-    def run_bulk_jobs(self, job_template, begin_index, end_index, step, max_parallel):
+    def run_bulk_jobs(self, job_template, begin_index, end_index, step, max_parallel=None):
         return JobArray()
 
     def wait_any_started(self, jobs, timeout):
@@ -101,6 +101,43 @@ class ReservationSession:
         pass
 
 
+class Reservation:
+    reservation_id = None
+    session_name = None
+    reservation_template = None
+
+    def get_info(self):
+        return drmaa2.ReservationInfo()
+
+    def terminate(self):
+        pass
+
+
+class JobArray:
+    job_array_id = None
+    jobs = None
+    session_name = None
+    job_template = None
+
+    def suspend(self):
+        pass
+
+    def resume(self):
+        pass
+
+    def hold(self):
+        pass
+
+    def release(self):
+        pass
+
+    def terminate(self):
+        pass
+
+    def reap(self):
+        pass
+
+
 class Job:
     job_id = None
     session_name = None
@@ -125,10 +162,10 @@ class Job:
         pass
 
     def get_state(self):
-        return JobState.RUNNING, "Running like hell."
+        return drmaa2.JobState.RUNNING, "Running like hell."
 
     def get_info(self):
-        return JobInfo()
+        return drmaa2.JobInfo()
 
     def wait_started(self, timeout):
         pass
@@ -183,4 +220,5 @@ def get_reservation_session_names():
 
 
 def register_event_notification(callback):
+    global app_callback
     app_callback = callback
@@ -0,0 +1,353 @@
+""" DRMAA2 Python language binding.
+
+    File staging for the stage_in_files and stage_out_files job template attributes.
+
+    The StagingEngine copies files with a fixed number of threads, so that the files of one job
+    and of concurrently starting jobs are transferred in parallel. Copies use copy_file_range()
+    or sendfile(), avoiding the transfer through user space where the kernel supports it.
+    Inputs shared by many jobs, like the ones of array tasks, can be staged through a cache of
+    read-only files named by their content hash: every distinct input is read and stored once,
+    and copied from there, or placed as hard link on request. The least recently used inputs
+    are removed from the cache when it grows beyond its size limit.
+
+    For further information, please visit drmaa.org.
+"""
+
+import os
+import time
+import errno
+import shutil
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+# Bytes per read for hashing and for copies without kernel support
+CHUNK_SIZE = 1024 * 1024
+
+# Default size limit of the input cache, in bytes
+CACHE_SIZE = 1024 ** 3
+
+# Errors of copy_file_range() and sendfile() that ask for another copy method
+_UNSUPPORTED = frozenset(getattr(errno, name) for name in ('EXDEV', 'ENOSYS', 'EINVAL', 'EOPNOTSUPP', 'ENOTSUP',
+                                                           'EBADF', 'EPERM') if hasattr(errno, name))
+
+
+def _zero_copy(source, target, size):
+    """ Copies size bytes between the file descriptors in the kernel, and returns whether this was possible. """
+    copied = 0
+    copy_file_range = getattr(os, 'copy_file_range', None)
+    if copy_file_range is not None:
+        try:
+            while copied < size:
+                count = copy_file_range(source, target, size - copied)
+                if count == 0:
+                    break
+                copied += count
+            return True
+        except OSError as e:
+            if copied or e.errno not in _UNSUPPORTED:
+                raise
+    sendfile = getattr(os, 'sendfile', None)
+    if sendfile is not None:
+        try:
+            while copied < size:
+                count = sendfile(target, source, copied, size - copied)
+                if count == 0:
+                    break
+                copied += count
+            return True
+        except OSError as e:
+            if copied or e.errno not in _UNSUPPORTED:
+                raise
+    return False
+
+
+def copy_file(source, target):
+    """ Copies the file content, and returns the number of bytes. """
+    with open(source, 'rb') as source_file:
+        size = os.fstat(source_file.fileno()).st_size
+        with open(target, 'wb') as target_file:
+            if not _zero_copy(source_file.fileno(), target_file.fileno(), size):
+                shutil.copyfileobj(source_file, target_file, CHUNK_SIZE)
+    return size
+
+
+def content_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        while True:
+            chunk = handle.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _prepare(target):
+    """ Creates the parent directory of the target, and removes an existing target file. """
+    directory = os.path.dirname(target)
+    if directory and not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+    if os.path.lexists(target):
+        os.remove(target)
+
+
+class _Group(object):
+    """ The transfers of one stage() call. """
+
+    def __init__(self, count):
+        self._count = count
+        self.error = None
+        self._done = threading.Condition(threading.Lock())
+
+    def finished(self, error):
+        with self._done:
+            self._count -= 1
+            if error is not None and self.error is None:
+                self.error = error
+            if self._count == 0:
+                self._done.notify_all()
+
+    def wait(self):
+        with self._done:
+            while self._count:
+                self._done.wait()
+
+
+class _Once(object):
+    __slots__ = ('event', 'value', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class StagingEngine(object):
+    """ Transfers files with workers threads, optionally deduplicating inputs through a content-addressed cache.
+
+        The cache lives in cache_directory, or in a new temporary directory created on first use and
+        removed by clear(). It holds at most cache_size bytes of inputs cached by this engine, inputs
+        being removed in least recently used order. Larger inputs are copied without the cache.
+        Cached inputs are copied to their targets, or placed as hard links if link is set. Linked
+        targets share the read-only file of the cache, and must therefore not be changed by the jobs.
+    """
+
+    def __init__(self, workers=4, cache_directory=None, link=False, cache_size=CACHE_SIZE):
+        self.workers = workers
+        self.link = link
+        self.cache_size = cache_size
+        self._cache_directory = cache_directory
+        self._temporary = False
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+        # Content hashes by file identity, and cached copies by content hash, with in-flight computations
+        self._digests = {}
+        self._entries = {}
+        # Sizes of the cached copies by content hash in the order of their last use, their total,
+        # and the number of transfers using each of them
+        self._sizes = OrderedDict()
+        self._cached_bytes = 0
+        self._pins = {}
+        self._counters = dict.fromkeys(('files', 'bytes', 'linked', 'deduplicated', 'evicted'), 0)
+
+    def _start(self):
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name="drmaa2-local-staging-%u" % len(self._threads))
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+
+    def stage(self, transfers):
+        """ stage(self, list) -> float
+
+            Performs the (source, target, deduplicate) transfers in parallel, and returns the seconds taken.
+            Missing target directories are created. Raises the first error of a transfer, after all
+            transfers finished.
+        """
+        start = time.time()
+        if not transfers:
+            return 0.0
+        self._start()
+        group = _Group(len(transfers))
+        for source, target, deduplicate in transfers:
+            self._queue.put((group, source, target, deduplicate))
+        group.wait()
+        if group.error is not None:
+            raise group.error
+        return time.time() - start
+
+    def _work(self):
+        while True:
+            group, source, target, deduplicate = self._queue.get()
+            try:
+                if deduplicate:
+                    self._place(source, target)
+                else:
+                    _prepare(target)
+                    self._count('bytes', copy_file(source, target))
+                    shutil.copymode(source, target)
+                self._count('files')
+            except Exception as e:
+                group.finished(e)
+            else:
+                group.finished(None)
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def _once(self, table, key, function):
+        """ Returns function() for the key, computed once even for concurrent callers. Errors are not kept. """
+        with self._lock:
+            entry = table.get(key)
+            owner = entry is None
+            if owner:
+                entry = table[key] = _Once()
+        if owner:
+            try:
+                entry.value = function()
+            except Exception as e:
+                entry.error = e
+                with self._lock:
+                    del table[key]
+            entry.event.set()
+        else:
+            entry.event.wait()
+        if entry.error is not None:
+            raise entry.error
+        return entry.value, owner
+
+    def cache_directory(self):
+        with self._lock:
+            if self._cache_directory is None:
+                self._cache_directory = tempfile.mkdtemp(prefix="drmaa2-staging-")
+                self._temporary = True
+            return self._cache_directory
+
+    def _cache(self, source, digest):
+        """ Copies the source into the cache under its content hash, and returns the cached path. """
+        path = os.path.join(self.cache_directory(), digest)
+        if not os.path.exists(path):
+            partial = "%s.%u" % (path, threading.current_thread().ident)
+            self._count('bytes', copy_file(source, partial))
+            os.chmod(partial, 0o444)
+            os.rename(partial, path)
+        size = os.stat(path).st_size
+        with self._lock:
+            self._sizes[digest] = size
+            self._cached_bytes += size
+            self._evict(digest)
+        return path
+
+    def _evict(self, keep):
+        """ Removes least recently used inputs not in use until the cache fits its size limit.
+            Must be called with the lock being held.
+        """
+        for digest in list(self._sizes):
+            if self._cached_bytes <= self.cache_size:
+                break
+            if digest == keep or self._pins.get(digest):
+                continue
+            try:
+                os.remove(os.path.join(self._cache_directory, digest))
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    continue
+            self._cached_bytes -= self._sizes.pop(digest)
+            self._entries.pop(digest, None)
+            self._counters['evicted'] += 1
+
+    def _acquire(self, source, digest):
+        """ Returns the cached path of the content, caching it if needed, and whether it was cached before.
+            The cached file is kept until release() is called for the content hash.
+        """
+        while True:
+            cached, owner = self._once(self._entries, digest, lambda: self._cache(source, digest))
+            with self._lock:
+                # Evicted in the meantime otherwise
+                size = self._sizes.pop(digest, None)
+                if size is not None:
+                    self._sizes[digest] = size
+                    self._pins[digest] = self._pins.get(digest, 0) + 1
+                    return cached, owner
+
+    def _release(self, digest):
+        with self._lock:
+            self._pins[digest] -= 1
+            if not self._pins[digest]:
+                del self._pins[digest]
+
+    def _place(self, source, target):
+        status = os.stat(source)
+        if status.st_size > self.cache_size:
+            _prepare(target)
+            self._count('bytes', copy_file(source, target))
+            shutil.copymode(source, target)
+            return
+        identity = (status.st_dev, status.st_ino, status.st_size, status.st_mtime)
+        digest = self._once(self._digests, identity, lambda: content_hash(source))[0]
+        cached, owner = self._acquire(source, digest)
+        try:
+            if not owner:
+                self._count('deduplicated')
+            _prepare(target)
+            if self.link:
+                try:
+                    os.link(cached, target)
+                    self._count('linked')
+                    return
+                except OSError as e:
+                    if e.errno not in _UNSUPPORTED and e.errno not in (errno.EMLINK, errno.EACCES):
+                        raise
+            self._count('bytes', copy_file(cached, target))
+            os.chmod(target, status.st_mode & 0o7777)
+        finally:
+            self._release(digest)
+
+    def stats(self):
+        """ Returns the number of staged files and copied bytes, the number of linked, deduplicated and evicted
+            files, and the number of bytes in the cache.
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            stats['cached_bytes'] = self._cached_bytes
+        return stats
+
+    def clear(self):
+        """ Removes the inputs cached by this engine, and the cache directory if it is a temporary one.
+            Other files in a given cache directory are left alone.
+        """
+        with self._lock:
+            directory = self._cache_directory
+            temporary = self._temporary
+            if temporary:
+                self._cache_directory = None
+                self._temporary = False
+            cached = set(self._entries) | set(self._sizes)
+            self._digests.clear()
+            self._entries.clear()
+            self._sizes.clear()
+            self._cached_bytes = 0
+        if directory is None:
+            return
+        if temporary:
+            shutil.rmtree(directory, ignore_errors=True)
+            return
+        for digest in cached:
+            try:
+                os.remove(os.path.join(directory, digest))
+            except OSError:
+                pass
@@ -0,0 +1,303 @@
+""" DRMAA2 Python language binding.
+
+    Persistent storage of sessions, jobs and job arrays in an SQLite database, for usage by backends.
+
+    For further information, please visit drmaa.org.
+"""
+
+import json
+import numbers
+import sqlite3
+import hashlib
+import datetime
+import threading
+from enum import Enum
+
+import drmaa2
+from drmaa2.backend.connections import ConnectionPool
+
+JOB_COLUMNS = ('job_id', 'template', 'task_index', 'array_id', 'job_state', 'sub_state', 'exit_status',
+               'terminating_signal', 'annotation', 'cpu_time', 'submission_time', 'dispatch_time', 'finish_time',
+               'staging_time')
+
+ARRAY_COLUMNS = ('array_id', 'begin_index', 'end_index', 'step', 'template', 'submission_time', 'materialized',
+                 'max_parallel')
+
+_schema = """
+CREATE TABLE IF NOT EXISTS sessions (name TEXT PRIMARY KEY, kind TEXT NOT NULL, contact TEXT);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS templates (id TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS arrays (session TEXT NOT NULL, array_id TEXT NOT NULL, begin_index INTEGER,
+    end_index INTEGER, step INTEGER, template TEXT, submission_time REAL, materialized INTEGER,
+    max_parallel INTEGER, PRIMARY KEY (session, array_id));
+CREATE TABLE IF NOT EXISTS jobs (session TEXT NOT NULL, job_id TEXT NOT NULL, template TEXT, task_index INTEGER,
+    array_id TEXT, job_state INTEGER, sub_state TEXT, exit_status INTEGER, terminating_signal TEXT,
+    annotation TEXT, cpu_time REAL, submission_time REAL, dispatch_time REAL, finish_time REAL,
+    staging_time REAL, PRIMARY KEY (session, job_id));
+"""
+
+# Number of template objects remembered by identity, to avoid serializing them again
+_TEMPLATE_CACHE_SIZE = 1024
+
+# Connections for reading, besides the one for writing
+READERS = 4
+
+try:
+    _string_types = (str, unicode)
+except NameError:
+    _string_types = (str,)
+
+
+def _encode(value):
+    """ Returns the template attribute value as JSON data, tagging the values JSON has no type for.
+        Values of unknown types are stored by their repr(), and restored as that string.
+    """
+    if value is None or isinstance(value, (bool, int, float) + _string_types):
+        return value
+    if isinstance(value, numbers.Integral):
+        return int(value)
+    if isinstance(value, numbers.Real):
+        return float(value)
+    if isinstance(value, list):
+        return [_encode(item) for item in value]
+    if isinstance(value, tuple):
+        return {'$tuple': [_encode(item) for item in value]}
+    if isinstance(value, dict):
+        if all(isinstance(key, _string_types) and not key.startswith('$') for key in value):
+            return dict((key, _encode(item)) for key, item in value.items())
+        return {'$dict': [[_encode(key), _encode(item)] for key, item in value.items()]}
+    if isinstance(value, Enum) and getattr(drmaa2, type(value).__name__, None) is type(value):
+        return {'$enum': [type(value).__name__, value.name]}
+    if isinstance(value, datetime.datetime) and value.tzinfo is None:
+        return {'$datetime': list(value.timetuple()[:6]) + [value.microsecond]}
+    return {'$repr': repr(value)}
+
+
+def _decode(value):
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if len(value) == 1:
+        tag, data = next(iter(value.items()))
+        if tag == '$tuple':
+            return tuple(_decode(item) for item in data)
+        if tag == '$dict':
+            return dict((_decode(key), _decode(item)) for key, item in data)
+        if tag == '$enum':
+            return getattr(getattr(drmaa2, data[0]), data[1])
+        if tag == '$datetime':
+            return datetime.datetime(*data)
+        if tag == '$repr':
+            return data
+    return dict((key, _decode(item)) for key, item in value.items())
+
+
+class SessionStore(object):
+    """ Sessions and the last known state of their jobs, kept in an SQLite database in WAL mode.
+
+        Session changes are written immediately. Job and array rows are collected in memory,
+        with later updates of a row replacing earlier ones, and written in one transaction
+        by a background thread every flush_interval seconds. Job templates are stored once
+        per distinct content and referenced by their hash. Reads use connections of their own
+        from a ConnectionPool keyed by the database path, so that they do not wait for writes.
+    """
+
+    def __init__(self, path, flush_interval=0.05):
+        self.path = path
+        self.flush_interval = flush_interval
+        # Guards the connection
+        self._lock = threading.Lock()
+        # Guards the rows waiting to be written
+        self._pending_lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        # In-memory databases exist for their connection only
+        self._readers = None
+        if path != ':memory:':
+            self._readers = ConnectionPool(self._connect, max_connections=READERS, idle_timeout=60.0,
+                                           health_check=lambda connection: connection.execute("SELECT 1"))
+        self._connection.executescript(_schema)
+        self._dirty_jobs = {}
+        self._dirty_arrays = {}
+        self._counters = {}
+        self._template_ids = {}
+        self._stored_templates = set(row[0] for row in self._connection.execute("SELECT id FROM templates"))
+        self._new_templates = {}
+        self._closed = False
+        # Last failure of writing the queued rows, None after a successful flush
+        self.error = None
+        self._wakeup = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="drmaa2-session-store")
+        self._thread.daemon = True
+        self._thread.start()
+
+    @staticmethod
+    def _connect(path):
+        return sqlite3.connect(path, check_same_thread=False)
+
+    def _read(self, query, parameters=()):
+        """ Returns the rows of the query, read through a pooled connection. """
+        if self._readers is None:
+            with self._lock:
+                return self._connection.execute(query, parameters).fetchall()
+        with self._readers.connection(self.path) as connection:
+            return connection.execute(query, parameters).fetchall()
+
+    # Sessions
+
+    def add_session(self, name, kind, contact):
+        with self._lock:
+            with self._connection:
+                self._connection.execute("INSERT INTO sessions VALUES (?, ?, ?)", (name, kind, contact))
+
+    def remove_session(self, name):
+        with self._lock:
+            with self._pending_lock:
+                for dirty in (self._dirty_jobs, self._dirty_arrays):
+                    for key in [key for key in dirty if key[0] == name]:
+                        del dirty[key]
+            with self._connection:
+                for table, column in (('sessions', 'name'), ('jobs', 'session'), ('arrays', 'session')):
+                    self._connection.execute("DELETE FROM %s WHERE %s = ?" % (table, column), (name,))
+
+    def session(self, name):
+        """ Returns the kind and contact of the stored session, or None. """
+        rows = self._read("SELECT kind, contact FROM sessions WHERE name = ?", (name,))
+        return rows[0] if rows else None
+
+    def session_names(self, kind):
+        return [row[0] for row in self._read("SELECT name FROM sessions WHERE kind = ?", (kind,))]
+
+    # Counters for identifiers that must stay unique across restarts
+
+    def counter(self, name):
+        rows = self._read("SELECT value FROM counters WHERE name = ?", (name,))
+        return rows[0][0] if rows else 0
+
+    def put_counter(self, name, value):
+        with self._pending_lock:
+            self._counters[name] = value
+
+    # Jobs and arrays
+
+    def template_id(self, template):
+        """ Returns the content hash of the template, queueing it for storage if it is new. """
+        cached = self._template_ids.get(id(template))
+        if cached is not None and cached[0] is template:
+            return cached[1]
+        data = json.dumps(dict((name, _encode(value)) for name, value in template._asdict().items()
+                               if value is not None), sort_keys=True)
+        template_id = hashlib.sha1(data.encode('utf-8')).hexdigest()
+        with self._pending_lock:
+            if template_id not in self._stored_templates:
+                self._stored_templates.add(template_id)
+                self._new_templates[template_id] = data
+            if len(self._template_ids) >= _TEMPLATE_CACHE_SIZE:
+                self._template_ids.clear()
+            self._template_ids[id(template)] = (template, template_id)
+        return template_id
+
+    def template(self, template_id):
+        with self._pending_lock:
+            data = self._new_templates.get(template_id)
+        if data is None:
+            data = self._read("SELECT data FROM templates WHERE id = ?", (template_id,))[0][0]
+        attributes = dict((name, _decode(value)) for name, value in json.loads(data).items())
+        return drmaa2.JobTemplate(**dict((name, value) for name, value in attributes.items()
+                                         if name in drmaa2.JobTemplate._fields))
+
+    def put_job(self, session_name, row):
+        """ Queues the job row, a tuple following JOB_COLUMNS, for storage. """
+        with self._pending_lock:
+            self._dirty_jobs[(session_name, row[0])] = row
+
+    def delete_job(self, session_name, job_id):
+        with self._pending_lock:
+            self._dirty_jobs[(session_name, job_id)] = None
+
+    def put_array(self, session_name, row):
+        """ Queues the array row, a tuple following ARRAY_COLUMNS, for storage. """
+        with self._pending_lock:
+            self._dirty_arrays[(session_name, row[0])] = row
+
+    def jobs(self, session_name):
+        """ Returns the stored job rows of the session, as tuples following JOB_COLUMNS. """
+        self.flush()
+        return self._read("SELECT %s FROM jobs WHERE session = ?" % ", ".join(JOB_COLUMNS), (session_name,))
+
+    def arrays(self, session_name):
+        """ Returns the stored array rows of the session, as tuples following ARRAY_COLUMNS. """
+        self.flush()
+        return self._read("SELECT %s FROM arrays WHERE session = ?" % ", ".join(ARRAY_COLUMNS), (session_name,))
+
+    def flush(self):
+        """ Writes all queued rows in one transaction.
+
+            If the transaction fails, the rows stay queued for the next attempt and an InternalException
+            is raised. The background thread keeps its failures in the error attribute instead, the rows
+            it could not write being retried, and raised if still failing, by the next flush() or close().
+        """
+        try:
+            self._write()
+        except sqlite3.Error as e:
+            self.error = e
+            raise drmaa2.InternalException("Session store %s could not be written: %s" % (self.path, e))
+        self.error = None
+
+    def _write(self):
+        with self._lock:
+            # Backend threads queueing rows never wait for the database
+            with self._pending_lock:
+                jobs, self._dirty_jobs = self._dirty_jobs, {}
+                arrays, self._dirty_arrays = self._dirty_arrays, {}
+                counters, self._counters = self._counters, {}
+                templates, self._new_templates = self._new_templates, {}
+            if not (jobs or arrays or counters or templates):
+                return
+            try:
+                self._commit(jobs, arrays, counters, templates)
+            except sqlite3.Error:
+                # Queued again, rows queued in the meantime being newer
+                with self._pending_lock:
+                    for rows, dirty in ((jobs, self._dirty_jobs), (arrays, self._dirty_arrays),
+                                        (counters, self._counters), (templates, self._new_templates)):
+                        for key, row in rows.items():
+                            dirty.setdefault(key, row)
+                raise
+
+    def _commit(self, jobs, arrays, counters, templates):
+        with self._connection as connection:
+            connection.executemany("INSERT OR REPLACE INTO templates VALUES (?, ?)", list(templates.items()))
+            connection.executemany("INSERT OR REPLACE INTO counters VALUES (?, ?)", list(counters.items()))
+            connection.executemany("INSERT OR REPLACE INTO arrays VALUES (?, %s)" % ", ".join("?" * len(ARRAY_COLUMNS)),
+                                   [(key[0],) + tuple(row) for key, row in arrays.items()])
+            connection.executemany("DELETE FROM jobs WHERE session = ? AND job_id = ?",
+                                   [key for key, row in jobs.items() if row is None])
+            connection.executemany("INSERT OR REPLACE INTO jobs VALUES (?, %s)" % ", ".join("?" * len(JOB_COLUMNS)),
+                                   [(key[0],) + tuple(row) for key, row in jobs.items() if row is not None])
+
+    def close(self):
+        """ Writes the queued rows and closes the database, raising an InternalException if they are lost. """
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join()
+        try:
+            self.flush()
+        finally:
+            if self._readers is not None:
+                self._readers.close()
+            with self._lock:
+                self._connection.close()
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            if not self._closed:
+                try:
+                    self._write()
+                    self.error = None
+                except sqlite3.Error as e:
+                    # Retried with the next interval
+                    self.error = e
@@ -0,0 +1,66 @@
+""" DRMAA2 Python language binding.
+
+    Job control operations on many jobs of a job session at once.
+
+    For further information, please visit drmaa.org.
+"""
+
+import drmaa2
+
+OPERATIONS = ('suspend', 'resume', 'hold', 'release', 'terminate', 'reap')
+
+
+def control_jobs(session, operation, jobs=None, filter=None):
+    """ control_jobs(JobSession, str, list, JobInfo) -> dict
+
+        Applies the job control operation to the jobs, or to the session jobs matching the JobInfo filter,
+        all session jobs for neither of them. Returns the outcome by job ID, being None on success
+        or the exception raised for the job.
+    """
+    if operation not in OPERATIONS:
+        raise drmaa2.InvalidArgumentException("Unknown job control operation %r." % (operation,))
+    native = getattr(session, 'control_jobs', None)
+    if native is not None:
+        return native(operation, jobs, filter)
+    if jobs is None:
+        jobs = session.get_jobs(filter)
+    outcomes = {}
+    for job in jobs:
+        try:
+            getattr(job, operation)()
+            outcomes[job.job_id] = None
+        except (drmaa2.InvalidStateException, drmaa2.InvalidArgumentException) as e:
+            outcomes[job.job_id] = e
+    return outcomes
+
+
+def failed(outcomes):
+    """ failed(dict) -> dict
+
+        Returns the outcomes of the jobs the operation failed for.
+    """
+    return dict((job_id, outcome) for job_id, outcome in outcomes.items() if outcome is not None)
+
+
+def suspend_jobs(session, jobs=None, filter=None):
+    return control_jobs(session, 'suspend', jobs, filter)
+
+
+def resume_jobs(session, jobs=None, filter=None):
+    return control_jobs(session, 'resume', jobs, filter)
+
+
+def hold_jobs(session, jobs=None, filter=None):
+    return control_jobs(session, 'hold', jobs, filter)
+
+
+def release_jobs(session, jobs=None, filter=None):
+    return control_jobs(session, 'release', jobs, filter)
+
+
+def terminate_jobs(session, jobs=None, filter=None):
+    return control_jobs(session, 'terminate', jobs, filter)
+
+
+def reap_jobs(session, jobs=None, filter=None):
+    return control_jobs(session, 'reap', jobs, filter)
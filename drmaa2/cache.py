@@ -0,0 +1,162 @@
+""" DRMAA2 Python language binding.
+
+    Client-side caching of the machine and queue information of a MonitoringSession.
+
+    For further information, please visit drmaa.org.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+import drmaa2
+from drmaa2 import paging
+
+
+class InfoCache(object):
+    """ Name-keyed MachineInfo or QueueInfo instances from the last full listing, with a time to live.
+
+        A full listing is fetched on a miss and serves all later lookups by name until it expires.
+        At most maxsize entries are kept, the least recently used ones being evicted first.
+        A listing with evicted entries is incomplete, so lookups of unknown names miss again.
+    """
+
+    def __init__(self, fetch, ttl, maxsize, clock):
+        self._fetch = fetch
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._expires = None
+        self._complete = False
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def _fresh(self):
+        return self._expires is not None and self._clock() < self._expires
+
+    def get(self, names):
+        """ Returns the cached instances for the names, all of them for None, or None on a miss. """
+        if not self._fresh():
+            return None
+        if names is None:
+            if not self._complete:
+                return None
+            self.hits += 1
+            return list(self._entries.values())
+        result = []
+        for name in names:
+            info = self._entries.get(name)
+            if info is not None:
+                self._entries[name] = self._entries.pop(name)
+                result.append(info)
+            elif not self._complete:
+                return None
+        self.hits += 1
+        return result
+
+    def load(self):
+        """ Fetches the full listing from the session, replacing all entries. """
+        self.misses += 1
+        infos = self._fetch(None)
+        self._entries.clear()
+        for info in infos:
+            self._entries[info.name] = info
+        self._complete = True
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+            self._complete = False
+        self._expires = self._clock() + self.ttl
+        return infos
+
+    def invalidate(self, names=None):
+        if names is None:
+            self._entries.clear()
+            self._expires = None
+        else:
+            for name in names:
+                if self._entries.pop(name, None) is not None:
+                    self._complete = False
+        self.invalidations += 1
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'invalidations': self.invalidations, 'size': len(self._entries)}
+
+
+class CachingMonitoringSession(drmaa2.MonitoringSession):
+    """ Wraps a MonitoringSession, serving get_all_machines() and get_all_queues() from a cache.
+
+        Machine and queue listings are cached for machine_ttl and queue_ttl seconds. All other methods
+        are passed to the wrapped session. Applications that register for event notifications
+        should pass them to handle_notification(), so that ATTRIBUTE_CHANGE events invalidate the cache.
+    """
+
+    def __init__(self, session, machine_ttl=30, queue_ttl=300, maxsize=100000, clock=time.time):
+        self.session = session
+        self._lock = threading.Lock()
+        self._machines = InfoCache(session.get_all_machines, machine_ttl, maxsize, clock)
+        self._queues = InfoCache(session.get_all_queues, queue_ttl, maxsize, clock)
+
+    def _get(self, cache, names):
+        with self._lock:
+            result = cache.get(names)
+            if result is not None:
+                return result
+            infos = cache.load()
+        if names is None:
+            return list(infos)
+        names = set(names)
+        return [info for info in infos if info.name in names]
+
+    def get_all_reservations(self):
+        return self.session.get_all_reservations()
+
+    def get_all_jobs(self, filter=None):
+        return self.session.get_all_jobs(filter)
+
+    def iter_all_jobs(self, filter=None, page_size=paging.PAGE_SIZE):
+        return paging.iter_all_jobs(self.session, filter, page_size)
+
+    def iter_all_reservations(self, page_size=paging.PAGE_SIZE):
+        return paging.iter_all_reservations(self.session, page_size)
+
+    def get_job_changes(self, cursor=None):
+        return self.session.get_job_changes(cursor)
+
+    def get_all_queues(self, names=None):
+        return self._get(self._queues, names)
+
+    def get_all_machines(self, names=None):
+        return self._get(self._machines, names)
+
+    def invalidate(self, machines=True, queues=True, names=None):
+        """ invalidate(self, bool, bool, list) -> None
+
+            Drops the cached machine and/or queue information, for the given names or completely.
+        """
+        with self._lock:
+            if machines:
+                self._machines.invalidate(names)
+            if queues:
+                self._queues.invalidate(names)
+
+    def handle_notification(self, notification):
+        """ handle_notification(self, Notification) -> None
+
+            Invalidates the cache on ATTRIBUTE_CHANGE events. Meant to be called from the application callback
+            given to register_event_notification().
+        """
+        if notification.event == drmaa2.Event.ATTRIBUTE_CHANGE:
+            self.invalidate()
+
+    def stats(self):
+        """ stats(self) -> dict
+
+            Returns hit, miss, eviction and invalidation counters for the machine and the queue cache.
+        """
+        with self._lock:
+            return {'machines': self._machines.stats(), 'queues': self._queues.stats()}
+
+    def close(self):
+        self.session.close()
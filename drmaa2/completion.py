@@ -0,0 +1,122 @@
+""" DRMAA2 Python language binding.
+
+    Waiting for many jobs at once: for all of them, or for the terminated ones in completion order.
+
+    For further information, please visit drmaa.org.
+"""
+
+import time
+from collections import OrderedDict
+
+import drmaa2
+
+
+def _deadline(timeout):
+    if timeout is None or timeout == drmaa2.INFINITE_TIME:
+        return None
+    if timeout < 0:
+        raise drmaa2.InvalidArgumentException("Invalid timeout %r." % (timeout,))
+    return time.time() + timeout
+
+
+def _remaining(deadline):
+    return drmaa2.INFINITE_TIME if deadline is None else max(drmaa2.ZERO_TIME, deadline - time.time())
+
+
+class Completions(object):
+    """ Collects the terminated jobs out of a set of jobs with wait_any_terminated() calls of the session. """
+
+    def __init__(self, session, jobs):
+        self.session = session
+        # The job objects of the caller, by job ID
+        self._pending = OrderedDict((job.job_id, job) for job in jobs)
+
+    def remaining(self):
+        """ Returns the number of jobs not yet returned by drain(). """
+        return len(self._pending)
+
+    def drain(self, max_jobs=None, timeout=drmaa2.INFINITE_TIME):
+        """ drain(self, int, float) -> list
+
+            Returns up to max_jobs terminated jobs not returned before. Blocks until at least one job
+            terminated, and raises TimeoutException if none did within the timeout.
+            Returns an empty list once all jobs were returned.
+        """
+        if max_jobs is not None and max_jobs < 1:
+            raise drmaa2.InvalidArgumentException("Invalid maximum number of jobs %r." % (max_jobs,))
+        if not self._pending:
+            return []
+        job = self.session.wait_any_terminated(list(self._pending.values()), timeout)
+        jobs = [self._pending.pop(job.job_id)]
+        while self._pending and (max_jobs is None or len(jobs) < max_jobs):
+            try:
+                job = self.session.wait_any_terminated(list(self._pending.values()), drmaa2.ZERO_TIME)
+            except drmaa2.TimeoutException:
+                break
+            jobs.append(self._pending.pop(job.job_id))
+        return jobs
+
+    def __iter__(self):
+        while True:
+            jobs = self.drain()
+            if not jobs:
+                return
+            for job in jobs:
+                yield job
+
+    def close(self):
+        self._pending.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+def track_terminated(session, jobs):
+    """ track_terminated(JobSession, list) -> object
+
+        Returns an object with drain(max_jobs, timeout), remaining() and close() methods for the jobs,
+        being the native completion set of the session if available.
+    """
+    native = getattr(session, 'track_terminated', None)
+    if native is not None:
+        return native(jobs)
+    return Completions(session, jobs)
+
+
+def iter_terminated(session, jobs, timeout=drmaa2.INFINITE_TIME):
+    """ iter_terminated(JobSession, list, float) -> generator
+
+        Yields the jobs in the order of their termination. The generator raises TimeoutException
+        if not all jobs terminated within the timeout, counted from the first step.
+    """
+    native = getattr(session, 'iter_terminated', None)
+    if native is not None:
+        return native(jobs, timeout)
+    return _iterate(session, jobs, timeout)
+
+
+def _iterate(session, jobs, timeout):
+    deadline = _deadline(timeout)
+    with track_terminated(session, jobs) as completions:
+        while True:
+            jobs = completions.drain(None, _remaining(deadline))
+            if not jobs:
+                return
+            for job in jobs:
+                yield job
+
+
+def wait_all_terminated(session, jobs, timeout):
+    """ wait_all_terminated(JobSession, list, float) -> list
+
+        Blocks until all jobs terminated, and returns them in the order of their termination.
+        Raises TimeoutException if they did not terminate within the timeout.
+    """
+    native = getattr(session, 'wait_all_terminated', None)
+    if native is not None:
+        return native(jobs, timeout)
+    return list(iter_terminated(session, jobs, timeout))
@@ -0,0 +1,211 @@
+""" DRMAA2 Python language binding.
+
+    Call counts and latency histograms for the API functions and methods of a backend.
+
+    enable() replaces the module functions of the backend and the API methods of its JobSession, Job,
+    JobArray, MonitoringSession, ReservationSession and Reservation classes with measuring wrappers,
+    disable() puts the originals back. Disabled backends therefore run without any overhead.
+    Hooks added with add_hook() are called around each measured call, e.g. for tracing.
+
+    For further information, please visit drmaa.org.
+"""
+
+import math
+import time
+import types
+import functools
+import threading
+
+import drmaa2
+from drmaa2 import backend as backends
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+# Module-level API functions, as delegated to the backend by the drmaa2 module
+API_FUNCTIONS = ('supports', 'create_job_session', 'create_reservation_session', 'open_job_session',
+                 'open_reservation_session', 'open_monitoring_session', 'destroy_session', 'get_job_session_names',
+                 'get_reservation_session_names', 'register_event_notification', 'describe_attribute')
+
+# Classes with API methods, the backend classes being found by these names
+API_CLASSES = ('JobSession', 'Job', 'JobArray', 'MonitoringSession', 'ReservationSession', 'Reservation')
+
+# Histogram buckets, the upper bound of bucket i being 2 ** i microseconds and the last one being unbounded
+BUCKETS = 28
+
+
+class Histogram(object):
+    """ Latencies of one method, in buckets growing by powers of two. Guarded by the module lock. """
+    __slots__ = ('count', 'errors', 'total', 'min', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = self.errors = 0
+        self.total = 0.0
+        self.min = self.max = None
+        self.buckets = [0] * BUCKETS
+
+    def add(self, seconds, error):
+        self.count += 1
+        if error:
+            self.errors += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+        exponent = math.frexp(seconds * 1e6)[1] if seconds > 0 else 0
+        self.buckets[max(0, min(exponent, BUCKETS - 1))] += 1
+
+    def quantile(self, fraction):
+        """ Returns the upper bound of the bucket holding the given fraction of the calls, in seconds. """
+        rank = fraction * self.count
+        seen = 0
+        for position, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return self.max if position == BUCKETS - 1 else min(self.max, 2 ** position * 1e-6)
+        return self.max
+
+    def summary(self):
+        return {'count': self.count, 'errors': self.errors, 'total': self.total, 'min': self.min, 'max': self.max,
+                'mean': self.total / self.count if self.count else None,
+                'p50': self.quantile(0.5), 'p90': self.quantile(0.9), 'p99': self.quantile(0.99),
+                'buckets': [(2 ** position * 1e-6 if position < BUCKETS - 1 else None, count)
+                            for position, count in enumerate(self.buckets) if count]}
+
+
+_lock = threading.Lock()
+_patch_lock = threading.Lock()
+# Histograms by (backend name, method name)
+_histograms = {}
+# Replaced attributes by backend name, as (owner, name, original value or None) tuples
+_patched = {}
+_hooks = []
+
+
+def _record(key, seconds, error):
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.add(seconds, error)
+
+
+def _wrap(backend_name, method, function):
+    key = (backend_name, method)
+
+    @functools.wraps(function)
+    def measured(*args, **kwargs):
+        finishers = [finish for finish in (hook(backend_name, method) for hook in _hooks) if finish is not None]
+        error = None
+        start = _clock()
+        try:
+            return function(*args, **kwargs)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            seconds = _clock() - start
+            _record(key, seconds, error)
+            for finish in finishers:
+                finish(seconds, error)
+    return measured
+
+
+def _targets(module):
+    """ Returns the (owner, name, method name, function) tuples of the API of the backend module. """
+    targets = []
+    for name in API_FUNCTIONS:
+        function = getattr(module, name, None)
+        if isinstance(function, types.FunctionType):
+            targets.append((module, name, name, function))
+    for class_name in API_CLASSES:
+        cls = getattr(module, class_name, None)
+        if not isinstance(cls, type):
+            continue
+        api = getattr(drmaa2, class_name)
+        for name, stub in vars(api).items():
+            if name.startswith('_') or not isinstance(stub, types.FunctionType):
+                continue
+            for owner in cls.__mro__:
+                if owner is api:
+                    break
+                function = vars(owner).get(name)
+                if isinstance(function, types.FunctionType):
+                    targets.append((cls, name, "%s.%s" % (class_name, name), function))
+                    break
+    return targets
+
+
+def enable(backend=None):
+    """ enable(str) -> None
+
+        Starts measuring the calls of the named backend, or of the default one.
+    """
+    module = backends.load(backend)
+    with _patch_lock:
+        if module.__name__ in _patched:
+            return
+        # Collected before replacing anything, so that inherited methods are not wrapped twice
+        targets = _targets(module)
+        patched = []
+        for owner, name, method, function in targets:
+            patched.append((owner, name, vars(owner).get(name)))
+            setattr(owner, name, _wrap(module.__name__, method, function))
+        _patched[module.__name__] = patched
+
+
+def disable(backend=None):
+    """ disable(str) -> None
+
+        Stops measuring the calls of the named backend, or of the default one. The collected data is kept.
+    """
+    module = backends.load(backend)
+    with _patch_lock:
+        for owner, name, original in reversed(_patched.pop(module.__name__, [])):
+            if original is None:
+                delattr(owner, name)
+            else:
+                setattr(owner, name, original)
+
+
+def enabled(backend=None):
+    return backends.load(backend).__name__ in _patched
+
+
+def snapshot():
+    """ snapshot() -> dict
+
+        Returns the call statistics by backend module name and method name. Each entry has the call count,
+        the number of calls raising an exception, the total, minimum, maximum and mean latency, the p50,
+        p90 and p99 latency as bucket bounds, and the non-empty (upper bound, count) histogram buckets.
+        Latencies are in seconds.
+    """
+    with _lock:
+        result = {}
+        for (backend_name, method), histogram in _histograms.items():
+            result.setdefault(backend_name, {})[method] = histogram.summary()
+    return result
+
+
+def reset():
+    """ reset() -> None
+
+        Drops all collected call statistics.
+    """
+    with _lock:
+        _histograms.clear()
+
+
+def add_hook(hook):
+    """ add_hook(function) -> None
+
+        Calls hook(backend_name, method_name) before each measured call. The hook may return a function,
+        which is called as finish(seconds, exception) after the call, the exception being None on success.
+    """
+    with _lock:
+        _hooks.append(hook)
+
+
+def remove_hook(hook):
+    with _lock:
+        _hooks.remove(hook)
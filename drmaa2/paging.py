@@ -0,0 +1,58 @@
+""" DRMAA2 Python language binding.
+
+    Generators over the jobs and reservations of the DRM system, fetching them page by page.
+
+    For further information, please visit drmaa.org.
+"""
+
+import drmaa2
+
+# Default number of items per page
+PAGE_SIZE = 1000
+
+
+def _check_page_size(page_size):
+    if page_size < 1:
+        raise drmaa2.InvalidArgumentException("Page size must be positive.")
+
+
+def iter_all_jobs(session, filter=None, page_size=PAGE_SIZE):
+    """ iter_all_jobs(MonitoringSession, JobInfo, int) -> generator
+
+        Yields the Job objects MonitoringSession.get_all_jobs() would return.
+        Closing the generator early stops the fetching.
+    """
+    _check_page_size(page_size)
+    native = getattr(session, 'iter_all_jobs', None)
+    if native is not None:
+        return native(filter, page_size)
+    return _iterate(session.get_all_jobs, filter)
+
+
+def iter_all_reservations(session, page_size=PAGE_SIZE):
+    """ iter_all_reservations(MonitoringSession, int) -> generator
+
+        Yields the Reservation objects MonitoringSession.get_all_reservations() would return.
+    """
+    _check_page_size(page_size)
+    native = getattr(session, 'iter_all_reservations', None)
+    if native is not None:
+        return native(page_size)
+    return _iterate(session.get_all_reservations)
+
+
+def iter_reservations(session, page_size=PAGE_SIZE):
+    """ iter_reservations(ReservationSession, int) -> generator
+
+        Yields the Reservation objects ReservationSession.get_reservations() would return.
+    """
+    _check_page_size(page_size)
+    native = getattr(session, 'iter_reservations', None)
+    if native is not None:
+        return native(page_size)
+    return _iterate(session.get_reservations)
+
+
+def _iterate(function, *args):
+    for item in function(*args):
+        yield item
@@ -0,0 +1,253 @@
+""" DRMAA2 Python language binding.
+
+    Client-side rate limiting, retries and circuit breaking for the calls of a JobSession or MonitoringSession.
+
+    The wrappers are opt-in: applications wrap the sessions of any backend, and use the wrapper instead.
+    Submissions are rate limited by a token bucket. Calls failing with TryLaterException are retried
+    after an exponential backoff with full jitter. Repeated DrmCommunicationException failures open
+    a circuit breaker, which rejects further calls without contacting the DRM system until a trial
+    call reaches it again.
+
+    For further information, please visit drmaa.org.
+"""
+
+import time
+import random
+import threading
+
+import drmaa2
+
+# Circuit breaker states
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class TokenBucket(object):
+    """ Allows rate operations per second on average, and bursts of up to burst operations. """
+
+    def __init__(self, rate, burst=None, clock=time.time, sleep=time.sleep):
+        if rate <= 0:
+            raise drmaa2.InvalidArgumentException("Rate must be positive.")
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1.0, rate))
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens):
+        """ Takes the tokens, possibly going into debt, and returns the seconds to wait for them. """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return max(0.0, -self._tokens / self.rate)
+
+    def acquire(self, tokens=1, timeout=None):
+        """ Blocks until the tokens are available, and returns the seconds waited.
+            Raises TryLaterException without taking the tokens if that would take longer than the timeout.
+        """
+        delay = self._reserve(tokens)
+        if timeout is not None and delay > timeout:
+            with self._lock:
+                self._tokens += tokens
+            raise drmaa2.TryLaterException("Rate limit of %s operations per second reached." % self.rate)
+        if delay > 0:
+            self._sleep(delay)
+        return delay
+
+
+class CircuitBreaker(object):
+    """ Opens after threshold consecutive failures, and lets one trial call pass after reset_timeout seconds.
+
+        A trial call reaching the DRM system closes the breaker again, even if it raises another error,
+        a failing one keeps it open for another reset_timeout.
+    """
+
+    def __init__(self, threshold=5, reset_timeout=30.0, clock=time.time):
+        if threshold < 1:
+            raise drmaa2.InvalidArgumentException("Failure threshold must be positive.")
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self._failures = 0
+        self._opened = None
+        self.openings = 0
+
+    def before(self):
+        """ Raises DrmCommunicationException if the call must not be made. """
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN and self._clock() - self._opened >= self.reset_timeout:
+                self.state = HALF_OPEN
+                return
+            raise drmaa2.DrmCommunicationException("Circuit breaker is open after %u failures." % self._failures)
+
+    def success(self):
+        with self._lock:
+            self.state = CLOSED
+            self._failures = 0
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self._failures >= self.threshold):
+                self.state = OPEN
+                self._opened = self._clock()
+                self.openings += 1
+
+
+class Policy(object):
+    """ The rate limit, retry and circuit breaker settings shared by wrapped sessions, with their metrics.
+
+        rate and burst configure the token bucket for submissions, None meaning no rate limit.
+        Calls failing with TryLaterException are retried up to retries times, waiting a random time
+        between zero and backoff * 2 ** attempt, but at most max_backoff seconds.
+    """
+
+    def __init__(self, rate=None, burst=None, retries=5, backoff=0.1, max_backoff=30.0, failure_threshold=5,
+                 reset_timeout=30.0, clock=time.time, sleep=time.sleep, random=random.random):
+        self.bucket = TokenBucket(rate, burst, clock, sleep) if rate is not None else None
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout, clock)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._sleep = sleep
+        self._random = random
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(('calls', 'throttled', 'throttle_time', 'retries', 'backoff_time',
+                                        'failures', 'rejected'), 0)
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def delay(self, attempt):
+        """ Returns the seconds to wait before the given retry, starting with 0. """
+        return self._random() * min(self.max_backoff, self.backoff * 2 ** attempt)
+
+    def call(self, function, *args, **kwargs):
+        """ Calls the function with the retry and circuit breaker rules. The keyword argument submit=True
+            takes a token from the bucket before each attempt.
+        """
+        submit = kwargs.pop('submit', False)
+        self._count('calls')
+        attempt = 0
+        while True:
+            if submit and self.bucket is not None:
+                waited = self.bucket.acquire()
+                if waited:
+                    self._count('throttled')
+                    self._count('throttle_time', waited)
+            try:
+                self.breaker.before()
+            except drmaa2.DrmCommunicationException:
+                self._count('rejected')
+                raise
+            try:
+                return self._attempt(function, args, kwargs)
+            except drmaa2.TryLaterException:
+                # The DRM system is reachable, but overloaded
+                if attempt >= self.retries:
+                    self._count('failures')
+                    raise
+                delay = self.delay(attempt)
+                attempt += 1
+                self._count('retries')
+                self._count('backoff_time', delay)
+                self._sleep(delay)
+            except drmaa2.DrmCommunicationException:
+                self._count('failures')
+                raise
+
+    def _attempt(self, function, args, kwargs):
+        """ Makes one call, which resolves a trial call of the circuit breaker however it ends.
+            Only a DrmCommunicationException counts as failure, any other outcome shows that
+            the DRM system is reachable.
+        """
+        failed = False
+        try:
+            return function(*args, **kwargs)
+        except drmaa2.DrmCommunicationException:
+            failed = True
+            raise
+        finally:
+            if failed:
+                self.breaker.failure()
+            else:
+                self.breaker.success()
+
+    def stats(self):
+        """ Returns the call counters, the seconds spent in throttling and backoff, and the breaker state. """
+        with self._lock:
+            stats = dict(self._counters)
+        stats['breaker'] = self.breaker.state
+        stats['breaker_openings'] = self.breaker.openings
+        return stats
+
+
+class PolicyJobSession(drmaa2.JobSession):
+    """ Wraps a JobSession, calling its methods under the rules of the policy.
+
+        run_job() and run_bulk_jobs() are rate limited. Waiting calls are neither retried nor rate limited.
+        The returned Job and JobArray objects are the ones of the wrapped session.
+    """
+
+    def __init__(self, session, policy=None):
+        self.session = session
+        self.policy = policy or Policy()
+        self.contact = session.contact
+        self.session_name = session.session_name
+        self.job_categories = session.job_categories
+
+    def get_jobs(self, filter=None):
+        return self.policy.call(self.session.get_jobs, filter)
+
+    def get_job_array(self, job_array_id):
+        return self.policy.call(self.session.get_job_array, job_array_id)
+
+    def run_job(self, job_template):
+        return self.policy.call(self.session.run_job, job_template, submit=True)
+
+    def run_bulk_jobs(self, job_template, begin_index, end_index, step, max_parallel=None):
+        return self.policy.call(self.session.run_bulk_jobs, job_template, begin_index, end_index, step, max_parallel,
+                                submit=True)
+
+    def wait_any_started(self, jobs, timeout):
+        return self.session.wait_any_started(jobs, timeout)
+
+    def wait_any_terminated(self, jobs, timeout):
+        return self.session.wait_any_terminated(jobs, timeout)
+
+    def close(self):
+        self.session.close()
+
+
+class PolicyMonitoringSession(drmaa2.MonitoringSession):
+    """ Wraps a MonitoringSession, calling its methods under the retry and circuit breaker rules of the policy. """
+
+    def __init__(self, session, policy=None):
+        self.session = session
+        self.policy = policy or Policy()
+
+    def get_all_reservations(self):
+        return self.policy.call(self.session.get_all_reservations)
+
+    def get_all_jobs(self, filter=None):
+        return self.policy.call(self.session.get_all_jobs, filter)
+
+    def get_all_queues(self, names=None):
+        return self.policy.call(self.session.get_all_queues, names)
+
+    def get_all_machines(self, names=None):
+        return self.policy.call(self.session.get_all_machines, names)
+
+    def close(self):
+        self.session.close()
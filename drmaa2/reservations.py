@@ -0,0 +1,518 @@
+""" DRMAA2 Python language binding.
+
+    A reservation calendar indexed by time window, and bulk reservation requests.
+
+    The ReservationCalendar keeps ReservationInfo instances in one interval tree per machine, so that
+    overlap, free slot and earliest fit queries only visit the reservations intersecting the window.
+    Backends managing reservations themselves can admit ReservationTemplate instances with it.
+    The CachingReservationSession keeps the reservations of any backend session in a calendar,
+    answering these queries on the client side.
+
+    Times are seconds since the epoch, None as end time meaning an unlimited reservation.
+
+    For further information, please visit drmaa.org.
+"""
+
+import time
+import random
+import itertools
+import threading
+from collections import deque
+
+import drmaa2
+
+_INFINITY = float('inf')
+
+
+class _Node(object):
+    __slots__ = ('start', 'end', 'key', 'value', 'priority', 'max_end', 'left', 'right')
+
+    def __init__(self, start, end, key, value):
+        self.start = start
+        self.end = end
+        self.key = key
+        self.value = value
+        self.priority = random.random()
+        self.max_end = end
+        self.left = self.right = None
+
+    def update(self):
+        max_end = self.end
+        if self.left is not None and self.left.max_end > max_end:
+            max_end = self.left.max_end
+        if self.right is not None and self.right.max_end > max_end:
+            max_end = self.right.max_end
+        self.max_end = max_end
+
+
+def _rotate_right(node):
+    left = node.left
+    node.left = left.right
+    left.right = node
+    node.update()
+    left.update()
+    return left
+
+
+def _rotate_left(node):
+    right = node.right
+    node.right = right.left
+    right.left = node
+    node.update()
+    right.update()
+    return right
+
+
+class IntervalTree(object):
+    """ Half-open [start, end) intervals with unique keys, in a treap ordered by start time.
+
+        Each node knows the largest end time in its subtree, so overlap queries skip all subtrees
+        ending before the window. Insertion, removal and queries take O(log n + k) expected time.
+    """
+
+    def __init__(self):
+        self._root = None
+        self._intervals = {}
+
+    def __len__(self):
+        return len(self._intervals)
+
+    def __contains__(self, key):
+        return key in self._intervals
+
+    def add(self, start, end, key, value=None):
+        if end < start:
+            raise drmaa2.InvalidArgumentException("Interval ends before it starts.")
+        if key in self._intervals:
+            self.remove(key)
+        self._intervals[key] = (start, end)
+        self._root = self._insert(self._root, _Node(start, end, key, value))
+
+    def _insert(self, node, new):
+        if node is None:
+            return new
+        if (new.start, new.key) < (node.start, node.key):
+            node.left = self._insert(node.left, new)
+            if node.left.priority > node.priority:
+                return _rotate_right(node)
+        else:
+            node.right = self._insert(node.right, new)
+            if node.right.priority > node.priority:
+                return _rotate_left(node)
+        node.update()
+        return node
+
+    def remove(self, key):
+        """ Removes the interval with the key, and returns whether there was one. """
+        interval = self._intervals.pop(key, None)
+        if interval is None:
+            return False
+        self._root = self._delete(self._root, (interval[0], key))
+        return True
+
+    def _delete(self, node, position):
+        if node is None:
+            return None
+        if position < (node.start, node.key):
+            node.left = self._delete(node.left, position)
+        elif position > (node.start, node.key):
+            node.right = self._delete(node.right, position)
+        elif node.left is None:
+            return node.right
+        elif node.right is None:
+            return node.left
+        elif node.left.priority > node.right.priority:
+            node = _rotate_right(node)
+            node.right = self._delete(node.right, position)
+        else:
+            node = _rotate_left(node)
+            node.left = self._delete(node.left, position)
+        node.update()
+        return node
+
+    def overlapping(self, start, end):
+        """ Returns the (start, end, key, value) tuples of the intervals intersecting [start, end), by start. """
+        result = []
+        stack = []
+        node = self._root
+        # In-order traversal, pruning subtrees that end too early or start too late
+        while stack or node is not None:
+            if node is not None and node.max_end > start:
+                stack.append(node)
+                node = node.left
+                continue
+            if not stack:
+                break
+            node = stack.pop()
+            if node.start >= end:
+                break
+            if node.end > start:
+                result.append((node.start, node.end, node.key, node.value))
+            node = node.right
+        return result
+
+    def ends_after(self, time):
+        """ Returns the end times after the given time, unsorted, skipping all subtrees ending before. """
+        ends = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            if node.end > time:
+                ends.append(node.end)
+            for child in (node.left, node.right):
+                if child is not None and child.max_end > time:
+                    stack.append(child)
+        return ends
+
+
+def _window(info):
+    end = info.reserved_end_time
+    return info.reserved_start_time, _INFINITY if end is None else end
+
+
+def _slots(info):
+    """ Returns the reserved slots of the reservation by machine name.
+
+        Reserved machines are SlotInfo instances, or names sharing the reserved slots evenly.
+    """
+    machines = info.reserved_machines or []
+    slots = {}
+    for machine in machines:
+        if isinstance(machine, drmaa2.SlotInfo):
+            slots[machine.machine_name] = slots.get(machine.machine_name, 0) + (machine.slots or 0)
+        else:
+            slots[machine] = slots.get(machine, 0) + max(1, (info.reserved_slots or 0) // len(machines))
+    return slots
+
+
+def machine_slots(info):
+    """ Returns the number of slots of the machine described by the MachineInfo. """
+    slots = 1
+    for count in (info.sockets, info.cores_per_socket, info.threads_per_core):
+        if count:
+            slots *= count
+    return slots
+
+
+class _Usage(object):
+    """ The slots reserved on one machine from a start time on, as step function, with the peak usage
+        within a window sliding forward in time.
+    """
+
+    def __init__(self, tree, start):
+        events = []
+        for interval_start, interval_end, _, slots in tree.overlapping(start, _INFINITY):
+            events.append((max(start, interval_start), slots))
+            events.append((interval_end, -slots))
+        # Releases sort before acquisitions at the same time, as the windows are half-open
+        events.sort()
+        # Segment i has the level from times[i] until times[i + 1]
+        self.times = []
+        self.levels = []
+        self.releases = set()
+        used = 0
+        for time, change in events:
+            used += change
+            if change < 0 and time != _INFINITY:
+                self.releases.add(time)
+            if self.times and self.times[-1] == time:
+                self.levels[-1] = used
+            else:
+                self.times.append(time)
+                self.levels.append(used)
+        self._next = 0
+        # Positions of the segments in the window, by decreasing level
+        self._peaks = deque()
+
+    def peak(self, start, end):
+        """ Returns the peak usage within [start, end), both never decreasing between the calls. """
+        times, levels, peaks = self.times, self.levels, self._peaks
+        while self._next < len(times) and times[self._next] < end:
+            while peaks and levels[peaks[-1]] <= levels[self._next]:
+                peaks.pop()
+            peaks.append(self._next)
+            self._next += 1
+        while peaks and peaks[0] + 1 < len(times) and times[peaks[0] + 1] <= start:
+            peaks.popleft()
+        return levels[peaks[0]] if peaks else 0
+
+
+class ReservationCalendar(object):
+    """ ReservationInfo instances by reserved time window and machine, with the slot capacity of the machines.
+
+        capacity maps machine names to their number of slots. Only machines with a known capacity are
+        considered by free_slots(), earliest_fit() and admit(). The calendar is thread-safe.
+    """
+
+    def __init__(self, capacity=None, clock=time.time):
+        self.capacity = dict(capacity or {})
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._infos = {}
+        self._all = IntervalTree()
+        self._machines = {}
+        self._ids = itertools.count(1)
+
+    @classmethod
+    def from_machines(cls, machines, clock=time.time):
+        """ Returns an empty calendar for the MachineInfo instances, as returned by get_all_machines(). """
+        return cls(dict((info.name, machine_slots(info)) for info in machines if info.available is not False), clock)
+
+    def __len__(self):
+        return len(self._infos)
+
+    def __contains__(self, reservation_id):
+        return reservation_id in self._infos
+
+    def get(self, reservation_id):
+        return self._infos.get(reservation_id)
+
+    def add(self, info):
+        """ Adds or replaces the ReservationInfo, keyed by its reservation_id. """
+        start, end = _window(info)
+        with self._lock:
+            self.remove(info.reservation_id)
+            self._infos[info.reservation_id] = info
+            self._all.add(start, end, info.reservation_id, info)
+            for machine, slots in _slots(info).items():
+                tree = self._machines.get(machine)
+                if tree is None:
+                    tree = self._machines[machine] = IntervalTree()
+                tree.add(start, end, info.reservation_id, slots)
+
+    def remove(self, reservation_id):
+        with self._lock:
+            info = self._infos.pop(reservation_id, None)
+            if info is None:
+                return False
+            self._all.remove(reservation_id)
+            for machine in _slots(info):
+                tree = self._machines.get(machine)
+                if tree is not None:
+                    tree.remove(reservation_id)
+                    if not tree:
+                        del self._machines[machine]
+            return True
+
+    def replace(self, infos):
+        """ Replaces all reservations by the given ReservationInfo instances. """
+        with self._lock:
+            self._infos.clear()
+            self._all = IntervalTree()
+            self._machines.clear()
+            for info in infos:
+                self.add(info)
+
+    def overlapping(self, start, end=None, machines=None):
+        """ Returns the reservations intersecting [start, end), on one of the machines if given, by start time. """
+        end = _INFINITY if end is None else end
+        with self._lock:
+            if machines is None:
+                return [value for _, _, _, value in self._all.overlapping(start, end)]
+            keys = set()
+            for machine in machines:
+                tree = self._machines.get(machine)
+                if tree is not None:
+                    keys.update(key for _, _, key, _ in tree.overlapping(start, end))
+            return sorted((self._infos[key] for key in keys), key=lambda info: (info.reserved_start_time, info.reservation_id))
+
+    def _used(self, machine, start, end):
+        """ Returns the largest number of slots reserved at the same time on the machine within [start, end). """
+        tree = self._machines.get(machine)
+        if tree is None:
+            return 0
+        events = []
+        for interval_start, interval_end, _, slots in tree.overlapping(start, end):
+            events.append((max(start, interval_start), slots))
+            events.append((min(end, interval_end), -slots))
+        # Releases sort before acquisitions at the same time, as the windows are half-open
+        events.sort()
+        used = peak = 0
+        for _, change in events:
+            used += change
+            peak = max(peak, used)
+        return peak
+
+    def used_slots(self, start, end=None, machines=None):
+        """ Returns the peak number of reserved slots within [start, end) by machine name. """
+        end = _INFINITY if end is None else end
+        with self._lock:
+            names = self._machines.keys() if machines is None else machines
+            return dict((machine, self._used(machine, start, end)) for machine in names)
+
+    def free_slots(self, start, end=None, machines=None):
+        """ Returns the number of slots free during all of [start, end) by machine name, for machines
+            with a known capacity.
+        """
+        end = _INFINITY if end is None else end
+        with self._lock:
+            names = self.capacity.keys() if machines is None else [name for name in machines if name in self.capacity]
+            return dict((machine, max(0, self.capacity[machine] - self._used(machine, start, end))) for machine in names)
+
+    def earliest_fit(self, duration, slots=1, machines=None, not_before=None, not_after=None):
+        """ earliest_fit(self, float, int, list, float, float) -> tuple
+
+            Returns the earliest start time not before not_before, or now, at which the slots are free
+            for the duration on the machines, together with the free slots by machine name at that time.
+            The window must end by not_after, if given. Returns None if there is no such time.
+            A duration of None asks for an unlimited window.
+        """
+        start = self._clock() if not_before is None else not_before
+        with self._lock:
+            names = list(self.capacity) if machines is None else [name for name in machines if name in self.capacity]
+            if sum(self.capacity[name] for name in names) < slots:
+                return None
+            usages = []
+            # Free slots only increase when a reservation ends, so these are the only candidates
+            candidates = set([start])
+            for name in names:
+                tree = self._machines.get(name)
+                if tree is not None:
+                    usage = _Usage(tree, start)
+                    usages.append((name, usage))
+                    candidates.update(usage.releases)
+            # Sweeping the candidates in order, each machine's window of reservations only moves forward
+            for candidate in sorted(candidates):
+                end = _INFINITY if duration is None else candidate + duration
+                if not_after is not None and end > not_after:
+                    return None
+                free = dict((name, self.capacity[name]) for name in names)
+                for name, usage in usages:
+                    free[name] = max(0, free[name] - usage.peak(candidate, end))
+                if sum(free.values()) >= slots:
+                    return candidate, free
+        return None
+
+    def admit(self, template):
+        """ admit(self, ReservationTemplate) -> ReservationInfo
+
+            Reserves the earliest fitting window for the template, and returns the added ReservationInfo.
+            The template's start_time, end_time, duration, min_slots, max_slots, candidate_machines,
+            reservation_name and users_acl are considered, the others being left to the caller.
+            Raises DeniedByDrmsException if no window fits.
+        """
+        with self._lock:
+            return self._admit(template)
+
+    def _admit(self, template):
+        start = template.start_time
+        end = template.end_time
+        duration = template.duration
+        if duration is None and start is not None and end is not None:
+            duration = end - start
+        if duration is not None and duration < 0:
+            raise drmaa2.InvalidArgumentException("Invalid reservation duration %r." % (duration,))
+        min_slots = template.min_slots or 1
+        max_slots = max(min_slots, template.max_slots or min_slots)
+        fit = self.earliest_fit(duration, min_slots, template.candidate_machines, start, end)
+        if fit is None:
+            raise drmaa2.DeniedByDrmsException("No window with %u free slots for the reservation." % min_slots)
+        fit_start, free = fit
+        wanted = max_slots
+        reserved = []
+        for machine in (template.candidate_machines or sorted(free)):
+            count = min(free.get(machine, 0), wanted)
+            if count:
+                reserved.append(drmaa2.SlotInfo(machine, count))
+                wanted -= count
+            if not wanted:
+                break
+        info = drmaa2.ReservationInfo(reservation_id=str(next(self._ids)),
+                                      reservation_name=template.reservation_name,
+                                      reserved_start_time=fit_start,
+                                      reserved_end_time=None if duration is None else fit_start + duration,
+                                      users_acl=template.users_acl,
+                                      reserved_slots=max_slots - wanted,
+                                      reserved_machines=reserved)
+        while info.reservation_id in self._infos:
+            info = info._replace(reservation_id=str(next(self._ids)))
+        self.add(info)
+        return info
+
+    def admit_all(self, templates):
+        """ admit_all(self, list) -> list
+
+            Admits the templates in one pass under the calendar lock, each one seeing the reservations
+            of the ones before. Returns a ReservationInfo or the raised exception per template.
+        """
+        outcomes = []
+        with self._lock:
+            for template in templates:
+                try:
+                    outcomes.append(self._admit(template))
+                except (drmaa2.DeniedByDrmsException, drmaa2.InvalidArgumentException) as e:
+                    outcomes.append(e)
+        return outcomes
+
+
+def request_reservations(session, templates):
+    """ request_reservations(ReservationSession, list) -> list
+
+        Requests a reservation per template, using the native request_reservations() method of
+        the session if available. Returns a Reservation or the raised exception per template.
+    """
+    native = getattr(session, 'request_reservations', None)
+    if native is not None:
+        return native(templates)
+    outcomes = []
+    for template in templates:
+        try:
+            outcomes.append(session.request_reservation(template))
+        except (drmaa2.DeniedByDrmsException, drmaa2.InvalidArgumentException, drmaa2.OutOfResourceException,
+                drmaa2.UnsupportedAttributeException) as e:
+            outcomes.append(e)
+    return outcomes
+
+
+class CachingReservationSession(drmaa2.ReservationSession):
+    """ Wraps a ReservationSession, keeping the information of its reservations in a ReservationCalendar.
+
+        The calendar is filled by get_reservations() and request_reservation(), and serves the overlap,
+        free slot and earliest fit queries without contacting the DRM system. Reservations terminated
+        through other sessions stay in the calendar until the next get_reservations() call.
+    """
+
+    def __init__(self, session, calendar=None):
+        self.session = session
+        self.calendar = calendar if calendar is not None else ReservationCalendar()
+        self.contact = session.contact
+        self.session_name = session.session_name
+
+    def get_reservation(self, reservation_id):
+        reservation = self.session.get_reservation(reservation_id)
+        self.calendar.add(reservation.get_info())
+        return reservation
+
+    def request_reservation(self, reservation_template):
+        reservation = self.session.request_reservation(reservation_template)
+        self.calendar.add(reservation.get_info())
+        return reservation
+
+    def request_reservations(self, reservation_templates):
+        outcomes = request_reservations(self.session, reservation_templates)
+        for outcome in outcomes:
+            if not isinstance(outcome, Exception):
+                self.calendar.add(outcome.get_info())
+        return outcomes
+
+    def get_reservations(self):
+        reservations = self.session.get_reservations()
+        self.calendar.replace(reservation.get_info() for reservation in reservations)
+        return reservations
+
+    def terminate(self, reservation):
+        """ Terminates the reservation, and removes it from the calendar. """
+        reservation.terminate()
+        self.calendar.remove(reservation.reservation_id)
+
+    def overlapping(self, start, end=None, machines=None):
+        return self.calendar.overlapping(start, end, machines)
+
+    def free_slots(self, start, end=None, machines=None):
+        return self.calendar.free_slots(start, end, machines)
+
+    def earliest_fit(self, duration, slots=1, machines=None, not_before=None, not_after=None):
+        return self.calendar.earliest_fit(duration, slots, machines, not_before, not_after)
+
+    def close(self):
+        self.session.close()
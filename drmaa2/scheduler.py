@@ -0,0 +1,192 @@
+""" DRMAA2 Python language binding.
+
+    Client-side scheduling of bulk jobs with a max_parallel limit, for backends not enforcing it.
+
+    The ArrayScheduler submits the tasks of a bulk job as single jobs, with the PARAMETRIC_INDEX macro
+    replaced in their templates. It keeps max_parallel of them active, and submits the next task as soon
+    as the wait_any_terminated() call of its thread returns for a terminated one.
+
+    For further information, please visit drmaa.org.
+"""
+
+import sys
+import threading
+
+import drmaa2
+from drmaa2 import bulk
+
+try:
+    xrange
+except NameError:
+    xrange = range
+
+try:
+    _string_types = (str, unicode)
+except NameError:
+    _string_types = (str,)
+
+
+def expand_template(job_template, index):
+    """ Returns a copy of the job template with the PARAMETRIC_INDEX macro replaced by the given index,
+        in strings, list and tuple items, and the keys and values of dictionaries such as the staging maps.
+    """
+    macro = drmaa2.PARAMETRIC_INDEX
+    value = str(index)
+
+    def has_macro(item):
+        return isinstance(item, _string_types) and macro in item
+
+    def expand(item):
+        return item.replace(macro, value) if isinstance(item, _string_types) else item
+    changes = {}
+    for name, attr in zip(job_template._fields, job_template):
+        if isinstance(attr, _string_types):
+            if macro in attr:
+                changes[name] = attr.replace(macro, value)
+        elif isinstance(attr, (list, tuple)):
+            if any(has_macro(item) for item in attr):
+                expanded = [expand(item) for item in attr]
+                changes[name] = expanded if isinstance(attr, list) else tuple(expanded)
+        elif isinstance(attr, dict):
+            if any(has_macro(key) or has_macro(item) for key, item in attr.items()):
+                changes[name] = dict((expand(key), expand(item)) for key, item in attr.items())
+    if not changes:
+        return job_template
+    return job_template._replace(**changes)
+
+
+class ArrayScheduler(drmaa2.JobArray):
+    """ A bulk job run as single jobs of the session, at most max_parallel of them being active at a time.
+
+        jobs lists the jobs submitted so far, in the order of their task index. The job control methods
+        act on these jobs, terminate() also stops the submission of further tasks.
+        The scheduling finishes once no submitted task is active any more.
+    """
+
+    def __init__(self, session, job_template, begin_index, end_index, step, max_parallel):
+        if begin_index < 1 or end_index < begin_index or step < 1:
+            raise drmaa2.InvalidArgumentException("Invalid bulk job index range.")
+        if max_parallel < 1:
+            raise drmaa2.InvalidArgumentException("Invalid max_parallel value %r." % (max_parallel,))
+        self.session = session
+        self.session_name = session.session_name
+        self.job_template = job_template
+        self.job_array_id = None
+        self.max_parallel = max_parallel
+        self.jobs = []
+        self._indices = xrange(begin_index, end_index + 1, step)
+        self._next = 0
+        self._active = []
+        self._counts = {'done': 0, 'failed': 0}
+        self._error = None
+        # No further submissions, and no active tasks any more
+        self._stopped = False
+        self._done = False
+        self._lock = threading.Lock()
+        self._finished = threading.Condition(self._lock)
+        self._thread = threading.Thread(target=self._run, name="drmaa2-array-scheduler")
+        self._thread.daemon = True
+
+    def start(self):
+        with self._lock:
+            self._submit()
+        self._thread.start()
+        return self
+
+    def _submit(self):
+        """ Submits tasks until max_parallel are active. Must be called with the lock being held. """
+        while not self._stopped and len(self._active) < self.max_parallel and self._next < len(self._indices):
+            index = self._indices[self._next]
+            job = self.session.run_job(expand_template(self.job_template, index))
+            self._next += 1
+            self.jobs.append(job)
+            self._active.append(job)
+
+    def _run(self):
+        try:
+            while True:
+                with self._lock:
+                    active = list(self._active)
+                if not active:
+                    break
+                job = self.session.wait_any_terminated(active, drmaa2.INFINITE_TIME)
+                job_state = job.get_state()[0]
+                with self._lock:
+                    self._active = [other for other in self._active if other.job_id != job.job_id]
+                    self._counts['done' if job_state == drmaa2.JobState.DONE else 'failed'] += 1
+                    self._submit()
+        except Exception as e:
+            with self._lock:
+                self._error = e
+        with self._lock:
+            self._stopped = True
+            self._done = True
+            self._finished.notify_all()
+
+    def progress(self):
+        """ progress(self) -> dict
+
+            Returns the number of tasks in total, submitted, active, done and failed,
+            and the number of not yet submitted tasks as 'unsubmitted'.
+        """
+        with self._lock:
+            progress = dict(self._counts)
+            progress['total'] = len(self._indices)
+            progress['submitted'] = self._next
+            progress['unsubmitted'] = len(self._indices) - self._next
+            progress['active'] = len(self._active)
+        return progress
+
+    def wait(self, timeout=None):
+        """ wait(self, float) -> bool
+
+            Waits until the scheduling finished, and returns False on timeout. After terminate(),
+            this is once the submitted tasks terminated. Raises the exception that stopped the scheduling, if any.
+        """
+        with self._lock:
+            if not self._done:
+                self._finished.wait(timeout)
+            if self._error is not None:
+                raise self._error
+            return self._done
+
+    def _control(self, operation):
+        with self._lock:
+            jobs = list(self.jobs)
+        bulk.control_jobs(self.session, operation, jobs)
+
+    def suspend(self):
+        self._control('suspend')
+
+    def resume(self):
+        self._control('resume')
+
+    def hold(self):
+        self._control('hold')
+
+    def release(self):
+        self._control('release')
+
+    def terminate(self):
+        with self._lock:
+            self._stopped = True
+        self._control('terminate')
+
+    def reap(self):
+        self._control('reap')
+
+
+def run_bulk_jobs(session, job_template, begin_index, end_index, step, max_parallel=None, backend=None):
+    """ run_bulk_jobs(JobSession, JobTemplate, int, int, int, int, module) -> JobArray
+
+        Submits the bulk job with the session, if the backend supports max_parallel or no limit is given.
+        Otherwise, returns a started ArrayScheduler for it. The backend defaults to the module defining
+        the class of the session, and to the default backend for sessions of other modules.
+    """
+    if backend is None:
+        backend = sys.modules.get(type(session).__module__)
+        if not callable(getattr(backend, 'supports', None)):
+            backend = drmaa2
+    if max_parallel is None or backend.supports(drmaa2.Capability.BULK_JOBS_MAXPARALLEL):
+        return session.run_bulk_jobs(job_template, begin_index, end_index, step, max_parallel)
+    return ArrayScheduler(session, job_template, begin_index, end_index, step, max_parallel).start()
@@ -0,0 +1,307 @@
+""" DRMAA2 Python language binding.
+
+    Coalesced job status queries, for applications polling the state of many jobs.
+
+    For further information, please visit drmaa.org.
+"""
+
+import time
+import threading
+
+import drmaa2
+
+TERMINATED_STATES = frozenset([drmaa2.JobState.DONE, drmaa2.JobState.FAILED])
+
+
+def get_job_infos(session, jobs):
+    """ get_job_infos(JobSession, list) -> dict
+
+        Returns the JobInfo of the given jobs by job ID, or the exception raised for a job.
+        Uses the native get_job_infos() method of the session if available.
+    """
+    native = getattr(session, 'get_job_infos', None)
+    if native is not None:
+        return native(jobs)
+    infos = {}
+    for job in jobs:
+        try:
+            infos[job.job_id] = job.get_info()
+        except (drmaa2.InvalidArgumentException, drmaa2.InvalidStateException) as e:
+            infos[job.job_id] = e
+    return infos
+
+
+class _Batch(object):
+    """ The jobs of one bulk query, and its outcome. """
+    __slots__ = ('jobs', 'done', 'infos')
+
+    def __init__(self):
+        self.jobs = {}
+        self.done = threading.Event()
+        self.infos = None
+
+
+class StatusCoalescer(object):
+    """ Answers job status queries for the jobs of one session from a cache, and merges the misses.
+
+        The first query missing the cache opens a batch, which further queries join until it is fetched.
+        The batch is fetched at once, together with the outdated cache entries of jobs asked for within
+        max_age seconds, unless another batch is being fetched. Then it waits for that one to finish. It also waits window seconds if other queries
+        are in progress, or the previous batch was joined by other queries. A single thread querying jobs
+        in turn therefore never waits. Cached information of running jobs is used for max_age seconds.
+        Outdated jobs not asked for within max_age seconds are dropped from the cache, terminated jobs
+        stay cached until they are reaped through the coalescer.
+    """
+
+    def __init__(self, session, window=0.01, max_age=1.0, clock=time.time, sleep=time.sleep):
+        self.session = session
+        self.window = window
+        self.max_age = max_age
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        # JobInfo, the time it was fetched and the job, by job ID
+        self._cache = {}
+        # Time of the last query by job ID, for the queries of the last max_age seconds
+        self._requested = {}
+        # The batch open for joining, and the one being fetched
+        self._batch = None
+        self._fetching = None
+        # Queries in progress, and whether the last batch was joined by other queries
+        self._queries = 0
+        self._joined = False
+        self._counters = dict.fromkeys(('queries', 'hits', 'batches', 'fetched'), 0)
+
+    def _cached(self, job_id, now):
+        entry = self._cache.get(job_id)
+        if entry is None:
+            return None
+        info, fetched, job = entry
+        if info.job_state in TERMINATED_STATES or now - fetched <= self.max_age:
+            return info
+        return None
+
+    def get_info(self, job):
+        """ Returns the JobInfo of the job, from the cache or from a merged bulk query. """
+        job_id = job.job_id
+        with self._lock:
+            self._counters['queries'] += 1
+            now = self._requested[job_id] = self._clock()
+            info = self._cached(job_id, now)
+            if info is not None:
+                self._counters['hits'] += 1
+                return info
+            batch = self._batch
+            leader = batch is None
+            if self._fetching is not None and job_id in self._fetching.jobs:
+                # Answered by the batch being fetched
+                batch, leader = self._fetching, False
+            elif leader:
+                batch = self._batch = _Batch()
+            else:
+                self._joined = True
+            batch.jobs.setdefault(job_id, job)
+            self._queries += 1
+            previous = self._fetching
+            wait = leader and self.window and (self._queries > 1 or self._joined)
+        try:
+            if leader:
+                self._run(batch, previous, wait)
+            else:
+                batch.done.wait()
+        finally:
+            with self._lock:
+                self._queries -= 1
+        outcome = batch.infos[job_id]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def _run(self, batch, previous, wait):
+        if previous is not None:
+            previous.done.wait()
+        if wait:
+            self._sleep(self.window)
+        with self._lock:
+            if self._batch is batch:
+                self._batch = None
+            self._fetching = batch
+            self._joined = False
+            now = self._clock()
+            for job_id, requested in list(self._requested.items()):
+                if now - requested > self.max_age:
+                    del self._requested[job_id]
+            for job_id, entry in list(self._cache.items()):
+                if job_id in batch.jobs or self._cached(job_id, now) is not None:
+                    continue
+                if job_id in self._requested:
+                    batch.jobs[job_id] = entry[2]
+                else:
+                    del self._cache[job_id]
+        self._fetch(batch)
+
+    def _fetch(self, batch):
+        jobs = list(batch.jobs.values())
+        try:
+            infos = get_job_infos(self.session, jobs)
+        except Exception as e:
+            infos = dict((job.job_id, e) for job in jobs)
+        with self._lock:
+            now = self._clock()
+            for job_id, outcome in infos.items():
+                if not isinstance(outcome, Exception):
+                    self._cache[job_id] = (outcome, now, batch.jobs[job_id])
+                elif job_id in self._cache:
+                    # Outdated entries failing the refresh are dropped, e.g. for jobs reaped elsewhere
+                    del self._cache[job_id]
+            self._counters['batches'] += 1
+            self._counters['fetched'] += len(jobs)
+            if self._fetching is batch:
+                self._fetching = None
+        batch.infos = infos
+        batch.done.set()
+
+    def prefetch(self, jobs):
+        """ Fetches the information of the jobs not fresh in the cache in one bulk query, without waiting
+            for other queries, so that the following queries for these jobs are answered from the cache.
+        """
+        batch = _Batch()
+        with self._lock:
+            now = self._clock()
+            for job in jobs:
+                if self._cached(job.job_id, now) is None:
+                    batch.jobs.setdefault(job.job_id, job)
+        if batch.jobs:
+            self._fetch(batch)
+
+    def get_state(self, job):
+        """ Returns the job state and sub state of the job, like Job.get_state(). """
+        info = self.get_info(job)
+        return info.job_state, info.job_sub_state
+
+    def invalidate(self, job_id=None):
+        """ Drops the cached information of the job, or of all jobs. Terminated jobs stay cached. """
+        with self._lock:
+            if job_id is None:
+                self._cache = dict((key, entry) for key, entry in self._cache.items()
+                                   if entry[0].job_state in TERMINATED_STATES)
+            else:
+                entry = self._cache.get(job_id)
+                if entry is not None and entry[0].job_state not in TERMINATED_STATES:
+                    del self._cache[job_id]
+
+    def forget(self, job_id):
+        """ Drops the cached information of the job, also for terminated jobs. """
+        with self._lock:
+            self._cache.pop(job_id, None)
+            self._requested.pop(job_id, None)
+
+    def stats(self):
+        """ Returns the query, cache hit, batch and fetched job counters, and the number of cached jobs. """
+        with self._lock:
+            stats = dict(self._counters)
+            stats['cached'] = len(self._cache)
+        return stats
+
+
+class CoalescedJob(drmaa2.Job):
+    """ Wraps a Job, answering get_state() and get_info() through the StatusCoalescer. """
+
+    def __init__(self, job, coalescer):
+        self.job = job
+        self.coalescer = coalescer
+        self.job_id = job.job_id
+        self.session_name = job.session_name
+
+    @property
+    def job_template(self):
+        return self.job.job_template
+
+    def _control(self, operation):
+        try:
+            operation()
+        finally:
+            self.coalescer.invalidate(self.job_id)
+
+    def suspend(self):
+        self._control(self.job.suspend)
+
+    def resume(self):
+        self._control(self.job.resume)
+
+    def hold(self):
+        self._control(self.job.hold)
+
+    def release(self):
+        self._control(self.job.release)
+
+    def terminate(self):
+        self._control(self.job.terminate)
+
+    def reap(self):
+        self.job.reap()
+        self.coalescer.forget(self.job_id)
+
+    def get_state(self):
+        return self.coalescer.get_state(self.job)
+
+    def get_info(self):
+        return self.coalescer.get_info(self.job)
+
+    def wait_started(self, timeout):
+        self._control(lambda: self.job.wait_started(timeout))
+
+    def wait_terminated(self, timeout):
+        self._control(lambda: self.job.wait_terminated(timeout))
+
+
+class CoalescingJobSession(drmaa2.JobSession):
+    """ Wraps a JobSession, returning CoalescedJob objects that share one StatusCoalescer.
+
+        Job arrays are passed through unchanged. Jobs returned by the wait methods are wrapped again.
+    """
+
+    def __init__(self, session, window=0.01, max_age=1.0, clock=time.time, sleep=time.sleep):
+        self.session = session
+        self.coalescer = StatusCoalescer(session, window, max_age, clock, sleep)
+        self.contact = session.contact
+        self.session_name = session.session_name
+        self.job_categories = session.job_categories
+
+    def wrap(self, job):
+        """ Returns the job of the wrapped session as CoalescedJob. """
+        return CoalescedJob(job, self.coalescer)
+
+    def get_jobs(self, filter=None):
+        return [self.wrap(job) for job in self.session.get_jobs(filter)]
+
+    def get_job_array(self, job_array_id):
+        return self.session.get_job_array(job_array_id)
+
+    def run_job(self, job_template):
+        return self.wrap(self.session.run_job(job_template))
+
+    def run_bulk_jobs(self, job_template, begin_index, end_index, step, max_parallel=None):
+        return self.session.run_bulk_jobs(job_template, begin_index, end_index, step, max_parallel)
+
+    def _wait_any(self, wait, jobs, timeout):
+        wrappers = dict((job.job_id, job) for job in jobs)
+        job = wait([getattr(job, 'job', job) for job in jobs], timeout)
+        self.coalescer.invalidate(job.job_id)
+        return wrappers[job.job_id]
+
+    def wait_any_started(self, jobs, timeout):
+        return self._wait_any(self.session.wait_any_started, jobs, timeout)
+
+    def wait_any_terminated(self, jobs, timeout):
+        return self._wait_any(self.session.wait_any_terminated, jobs, timeout)
+
+    def get_job_infos(self, jobs):
+        return get_job_infos(self.session, [getattr(job, 'job', job) for job in jobs])
+
+    def prefetch(self, jobs):
+        """ Fetches the status of the jobs into the cache with one bulk query, see StatusCoalescer.prefetch(). """
+        self.coalescer.prefetch([getattr(job, 'job', job) for job in jobs])
+
+    def close(self):
+        self.session.close()
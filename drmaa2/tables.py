@@ -0,0 +1,371 @@
+""" DRMAA2 Python language binding.
+
+    Column-oriented result sets for large numbers of info structures.
+
+    For further information, please visit drmaa.org.
+"""
+
+import math
+from array import array
+
+import drmaa2
+
+# Column kinds
+
+FLOAT = 'float'
+INTEGER = 'integer'
+ENUM = 'enum'
+CATEGORY = 'category'
+
+_MISSING_ENUM = -1
+
+_job_info_kinds = {'exit_status': INTEGER, 'slots': INTEGER, 'job_state': ENUM,
+                   'wallclock_time': FLOAT, 'cpu_time': FLOAT, 'submission_time': FLOAT,
+                   'dispatch_time': FLOAT, 'finish_time': FLOAT, 'staging_time': FLOAT}
+
+_machine_info_kinds = {'sockets': INTEGER, 'cores_per_socket': INTEGER, 'threads_per_core': INTEGER, 'load': FLOAT,
+                       'phys_memory': INTEGER, 'virt_memory': INTEGER, 'machine_os': ENUM, 'machine_arch': ENUM}
+
+
+class Column(object):
+    """ One attribute of all rows in a table. None values are supported for every kind. """
+
+    def __init__(self, kind, enum=None, values=None, codes=None):
+        self.kind = kind
+        self.enum = enum
+        if kind in (FLOAT, INTEGER):
+            # None is stored as NaN
+            self.data = array('d')
+        elif kind == ENUM:
+            self.data = array('b')
+        else:
+            self.data = array('l')
+            # Dictionary shared with the tables derived from this one
+            self.values = values if values is not None else []
+            self.codes = codes if codes is not None else {}
+
+    def derive(self):
+        """ Returns an empty column with the same kind and shared value dictionary. """
+        if self.kind == CATEGORY:
+            return Column(self.kind, values=self.values, codes=self.codes)
+        return Column(self.kind, self.enum)
+
+    def encode(self, value):
+        if self.kind in (FLOAT, INTEGER):
+            return float('nan') if value is None else float(value)
+        if self.kind == ENUM:
+            return _MISSING_ENUM if value is None else value.value
+        if isinstance(value, list):
+            value = tuple(value)
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self.codes[value] = code
+        return code
+
+    def decode(self, raw):
+        if self.kind == FLOAT:
+            return None if math.isnan(raw) else raw
+        if self.kind == INTEGER:
+            return None if math.isnan(raw) else int(raw)
+        if self.kind == ENUM:
+            return None if raw == _MISSING_ENUM else self.enum(raw)
+        value = self.values[raw]
+        # Lists are stored as plain tuples, other tuples like Version are kept
+        if type(value) is tuple:
+            return list(value)
+        return value
+
+    def key(self, raw):
+        """ Decodes a raw value for usage as dictionary key, with list values being returned as tuples. """
+        if self.kind == CATEGORY:
+            return self.values[raw]
+        return self.decode(raw)
+
+    def append(self, value):
+        self.data.append(self.encode(value))
+
+    def matcher(self, wanted, subset=False):
+        """ Returns a predicate on raw column values that checks for equality with the wanted value.
+            With subset being set, list values match if they contain all wanted list entries.
+        """
+        if self.kind in (FLOAT, INTEGER):
+            if wanted is None:
+                return math.isnan
+            wanted = float(wanted)
+            return lambda raw: raw == wanted
+        if self.kind == ENUM:
+            code = _MISSING_ENUM if wanted is None else wanted.value
+            return lambda raw: raw == code
+        if isinstance(wanted, list):
+            if subset:
+                wanted = set(wanted)
+                codes = frozenset(code for code, value in enumerate(self.values)
+                                  if isinstance(value, tuple) and wanted.issubset(value))
+                return lambda raw: raw in codes
+            wanted = tuple(wanted)
+        code = self.codes.get(wanted)
+        return lambda raw: raw == code
+
+    def __len__(self):
+        return len(self.data)
+
+
+class Table(object):
+    """ A column-oriented container for namedtuple instances of one type.
+
+        Numbers are kept in array.array buffers (usable with numpy.frombuffer), enumerations as
+        small integers, and all other values dictionary-encoded as integer codes. Filtering, grouping
+        and aggregation work on the columns, without creating one tuple per row.
+        Iteration and indexing yield rows as instances of the namedtuple type.
+    """
+
+    def __init__(self, row_type, kinds=None, enums=None, rows=None, columns=None):
+        self.row_type = row_type
+        if columns is None:
+            kinds = kinds or {}
+            enums = enums or {}
+            columns = [Column(kinds.get(name, CATEGORY), enums.get(name)) for name in row_type._fields]
+        self._columns = columns
+        self._index = dict((name, position) for position, name in enumerate(row_type._fields))
+        if rows is not None:
+            self.extend(rows)
+
+    def _derive(self, positions):
+        columns = []
+        for column in self._columns:
+            derived = column.derive()
+            data = column.data
+            derived.data.extend(data[position] for position in positions)
+            columns.append(derived)
+        table = object.__new__(self.__class__)
+        Table.__init__(table, self.row_type, columns=columns)
+        return table
+
+    def append(self, row):
+        for column, value in zip(self._columns, row):
+            column.append(value)
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def __len__(self):
+        return len(self._columns[0])
+
+    def __getitem__(self, position):
+        return self.row_type._make(column.decode(column.data[position]) for column in self._columns)
+
+    def __iter__(self):
+        decoders = [(column.decode, column.data) for column in self._columns]
+        make = self.row_type._make
+        for position in range(len(self)):
+            yield make(decode(data[position]) for decode, data in decoders)
+
+    def column(self, name):
+        """ Returns the raw column storage for the attribute, as array.array instance.
+
+            Floats and integers are stored as doubles with NaN for None, enumerations as their integer value
+            with -1 for None, all other attributes as codes into the list returned by categories().
+        """
+        return self._column(name).data
+
+    def categories(self, name):
+        """ Returns the list of distinct values of a dictionary-encoded column, indexed by code. """
+        return self._column(name).values
+
+    def values(self, name):
+        """ Returns the decoded values of one column as list. """
+        column = self._column(name)
+        return [column.decode(raw) for raw in column.data]
+
+    def _column(self, name):
+        try:
+            return self._columns[self._index[name]]
+        except KeyError:
+            raise drmaa2.InvalidArgumentException("Unknown attribute '%s'." % name)
+
+    def positions(self, **criteria):
+        """ Returns the row positions where all given attributes equal the given values. """
+        return self._positions(criteria, False)
+
+    def _positions(self, criteria, subset):
+        positions = None
+        for name, wanted in criteria.items():
+            column = self._column(name)
+            match = column.matcher(wanted, subset)
+            data = column.data
+            if positions is None:
+                positions = [position for position, raw in enumerate(data) if match(raw)]
+            else:
+                positions = [position for position in positions if match(data[position])]
+        if positions is None:
+            return list(range(len(self)))
+        return positions
+
+    def positions_between(self, name, low=None, high=None):
+        """ Returns the row positions where the numeric or enumeration attribute is at least low and below high.
+            None values never match.
+        """
+        column = self._column(name)
+        if column.kind == CATEGORY:
+            raise drmaa2.InvalidArgumentException("Attribute '%s' is not numeric." % name)
+        data = column.data
+        if column.kind == ENUM:
+            # Only needed for None, as enumeration values are not negative
+            low = 0 if low is None else max(0, low)
+        low = float('-inf') if low is None else low
+        high = float('inf') if high is None else high
+        return [position for position, raw in enumerate(data) if low <= raw < high]
+
+    def between(self, name, low=None, high=None):
+        """ Returns a new table with the rows where the attribute is at least low and below high. """
+        return self._derive(self.positions_between(name, low, high))
+
+    def where(self, **criteria):
+        """ Returns a new table with the rows where all given attributes equal the given values. """
+        return self._derive(self.positions(**criteria))
+
+    def filter(self, filter):
+        """ Returns a new table with the rows matching a partially filled namedtuple instance,
+            following the filter semantics of JobSession.get_jobs().
+        """
+        if filter is None:
+            return self
+        criteria = dict((name, value) for name, value in zip(filter._fields, filter) if value is not None)
+        return self._derive(self._positions(criteria, True))
+
+    def count_by(self, *names):
+        """ Returns a dictionary mapping each value (tuple of values for several names) to its row count. """
+        counts = {}
+        for key in self._keys(names):
+            counts[key] = counts.get(key, 0) + 1
+        return self._decode_keys(names, counts)
+
+    def sum(self, name):
+        """ Returns the sum of a numeric column, ignoring None values. """
+        column = self._column(name)
+        if column.kind not in (FLOAT, INTEGER):
+            raise drmaa2.InvalidArgumentException("Attribute '%s' is not numeric." % name)
+        return math.fsum(raw for raw in column.data if not math.isnan(raw))
+
+    def sum_by(self, name, *names):
+        """ Returns a dictionary mapping each value (tuple of values for several names) to the sum
+            of the numeric column, ignoring None values.
+        """
+        column = self._column(name)
+        if column.kind not in (FLOAT, INTEGER):
+            raise drmaa2.InvalidArgumentException("Attribute '%s' is not numeric." % name)
+        sums = {}
+        for key, raw in zip(self._keys(names), column.data):
+            if not math.isnan(raw):
+                sums[key] = sums.get(key, 0.0) + raw
+        return self._decode_keys(names, sums)
+
+    def group_by(self, name):
+        """ Returns a dictionary mapping each value of the column to a table with the according rows. """
+        column = self._column(name)
+        groups = {}
+        for position, raw in enumerate(column.data):
+            groups.setdefault(raw, []).append(position)
+        return dict((column.key(raw), self._derive(positions)) for raw, positions in groups.items())
+
+    def _keys(self, names):
+        if not names:
+            raise drmaa2.InvalidArgumentException("No grouping attribute given.")
+        datas = [self._column(name).data for name in names]
+        if len(datas) == 1:
+            return datas[0]
+        return zip(*datas)
+
+    def _decode_keys(self, names, result):
+        columns = [self._column(name) for name in names]
+        if len(columns) == 1:
+            return dict((columns[0].key(raw), value) for raw, value in result.items())
+        return dict((tuple(column.key(raw) for column, raw in zip(columns, key)), value)
+                    for key, value in result.items())
+
+
+class JobInfoTable(Table):
+    """ A column-oriented list of JobInfo instances. Job states are stored as small integers. """
+
+    def __init__(self, rows=None):
+        Table.__init__(self, drmaa2.JobInfo, _job_info_kinds, {'job_state': drmaa2.JobState}, rows)
+
+
+class NamedInfoTable(Table):
+    """ A table of info structures with a unique name attribute, and an index from names to row positions. """
+
+    def append(self, row):
+        Table.append(self, row)
+        self._rows = None
+
+    @property
+    def index(self):
+        """ The dictionary mapping each name to its row position. """
+        rows = getattr(self, '_rows', None)
+        if rows is None:
+            rows = self._rows = dict((name, position) for position, name in enumerate(self.values('name')))
+        return rows
+
+    def get(self, name):
+        """ Returns the row with the given name, or None. """
+        position = self.index.get(name)
+        return None if position is None else self[position]
+
+
+class MachineInfoTable(NamedInfoTable):
+    """ A column-oriented list of MachineInfo instances, for capacity calculations over many machines.
+
+        Operating systems and architectures are stored as small integers. With numpy, conditions like
+        numpy.frombuffer(table.column('load')) < 0.5 combine to row masks over all machines at once.
+    """
+
+    def __init__(self, rows=None):
+        Table.__init__(self, drmaa2.MachineInfo, _machine_info_kinds,
+                       {'machine_os': drmaa2.OperatingSystem, 'machine_arch': drmaa2.CpuArchitecture}, rows)
+
+    def slots(self):
+        """ Returns the number of hardware threads per row as array.array of doubles, unknown counts being 1. """
+        factors = [self.column(name) for name in ('sockets', 'cores_per_socket', 'threads_per_core')]
+        result = array('d')
+        for counts in zip(*factors):
+            slots = 1.0
+            for count in counts:
+                if not math.isnan(count):
+                    slots *= count
+            result.append(slots)
+        return result
+
+    def total_slots(self):
+        return math.fsum(self.slots())
+
+
+class QueueInfoTable(NamedInfoTable):
+    """ A column-oriented list of QueueInfo instances. """
+
+    def __init__(self, rows=None):
+        Table.__init__(self, drmaa2.QueueInfo, rows=rows)
+
+
+def get_all_machines_table(session, names=None):
+    """ get_all_machines_table(MonitoringSession, list) -> MachineInfoTable
+
+        Returns the machines get_all_machines() would return in one table, built by the session if supported.
+    """
+    native = getattr(session, 'get_all_machines_table', None)
+    if native is not None:
+        return native(names)
+    return MachineInfoTable(session.get_all_machines(names))
+
+
+def get_all_queues_table(session, names=None):
+    """ get_all_queues_table(MonitoringSession, list) -> QueueInfoTable
+
+        Returns the queues get_all_queues() would return in one table, built by the session if supported.
+    """
+    native = getattr(session, 'get_all_queues_table', None)
+    if native is not None:
+        return native(names)
+    return QueueInfoTable(session.get_all_queues(names))
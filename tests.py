@@ -1,5 +1,40 @@
+import os
+import sys
+import random
+import sqlite3
+import datetime
+import shutil
+import subprocess
+import tempfile
+import threading
 import unittest
 import drmaa2
+import benchmarks
+from drmaa2.backend import local
+from drmaa2 import bulk
+from drmaa2 import completion
+from drmaa2 import instrument
+from drmaa2 import paging
+from drmaa2 import policy
+from drmaa2 import reservations
+from drmaa2 import scheduler
+from drmaa2 import status
+from drmaa2 import tables
+from drmaa2.tables import JobInfoTable
+from drmaa2.backend import dispatch
+from drmaa2.backend import staging
+from drmaa2.backend import store
+from drmaa2.backend.connections import ConnectionPool
+from drmaa2.cache import CachingMonitoringSession
+
+try:
+    import asyncio
+    from drmaa2 import aio
+except (ImportError, SyntaxError):
+    aio = None
+
+# Long-running test jobs must not starve the others on small machines
+os.environ.setdefault('DRMAA2_LOCAL_WORKERS', '4')
 
 
 class GeneralTestCase(unittest.TestCase):
@@ -20,6 +55,32 @@ class GeneralTestCase(unittest.TestCase):
         self.assertEqual(jt.mock_testattr, None)
 
 
+class BackendLoadingTestCase(unittest.TestCase):
+    def _run(self, code, backend=None):
+        environment = dict(os.environ)
+        environment.pop('DRMAA2_BACKEND', None)
+        if backend is not None:
+            environment['DRMAA2_BACKEND'] = backend
+        return subprocess.check_output([sys.executable, '-c', code], env=environment).decode().split()
+
+    def test_lazy_import(self):
+        self.assertEqual(self._run("import sys, drmaa2; print('drmaa2.backend.mock' in sys.modules)"), ['False'])
+        self.assertEqual(self._run("import sys, drmaa2; drmaa2.JobTemplate(); print('drmaa2.backend.mock' in sys.modules)"),
+                         ['True'])
+
+    def test_environment(self):
+        code = "import drmaa2; print(drmaa2.supports(drmaa2.Capability.JT_STAGING))"
+        self.assertEqual(self._run(code, 'local'), ['True'])
+        self.assertEqual(self._run(code, 'mock'), ['False'])
+
+    def test_load(self):
+        self.assertIn('local', drmaa2.backend.names())
+        self.assertIs(drmaa2.backend.load('local'), local)
+        self.assertIs(drmaa2.backend.load('drmaa2.backend.local'), local)
+        self.assertEqual(drmaa2.backend.load('mock').drms_name, drmaa2.drms_name)
+        self.assertRaises(ImportError, drmaa2.backend.load, 'drmaa2.backend.missing')
+
+
 class SessionManagerTestCase(unittest.TestCase):
     def test_describe_attribute(self):
         drmaa2.describe_attribute(drmaa2.Notification(), "sessionName")
@@ -62,6 +123,10 @@ class SessionManagerTestCase(unittest.TestCase):
 
 
 class MonitoringSessionTestCase(unittest.TestCase):
+    def test_iter_all_jobs(self):
+        session = drmaa2.open_monitoring_session()
+        self.assertEqual(list(paging.iter_all_jobs(session)), session.get_all_jobs())
+
     def test_get_all_jobs(self):
         session = drmaa2.open_monitoring_session("Foo")
         session.get_all_jobs("foo")
@@ -81,5 +146,1174 @@ class JobSessionTestCase(unittest.TestCase):
         job.wait_terminated(drmaa2.INFINITE_TIME)
 
 
+class JobInfoTableTestCase(unittest.TestCase):
+    def setUp(self):
+        running, done = drmaa2.JobState.RUNNING, drmaa2.JobState.DONE
+        self.rows = [drmaa2.JobInfo(job_id='1', job_state=running, queue_name='a', job_owner='x', cpu_time=1.5),
+                     drmaa2.JobInfo(job_id='2', job_state=done, queue_name='a', job_owner='y', cpu_time=2.0,
+                                    exit_status=0, allocated_machines=['n1', 'n2']),
+                     drmaa2.JobInfo(job_id='3', job_state=running, queue_name='b', job_owner='x', cpu_time=4.0)]
+        self.table = JobInfoTable(self.rows)
+
+    def test_rows(self):
+        self.assertEqual(len(self.table), 3)
+        self.assertEqual(list(self.table), self.rows)
+        self.assertEqual(self.table[1], self.rows[1])
+
+    def test_where(self):
+        running = self.table.where(job_state=drmaa2.JobState.RUNNING, queue_name='b')
+        self.assertEqual(running.values('job_id'), ['3'])
+        self.assertEqual(len(self.table.where(queue_name='unknown')), 0)
+        # None matches the missing values of every column kind
+        self.assertEqual(self.table.where(exit_status=None).values('job_id'), ['1', '3'])
+        self.assertEqual(self.table.where(job_sub_state=None).values('job_id'), ['1', '2', '3'])
+        missing = JobInfoTable(self.rows + [drmaa2.JobInfo(job_id='4')])
+        self.assertEqual(missing.where(job_state=None, wallclock_time=None).values('job_id'), ['4'])
+
+    def test_filter(self):
+        filtered = self.table.filter(drmaa2.JobInfo(allocated_machines=['n2']))
+        self.assertEqual(filtered.values('job_id'), ['2'])
+
+    def test_aggregates(self):
+        self.assertEqual(self.table.count_by('queue_name', 'job_state'),
+                         {('a', drmaa2.JobState.RUNNING): 1, ('a', drmaa2.JobState.DONE): 1,
+                          ('b', drmaa2.JobState.RUNNING): 1})
+        self.assertEqual(self.table.sum_by('cpu_time', 'job_owner'), {'x': 5.5, 'y': 2.0})
+        self.assertEqual(self.table.sum('cpu_time'), 7.5)
+        self.assertEqual(sorted(self.table.group_by('job_owner')['x'].values('job_id')), ['1', '3'])
+        self.assertRaises(drmaa2.InvalidArgumentException, self.table.sum, 'job_owner')
+
+
+class MachineInfoTableTestCase(unittest.TestCase):
+    def setUp(self):
+        linux, x64 = drmaa2.OperatingSystem.LINUX, drmaa2.CpuArchitecture.X64
+        self.rows = [drmaa2.MachineInfo(name='n1', sockets=2, cores_per_socket=8, threads_per_core=2, load=0.2,
+                                        machine_os=linux, machine_arch=x64),
+                     drmaa2.MachineInfo(name='n2', sockets=1, cores_per_socket=4, load=0.9, machine_os=linux,
+                                        machine_arch=x64),
+                     drmaa2.MachineInfo(name='n3', sockets=1, cores_per_socket=4, load=0.1)]
+        self.table = tables.MachineInfoTable(self.rows)
+
+    def test_capacity(self):
+        self.assertEqual(list(self.table), self.rows)
+        self.assertEqual(self.table.index, {'n1': 0, 'n2': 1, 'n3': 2})
+        self.assertEqual(self.table.get('n2'), self.rows[1])
+        self.assertEqual(list(self.table.slots()), [32.0, 4.0, 4.0])
+        idle = self.table.where(machine_os=drmaa2.OperatingSystem.LINUX,
+                                machine_arch=drmaa2.CpuArchitecture.X64).between('load', high=0.5)
+        self.assertEqual(idle.values('name'), ['n1'])
+        self.assertEqual(idle.total_slots(), 32.0)
+        self.assertEqual(self.table.positions_between('machine_os', 0), [0, 1])
+        self.assertEqual(list(self.table.column('machine_os')), [drmaa2.OperatingSystem.LINUX.value] * 2 + [-1])
+
+    def test_local_backend(self):
+        session = local.open_monitoring_session()
+        table = tables.get_all_machines_table(session)
+        self.assertEqual(list(table), session.get_all_machines())
+        self.assertEqual(list(tables.get_all_queues_table(session)), session.get_all_queues())
+        self.assertIn(local._hostname, table.index)
+        session.close()
+
+
+class CountingMonitoringSession(local.MonitoringSession):
+    def __init__(self):
+        local.MonitoringSession.__init__(self)
+        self.calls = 0
+
+    def get_all_machines(self, names=None):
+        self.calls += 1
+        machines = [drmaa2.MachineInfo(name='n%u' % number, load=0.5) for number in range(3)]
+        return [machine for machine in machines if names is None or machine.name in names]
+
+
+class CachingMonitoringSessionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.now = 0
+        self.backend = CountingMonitoringSession()
+        self.session = CachingMonitoringSession(self.backend, machine_ttl=10, clock=lambda: self.now)
+
+    def test_ttl(self):
+        self.assertEqual([m.name for m in self.session.get_all_machines(['n1'])], ['n1'])
+        self.assertEqual(len(self.session.get_all_machines()), 3)
+        self.assertEqual(self.session.get_all_machines(['unknown']), [])
+        self.assertEqual(self.backend.calls, 1)
+        self.now = 11
+        self.session.get_all_machines(['n2'])
+        self.assertEqual(self.backend.calls, 2)
+        stats = self.session.stats()['machines']
+        self.assertEqual((stats['hits'], stats['misses']), (2, 2))
+
+    def test_invalidation(self):
+        self.session.get_all_machines()
+        self.session.handle_notification(drmaa2.Notification(event=drmaa2.Event.NEW_STATE))
+        self.session.get_all_machines()
+        self.assertEqual(self.backend.calls, 1)
+        self.session.handle_notification(drmaa2.Notification(event=drmaa2.Event.ATTRIBUTE_CHANGE))
+        self.session.get_all_machines()
+        self.assertEqual(self.backend.calls, 2)
+
+    def test_eviction(self):
+        session = CachingMonitoringSession(self.backend, maxsize=2, clock=lambda: self.now)
+        self.assertEqual(len(session.get_all_machines()), 3)
+        self.assertEqual(len(session.get_all_machines(['n1', 'n2'])), 2)
+        self.assertEqual(self.backend.calls, 1)
+        session.get_all_machines()
+        self.assertEqual(self.backend.calls, 2)
+        self.assertEqual(session.stats()['machines']['evictions'], 2)
+
+
+class LocalBackendTestCase(unittest.TestCase):
+    def setUp(self):
+        self.session = local.create_job_session()
+
+    def tearDown(self):
+        self.session.close()
+        local.destroy_session(self.session.session_name)
+
+    def test_run_job_done(self):
+        job = self.session.run_job(drmaa2.JobTemplate(remote_command='true'))
+        job.wait_terminated(drmaa2.INFINITE_TIME)
+        self.assertEqual(job.get_state()[0], drmaa2.JobState.DONE)
+        self.assertEqual(job.get_info().exit_status, 0)
+
+    def test_run_job_failed(self):
+        job = self.session.run_job(drmaa2.JobTemplate(remote_command='sh', args=['-c', 'exit 3']))
+        job.wait_terminated(drmaa2.INFINITE_TIME)
+        info = job.get_info()
+        self.assertEqual(info.job_state, drmaa2.JobState.FAILED)
+        self.assertEqual(info.exit_status, 3)
+
+    def test_output_path(self):
+        directory = tempfile.mkdtemp()
+        try:
+            jt = drmaa2.JobTemplate(remote_command='echo', args=['hello'], working_directory=directory,
+                                    output_path=drmaa2.WORKING_DIR + '/out.txt')
+            self.session.run_job(jt).wait_terminated(drmaa2.INFINITE_TIME)
+            with open(os.path.join(directory, 'out.txt')) as f:
+                self.assertEqual(f.read(), 'hello\n')
+        finally:
+            shutil.rmtree(directory)
+
+    def test_hold_release(self):
+        job = self.session.run_job(drmaa2.JobTemplate(remote_command='true', submit_as_hold=True))
+        self.assertEqual(job.get_state()[0], drmaa2.JobState.QUEUED_HELD)
+        self.assertRaises(drmaa2.TimeoutException, job.wait_started, drmaa2.ZERO_TIME)
+        job.release()
+        job.wait_terminated(drmaa2.INFINITE_TIME)
+        self.assertEqual(job.get_state()[0], drmaa2.JobState.DONE)
+
+    def test_terminate(self):
+        job = self.session.run_job(drmaa2.JobTemplate(remote_command='sleep', args=['60']))
+        job.wait_started(drmaa2.INFINITE_TIME)
+        job.terminate()
+        job.wait_terminated(10)
+        self.assertEqual(job.get_state()[0], drmaa2.JobState.FAILED)
+        job.reap()
+        self.assertRaises(drmaa2.InvalidArgumentException, job.get_state)
+
+    def test_run_bulk_jobs(self):
+        array = self.session.run_bulk_jobs(drmaa2.JobTemplate(remote_command='sh', args=['-c', 'exit 0']), 1, 10, 3)
+        self.assertEqual(len(array.jobs), 4)
+        for job in array.jobs:
+            job.wait_terminated(drmaa2.INFINITE_TIME)
+        self.assertIs(self.session.get_job_array(array.job_array_id), array)
+        done = self.session.get_jobs(drmaa2.JobInfo(job_state=drmaa2.JobState.DONE))
+        self.assertEqual(len(done), 4)
+        table = self.session.get_jobs_table(drmaa2.JobInfo(job_state=drmaa2.JobState.DONE))
+        self.assertEqual(sorted(table.values('job_id')), sorted(job.job_id for job in done))
+
+    def test_run_bulk_jobs_max_parallel(self):
+        self.assertTrue(local.supports(drmaa2.Capability.BULK_JOBS_MAXPARALLEL))
+        template = drmaa2.JobTemplate(remote_command='sleep', args=['0.1'])
+        array = self.session.run_bulk_jobs(template, 1, 6, 1, max_parallel=2)
+        progress = array.progress()
+        self.assertEqual((progress['total'], progress['active']), (6, 2))
+        for job in array.jobs:
+            job.wait_terminated(10)
+        infos = [job.get_info() for job in array.jobs]
+        for info in infos:
+            running = [other for other in infos
+                       if other.dispatch_time <= info.dispatch_time < other.finish_time]
+            self.assertLessEqual(len(running), 2)
+        progress = array.progress()
+        self.assertEqual((progress['done'], progress['active'], progress['queued']), (6, 0, 0))
+        self.assertRaises(drmaa2.InvalidArgumentException, self.session.run_bulk_jobs, template, 1, 6, 1, 0)
+
+    def test_lazy_array_queries(self):
+        template = drmaa2.JobTemplate(remote_command='sleep', args=['30'], job_name='lazy')
+        total = 3 * local.BULK_CHUNK_SIZE
+        _, cursor = self.session.get_job_changes()
+        array = self.session.run_bulk_jobs(template, 1, total, 1, max_parallel=1)
+        try:
+            self.assertEqual(len(self.session.get_jobs()), total)
+            self.assertEqual(len(self.session.get_jobs(drmaa2.JobInfo(job_name='lazy'))), total)
+            self.assertEqual(self.session.get_jobs(drmaa2.JobInfo(job_name='other')), [])
+            last = '%s.%u' % (array.job_array_id, total)
+            jobs = self.session.get_jobs(drmaa2.JobInfo(job_id=last, job_state=drmaa2.JobState.QUEUED))
+            self.assertEqual([job.job_id for job in jobs], [last])
+            self.assertEqual(len(self.session.get_job_changes(cursor)[0]), total)
+            self.assertEqual(array.progress()['unsubmitted'], total - local.BULK_CHUNK_SIZE)
+            self.assertEqual(jobs[0].get_state()[0], drmaa2.JobState.QUEUED)
+        finally:
+            self.session.control_jobs('hold')
+            array.terminate()
+
+    def test_array_scheduler(self):
+        template = drmaa2.JobTemplate(remote_command='sh', args=['-c', 'sleep 0.2; exit $0', drmaa2.PARAMETRIC_INDEX])
+        array = scheduler.ArrayScheduler(self.session, template, 1, 5, 2, max_parallel=2).start()
+        self.assertLessEqual(array.progress()['active'], 2)
+        self.assertTrue(array.wait(10))
+        self.assertEqual([job.job_template.args[2] for job in array.jobs], ['1', '3', '5'])
+        progress = array.progress()
+        self.assertEqual((progress['failed'], progress['done'], progress['unsubmitted']), (3, 0, 0))
+        infos = [job.get_info() for job in array.jobs]
+        for info in infos:
+            running = [other for other in infos
+                       if other.dispatch_time <= info.dispatch_time < other.finish_time]
+            self.assertLessEqual(len(running), 2)
+        # Finished only once the terminated tasks are gone
+        array = scheduler.ArrayScheduler(self.session, drmaa2.JobTemplate(remote_command='sleep', args=['30']),
+                                         1, 4, 1, max_parallel=2).start()
+        array.terminate()
+        self.assertTrue(array.wait(10))
+        self.assertEqual(array.progress()['active'], 0)
+        for job in array.jobs:
+            self.assertIn(job.get_state()[0], (drmaa2.JobState.FAILED, drmaa2.JobState.DONE))
+        # The backend of the session enforces max_parallel
+        native = scheduler.run_bulk_jobs(self.session, template, 1, 2, 1, 1)
+        self.assertIsInstance(native, local.JobArray)
+        native.terminate()
+        staged = drmaa2.JobTemplate(remote_command='true', args=[u'in.' + drmaa2.PARAMETRIC_INDEX],
+                                    stage_in_files={'in.' + drmaa2.PARAMETRIC_INDEX: 'data'})
+        expanded = scheduler.expand_template(staged, 7)
+        self.assertEqual((expanded.args, expanded.stage_in_files), (['in.7'], {'in.7': 'data'}))
+        expanded = scheduler.expand_template(staged._replace(args=('x' + drmaa2.PARAMETRIC_INDEX, 1)), 7)
+        self.assertEqual(expanded.args, ('x7', 1))
+        array = self.session.run_bulk_jobs(expanded._replace(args=('x' + drmaa2.PARAMETRIC_INDEX,)), 1, 2, 1)
+        self.assertEqual(array.jobs[1].job_template.args, ('x2',))
+        array.terminate()
+
+    def test_run_bulk_jobs_parametric_index(self):
+        directory = tempfile.mkdtemp()
+        try:
+            jt = drmaa2.JobTemplate(remote_command='echo', args=['task', drmaa2.PARAMETRIC_INDEX],
+                                    output_path=os.path.join(directory, 'out.' + drmaa2.PARAMETRIC_INDEX))
+            array = self.session.run_bulk_jobs(jt, 1, 3, 1)
+            self.assertEqual(array.jobs[1].job_template.args, ['task', '2'])
+            for job in array.jobs:
+                job.wait_terminated(drmaa2.INFINITE_TIME)
+            with open(os.path.join(directory, 'out.3')) as f:
+                self.assertEqual(f.read(), 'task 3\n')
+        finally:
+            shutil.rmtree(directory)
+
+    def test_run_bulk_jobs_lazy(self):
+        jt = drmaa2.JobTemplate(remote_command='true', submit_as_hold=True)
+        array = self.session.run_bulk_jobs(jt, 1, 20000, 2)
+        self.assertEqual(len(array.jobs), 10000)
+        last = array.jobs[-1]
+        self.assertEqual(last.job_id, '%s.19999' % array.job_array_id)
+        self.assertEqual(last.get_state()[0], drmaa2.JobState.QUEUED_HELD)
+        self.assertEqual([job.job_id for job in array.jobs[:2]],
+                         ['%s.1' % array.job_array_id, '%s.3' % array.job_array_id])
+        self.assertIs(last.job_template, jt)
+        self.assertIs(self.session.get_job_array(array.job_array_id), array)
+
+    def test_template_cache(self):
+        cache = local.TemplateCache(maxsize=2)
+        first = cache.compile(drmaa2.JobTemplate(remote_command='echo', args=['1'], job_environment={'A': 'x'}))
+        second = cache.compile(drmaa2.JobTemplate(remote_command='echo', args=['2'], job_environment={'A': 'x'}))
+        self.assertIs(first, second)
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1, 'size': 1})
+        self.assertRaises(drmaa2.UnsupportedAttributeException, cache.compile,
+                          drmaa2.JobTemplate(remote_command='echo', email=['root']))
+        self.assertRaises(drmaa2.InvalidArgumentException, cache.compile, drmaa2.JobTemplate())
+        template = drmaa2.JobTemplate(remote_command='echo', working_directory=drmaa2.HOME_DIR,
+                                      job_environment={'OUT': drmaa2.WORKING_DIR + '/' + drmaa2.PARAMETRIC_INDEX})
+        command, kwargs, files = cache.compile(template).popen_args([drmaa2.PARAMETRIC_INDEX, 3], 7)
+        for handle in files:
+            handle.close()
+        home = os.path.expanduser('~')
+        self.assertEqual(command, ['echo', '7', '3'])
+        self.assertEqual(kwargs['cwd'], home)
+        self.assertEqual(kwargs['env']['OUT'], home + '/7')
+        # Compiled on submission, the worker only looking the template up again
+        template = drmaa2.JobTemplate(remote_command='true', job_environment={'COMPILED': 'once'})
+        misses = local._templates.misses
+        self.session.run_job(template).wait_terminated(10)
+        self.assertEqual(local._templates.misses, misses + 1)
+        # The args are not part of the cache key, but checked on every submission
+        for args in (5, 'abc', ['a\0']):
+            bad = drmaa2.JobTemplate(remote_command='true', args=args, job_environment={'COMPILED': 'once'})
+            self.assertRaises(drmaa2.InvalidArgumentException, self.session.run_job, bad)
+            self.assertRaises(drmaa2.InvalidArgumentException, self.session.run_bulk_jobs, bad, 1, 2, 1)
+
+    def test_handle_memory(self):
+        template = drmaa2.JobTemplate(remote_command='echo', args=[drmaa2.PARAMETRIC_INDEX], submit_as_hold=True)
+        # Queued completely on submission, so that no records are created while measuring
+        array = self.session.run_bulk_jobs(template, 1, local.BULK_CHUNK_SIZE, 1)
+        job = array.jobs[0]
+        self.assertFalse(hasattr(job, '__dict__'))
+        self.assertLessEqual(sys.getsizeof(job), local.HANDLE_SIZE)
+        self.assertIs(job._template, array.jobs[1]._template)
+        self.assertIs(job.session_name, array.jobs[1].session_name)
+        self.assertEqual(job.job_template.args, ['1'])
+        try:
+            import tracemalloc
+        except ImportError:
+            return
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            jobs = list(array.jobs)
+            size = (tracemalloc.get_traced_memory()[0] - before) / float(len(jobs))
+        finally:
+            tracemalloc.stop()
+        # Besides the handle, each job has its ID string, a list slot and allocator rounding
+        self.assertLessEqual(size, local.HANDLE_SIZE + sys.getsizeof(job.job_id) + 48)
+        array.terminate()
+
+    def test_get_jobs_indexed(self):
+        held = self.session.run_job(drmaa2.JobTemplate(remote_command='true', job_name='a', submit_as_hold=True))
+        other = self.session.run_job(drmaa2.JobTemplate(remote_command='true', job_name='b', submit_as_hold=True))
+        jobs = self.session.get_jobs(drmaa2.JobInfo(job_state=drmaa2.JobState.QUEUED_HELD, job_name='a',
+                                                    queue_name=local.QUEUE_NAME))
+        self.assertEqual([job.job_id for job in jobs], [held.job_id])
+        self.assertEqual(self.session.get_jobs(drmaa2.JobInfo(job_name='a', slots=2)), [])
+        held.release()
+        held.wait_terminated(drmaa2.INFINITE_TIME)
+        machines = drmaa2.JobInfo(allocated_machines=[local._hostname], job_state=drmaa2.JobState.DONE)
+        self.assertEqual([job.job_id for job in self.session.get_jobs(machines)], [held.job_id])
+        held.reap()
+        self.assertEqual(self.session.get_jobs(drmaa2.JobInfo(job_name='a')), [])
+        other.terminate()
+        # Index matches are returned in submission order
+        template = drmaa2.JobTemplate(remote_command='true', job_name='ordered', submit_as_hold=True)
+        submitted = [self.session.run_job(template).job_id for _ in range(30)]
+        for filter in (drmaa2.JobInfo(job_name='ordered'),
+                       drmaa2.JobInfo(job_name='ordered', job_state=drmaa2.JobState.QUEUED_HELD)):
+            self.assertEqual([job.job_id for job in self.session.get_jobs(filter)], submitted)
+        self.assertEqual([job.job_id for job in self.session.get_jobs() if job.job_id in submitted], submitted)
+        bulk.control_jobs(self.session, 'terminate', filter=drmaa2.JobInfo(job_name='ordered'))
+
+    def test_persistent_sessions(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'sessions.sqlite')
+        local.open_store(path)
+        try:
+            session = local.create_job_session('persistent')
+            done = session.run_job(drmaa2.JobTemplate(remote_command='true'))
+            done.wait_terminated(drmaa2.INFINITE_TIME)
+            held = drmaa2.JobTemplate(remote_command='true', submit_as_hold=True)
+            array = session.run_bulk_jobs(held, 1, 5, 1)
+            # Simulate a restart of the process
+            local.close_store()
+            del local._job_sessions['persistent']
+            local.open_store(path)
+            self.assertIn('persistent', local.get_job_session_names())
+            session = local.open_job_session('persistent')
+            info = session.get_jobs(drmaa2.JobInfo(job_id=done.job_id))[0].get_info()
+            self.assertEqual((info.job_state, info.exit_status), (drmaa2.JobState.DONE, 0))
+            restored = session.get_job_array(array.job_array_id)
+            self.assertEqual(restored.jobs[4].get_state()[0], drmaa2.JobState.QUEUED_HELD)
+            self.assertEqual(restored.jobs[4].job_template, held)
+            self.assertNotEqual(session.run_job(held).job_id, done.job_id)
+            session.close()
+            local.destroy_session('persistent')
+            self.assertNotIn('persistent', local.get_job_session_names())
+        finally:
+            local.close_store()
+            shutil.rmtree(directory)
+
+    def test_session_store(self):
+        directory = tempfile.mkdtemp()
+        sessions = store.SessionStore(os.path.join(directory, 'sessions.sqlite'), flush_interval=0.01)
+        try:
+            template = drmaa2.JobTemplate(remote_command='echo', args=('a', 1), job_environment={'A': 'b'},
+                                          machine_os=drmaa2.OperatingSystem.LINUX, resource_limits={1: 2.5},
+                                          start_time=datetime.datetime(2020, 1, 2, 3, 4, 5, 6))
+            template_id = sessions.template_id(template)
+            sessions.flush()
+            sessions._template_ids.clear()
+            self.assertEqual(sessions.template_id(template), template_id)
+            self.assertEqual(sessions.template(template_id), template)
+
+            def fail(*args):
+                raise sqlite3.OperationalError("disk I/O error")
+            sessions._commit = fail
+            sessions.put_counter('jobs', 7)
+            self.assertRaises(drmaa2.InternalException, sessions.flush)
+            self.assertIsInstance(sessions.error, sqlite3.Error)
+            del sessions._commit
+            sessions.put_counter('other', 1)
+            sessions.flush()
+            self.assertIsNone(sessions.error)
+            self.assertEqual((sessions.counter('jobs'), sessions.counter('other')), (7, 1))
+            # Reads share the pooled connections
+            self.assertEqual(sessions._readers.stats()['connections'], {sessions.path: 1})
+        finally:
+            sessions.close()
+            shutil.rmtree(directory)
+        sessions = store.SessionStore(':memory:')
+        sessions.add_session('a', 'job', None)
+        self.assertEqual(sessions.session_names('job'), ['a'])
+        sessions.close()
+
+    def test_wait_any_terminated(self):
+        slow = self.session.run_job(drmaa2.JobTemplate(remote_command='sleep', args=['60']))
+        fast = self.session.run_job(drmaa2.JobTemplate(remote_command='true'))
+        self.assertIs(self.session.wait_any_terminated([slow, fast], 10), fast)
+        self.assertRaises(drmaa2.TimeoutException, self.session.wait_any_terminated, [slow], drmaa2.ZERO_TIME)
+        self.assertRaises(drmaa2.TimeoutException, self.session.wait_any_terminated, [slow], 0.05)
+        slow.terminate()
+        self.assertEqual(self.session.wait_any_terminated([slow], drmaa2.INFINITE_TIME).job_id, slow.job_id)
+        self.assertEqual(len(self.session._state.waiters), 0)
+
+    def test_staging(self):
+        directory = tempfile.mkdtemp()
+        try:
+            with open(os.path.join(directory, 'input'), 'w') as handle:
+                handle.write('data\n')
+            template = drmaa2.JobTemplate(remote_command='sh', args=['-c', 'cat in/input > output'],
+                                          working_directory=os.path.join(directory, 'task' + drmaa2.PARAMETRIC_INDEX),
+                                          stage_in_files={'../input': 'in/input'},
+                                          stage_out_files={'output': '../results/' + drmaa2.PARAMETRIC_INDEX})
+            for index in (1, 2, 3):
+                os.mkdir(os.path.join(directory, 'task%u' % index))
+            stats = local.get_stager().stats()
+            array = self.session.run_bulk_jobs(template, 1, 3, 1)
+            for job in array.jobs:
+                job.wait_terminated(10)
+                self.assertEqual(job.get_state()[0], drmaa2.JobState.DONE)
+                self.assertIsNotNone(job._record().staging_time)
+            for index in (1, 2, 3):
+                with open(os.path.join(directory, 'results', str(index))) as handle:
+                    self.assertEqual(handle.read(), 'data\n')
+            after = local.get_stager().stats()
+            self.assertEqual(after['files'] - stats['files'], 6)
+            self.assertEqual(after['deduplicated'] - stats['deduplicated'], 2)
+            missing = self.session.run_job(drmaa2.JobTemplate(remote_command='true', working_directory=directory,
+                                                              stage_in_files={'missing': 'copy'}))
+            missing.wait_terminated(10)
+            self.assertEqual(missing.get_state()[0], drmaa2.JobState.FAILED)
+            self.assertIn('could not be started', missing.get_info().annotation)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_staging_cache(self):
+        directory = tempfile.mkdtemp()
+        engine = staging.StagingEngine(workers=1, cache_size=10)
+        try:
+            for name, content in (('a', '12345'), ('b', '67890'), ('c', 'abcde'), ('big', 'x' * 11)):
+                with open(os.path.join(directory, name), 'w') as handle:
+                    handle.write(content)
+            engine.stage([(os.path.join(directory, name), os.path.join(directory, 'out', name + str(index)), True)
+                          for name in ('a', 'b', 'c', 'big') for index in (1, 2)])
+            stats = engine.stats()
+            self.assertEqual((stats['files'], stats['evicted'], stats['linked']), (8, 1, 0))
+            self.assertLessEqual(stats['cached_bytes'], 10)
+            # Copies of the cache may be changed by the jobs
+            target = os.path.join(directory, 'out', 'a1')
+            self.assertNotEqual(os.stat(target).st_ino, os.stat(os.path.join(directory, 'out', 'a2')).st_ino)
+            with open(target, 'a') as handle:
+                handle.write('6')
+            # Unexpected errors are raised by stage(), and leave the workers running
+            self.assertRaises(TypeError, engine.stage, [(None, os.path.join(directory, 'out', 'none'), True)])
+            engine.stage([(os.path.join(directory, 'a'), os.path.join(directory, 'out', 'a3'), True)])
+            with open(os.path.join(directory, 'out', 'a3')) as handle:
+                self.assertEqual(handle.read(), '12345')
+            cache = engine.cache_directory()
+        finally:
+            engine.clear()
+            shutil.rmtree(directory)
+        self.assertFalse(os.path.exists(cache))
+
+    def test_staging_cache_directory(self):
+        directory = tempfile.mkdtemp()
+        cache = os.path.join(directory, 'cache')
+        os.mkdir(cache)
+        engine = staging.StagingEngine(workers=1, cache_directory=cache)
+        try:
+            for name in ('input', os.path.join('cache', 'foreign')):
+                with open(os.path.join(directory, name), 'w') as handle:
+                    handle.write(name)
+            engine.stage([(os.path.join(directory, 'input'), os.path.join(directory, 'output'), True)])
+            self.assertEqual(len(os.listdir(cache)), 2)
+            # Only the inputs cached by the engine are removed from a given directory
+            engine.clear()
+            self.assertEqual(os.listdir(cache), ['foreign'])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_reservation_session(self):
+        session = local.create_reservation_session(contact='here')
+        slots = local.get_calendar().capacity[local._hostname]
+        try:
+            self.assertTrue(local.supports(drmaa2.Capability.ADVANCE_RESERVATION))
+            first = session.request_reservation(drmaa2.ReservationTemplate(start_time=1000.0, duration=60,
+                                                                           min_slots=slots))
+            info = first.get_info()
+            self.assertEqual((info.reserved_start_time, info.reserved_end_time, info.reserved_slots),
+                             (1000.0, 1060.0, slots))
+            # The calendar moves overlapping requests behind the reservations of all sessions
+            other = local.open_reservation_session(session.session_name)
+            self.assertEqual(other.contact, 'here')
+            second, denied, wrong_os = other.request_reservations([
+                drmaa2.ReservationTemplate(start_time=1030.0, duration=10, min_slots=1),
+                drmaa2.ReservationTemplate(start_time=1030.0, end_time=1050.0, min_slots=1),
+                drmaa2.ReservationTemplate(machine_os=drmaa2.OperatingSystem.OTHER_OS)])
+            self.assertEqual(second.get_info().reserved_start_time, 1060.0)
+            self.assertIsInstance(denied, drmaa2.DeniedByDrmsException)
+            self.assertIsInstance(wrong_os, drmaa2.DeniedByDrmsException)
+            self.assertIs(session.get_reservation(second.reservation_id), second)
+            monitoring = local.open_monitoring_session()
+            self.assertEqual(set(reservation.reservation_id for reservation in monitoring.get_all_reservations()),
+                             set([first.reservation_id, second.reservation_id]))
+            first.terminate()
+            self.assertEqual(session.get_reservations(), [second])
+            self.assertEqual(list(paging.iter_reservations(session)), [second])
+            self.assertEqual(local.get_calendar().earliest_fit(10, slots, not_before=1000.0)[0], 1000.0)
+            self.assertIn(session.session_name, local.get_reservation_session_names())
+        finally:
+            local.destroy_session(session.session_name)
+        self.assertNotIn(second.reservation_id, local.get_calendar())
+        self.assertRaises(drmaa2.InvalidSessionException, session.get_reservations)
+        self.assertRaises(drmaa2.InvalidArgumentException, local.open_reservation_session, session.session_name)
+
+    def test_malformed_template(self):
+        for template in (drmaa2.JobTemplate(remote_command='echo', args=['a\0b']),
+                         drmaa2.JobTemplate(remote_command='echo', args=[None]),
+                         drmaa2.JobTemplate(remote_command='echo', job_environment=[('A', 'b')]),
+                         drmaa2.JobTemplate(remote_command='echo', stage_in_files={'a': 1})):
+            self.assertRaises(drmaa2.InvalidArgumentException, self.session.run_job, template)
+            self.assertRaises(drmaa2.InvalidArgumentException, self.session.run_bulk_jobs, template, 1, 2, 1)
+
+    def test_worker_survives_errors(self):
+        class BrokenSubprocess(object):
+            STDOUT = subprocess.STDOUT
+
+            @staticmethod
+            def Popen(*args, **kwargs):
+                raise ValueError("broken")
+        local.subprocess = BrokenSubprocess
+        try:
+            jobs = [self.session.run_job(drmaa2.JobTemplate(remote_command='true')) for _ in range(8)]
+            for job in jobs:
+                job.wait_terminated(10)
+                self.assertEqual(job.get_state()[0], drmaa2.JobState.FAILED)
+                self.assertIn('broken', job.get_info().annotation)
+        finally:
+            local.subprocess = subprocess
+        job = self.session.run_job(drmaa2.JobTemplate(remote_command='true'))
+        job.wait_terminated(10)
+        self.assertEqual(job.get_state()[0], drmaa2.JobState.DONE)
+
+    def test_wait_all_terminated(self):
+        slow = self.session.run_job(drmaa2.JobTemplate(remote_command='sleep', args=['0.2']))
+        fast = [self.session.run_job(drmaa2.JobTemplate(remote_command='true')) for _ in range(3)]
+        self.assertRaises(drmaa2.TimeoutException, self.session.wait_all_terminated, [slow] + fast, drmaa2.ZERO_TIME)
+        done = self.session.wait_all_terminated([slow] + fast, 10)
+        self.assertEqual(sorted(job.job_id for job in done), sorted(job.job_id for job in [slow] + fast))
+        self.assertIs(done[-1], slow)
+        self.assertEqual(len(self.session._state.waiters), 0)
+
+    def test_drain_terminated(self):
+        blocked = self.session.run_job(drmaa2.JobTemplate(remote_command='sleep', args=['60']))
+        jobs = [self.session.run_job(drmaa2.JobTemplate(remote_command='true')) for _ in range(5)]
+        with self.session.track_terminated([blocked] + jobs) as completions:
+            drained = []
+            while len(drained) < len(jobs):
+                drained.extend(completions.drain(2, 10))
+            self.assertEqual(sorted(job.job_id for job in drained), sorted(job.job_id for job in jobs))
+            self.assertRaises(drmaa2.TimeoutException, completions.drain, None, drmaa2.ZERO_TIME)
+            blocked.terminate()
+            self.assertEqual(completions.drain(None, 10), [blocked])
+            self.assertEqual(completions.drain(), [])
+        self.assertEqual(len(self.session._state.waiters), 0)
+        generic = completion.Completions(self.session, [blocked] + jobs)
+        self.assertEqual(sorted(job.job_id for job in generic), sorted(job.job_id for job in [blocked] + jobs))
+        self.assertEqual(generic.remaining(), 0)
+
+    def test_wait_any_terminated_many(self):
+        array = self.session.run_bulk_jobs(drmaa2.JobTemplate(remote_command='true', submit_as_hold=True),
+                                           1, 2 * local._CLEANUP_THRESHOLD, 1)
+        jobs = list(array.jobs)
+        jobs[-1].terminate()
+        self.assertEqual(self.session.wait_any_terminated(jobs, 10).job_id, jobs[-1].job_id)
+        # The waiter table is cleaned up in the background
+        for _ in range(100):
+            if len(self.session._state.waiters) == 0:
+                break
+            threading.Event().wait(0.05)
+        self.assertEqual(len(self.session._state.waiters), 0)
+        array.terminate()
+
+    def test_iter_all_jobs(self):
+        template = drmaa2.JobTemplate(remote_command='true', submit_as_hold=True)
+        jobs = [self.session.run_job(template) for _ in range(5)]
+        session = local.open_monitoring_session()
+        job_ids = [job.job_id for job in jobs]
+        found = [job.job_id for job in paging.iter_all_jobs(session, page_size=2) if job.job_id in job_ids]
+        self.assertEqual(sorted(found), sorted(job_ids))
+        held = drmaa2.JobInfo(job_state=drmaa2.JobState.QUEUED_HELD, job_name=None)
+        iterator = paging.iter_all_jobs(session, held, page_size=2)
+        next(iterator)
+        iterator.close()
+        self.assertEqual(list(paging.iter_all_reservations(session)), [])
+        self.assertRaises(drmaa2.InvalidArgumentException, paging.iter_all_jobs, session, None, 0)
+        # Tasks created and jobs reaped while paging are seen once, or not at all
+        array = self.session.run_bulk_jobs(drmaa2.JobTemplate(remote_command='sleep', args=['30']),
+                                           1, 3 * local.BULK_CHUNK_SIZE, 1, max_parallel=1)
+        iterator = session.iter_all_jobs(drmaa2.JobInfo(job_name=None), page_size=100)
+        found = [next(iterator).job_id for _ in range(3)]
+        jobs[0].terminate()
+        jobs[0].reap()
+        array.jobs[2 * local.BULK_CHUNK_SIZE].get_state()
+        found.extend(job.job_id for job in iterator)
+        self.assertEqual(len(found), len(set(found)))
+        self.assertEqual(set(found), set(job.job_id for job in self.session.get_jobs()) | set(found[:3]))
+        session.close()
+        self.session.control_jobs('hold')
+        bulk.terminate_jobs(self.session, jobs[1:])
+        array.terminate()
+
+    def test_job_changes(self):
+        template = drmaa2.JobTemplate(remote_command='true', submit_as_hold=True)
+        jobs = [self.session.run_job(template) for _ in range(3)]
+        infos, cursor = self.session.get_job_changes()
+        self.assertEqual([info.job_id for info in infos], [job.job_id for job in jobs])
+        self.assertEqual(self.session.get_job_changes(cursor)[0], [])
+        jobs[1].terminate()
+        infos, cursor = self.session.get_job_changes(cursor)
+        self.assertEqual([(info.job_id, info.job_state) for info in infos], [(jobs[1].job_id, drmaa2.JobState.FAILED)])
+        monitoring = local.open_monitoring_session()
+        infos, monitoring_cursor = monitoring.get_job_changes()
+        self.assertTrue(set(job.job_id for job in jobs) <= set(info.job_id for info in infos))
+        jobs[1].reap()
+        jobs[2].terminate()
+        self.assertEqual([info.job_id for info in monitoring.get_job_changes(monitoring_cursor)[0]], [jobs[2].job_id])
+        self.assertEqual(len(self.session.get_job_changes('other:1')[0]), 2)
+        self.assertRaises(drmaa2.InvalidArgumentException, self.session.get_job_changes, 'invalid')
+        monitoring.close()
+        jobs[0].terminate()
+
+    def test_monitoring_session(self):
+        session = local.open_monitoring_session()
+        self.assertEqual(len(session.get_all_machines()), 1)
+        self.assertEqual(session.get_all_queues()[0].name, local.QUEUE_NAME)
+        session.close()
+        self.assertRaises(drmaa2.InvalidSessionException, session.get_all_jobs)
+
+
+class BenchmarksTestCase(unittest.TestCase):
+    def test_quick_run(self):
+        sizes = dict((name, 10 if isinstance(size, int) else (10,)) for name, size in benchmarks.QUICK_SIZES.items())
+        results = benchmarks.Benchmark(local, sizes).run()
+        names = set(result['name'] for result in results)
+        self.assertIn('run_job_throughput', names)
+        self.assertIn('wait_any_terminated_wakeup_latency', names)
+        self.assertIn('notification_delivery_rate', names)
+
+
+class PlainJobSession(object):
+    """ Hides the batched operations of a local backend session. """
+
+    def __init__(self, session):
+        self.session = session
+
+    def get_jobs(self, filter=None):
+        return self.session.get_jobs(filter)
+
+
+class BulkControlTestCase(unittest.TestCase):
+    def setUp(self):
+        self.session = local.create_job_session()
+        template = drmaa2.JobTemplate(remote_command='true', submit_as_hold=True)
+        self.jobs = [self.session.run_job(template) for _ in range(5)]
+
+    def tearDown(self):
+        self.session.close()
+        local.destroy_session(self.session.session_name)
+
+    def check(self, session):
+        held = drmaa2.JobInfo(job_state=drmaa2.JobState.QUEUED_HELD)
+        outcomes = bulk.terminate_jobs(session, filter=held)
+        self.assertEqual(outcomes, dict((job.job_id, None) for job in self.jobs))
+        outcomes = bulk.release_jobs(session, self.jobs[:2])
+        self.assertEqual(sorted(bulk.failed(outcomes)), sorted(job.job_id for job in self.jobs[:2]))
+        self.assertIsInstance(outcomes[self.jobs[0].job_id], drmaa2.InvalidStateException)
+        self.assertEqual(bulk.failed(bulk.reap_jobs(session)), {})
+        self.assertEqual(self.session.get_jobs(), [])
+        self.assertRaises(drmaa2.InvalidArgumentException, bulk.control_jobs, session, 'kill')
+
+    def test_batched(self):
+        self.check(self.session)
+
+    def test_fallback(self):
+        self.check(PlainJobSession(self.session))
+
+
+class FakeConnection(object):
+    def __init__(self, contact):
+        self.contact = contact
+        self.healthy = True
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTestCase(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.pool = ConnectionPool(FakeConnection, max_connections=2, max_pipelined=2, idle_timeout=60,
+                                   health_check=lambda connection: connection.healthy, check_interval=10,
+                                   clock=lambda: self.now)
+
+    def test_pipelining(self):
+        first = self.pool.acquire('a')
+        second = self.pool.acquire('a')
+        self.assertIs(first, second)
+        third = self.pool.acquire('a')
+        self.assertIsNot(third, first)
+        self.pool.acquire('a')
+        self.assertRaises(drmaa2.TryLaterException, self.pool.acquire, 'a', 0)
+        self.assertEqual(self.pool.acquire('b').contact, 'b')
+        self.pool.release(first)
+        self.assertIs(self.pool.acquire('a', 0), first)
+        self.assertEqual(self.pool.stats()['connections'], {'a': 2, 'b': 1})
+
+    def test_idle_and_health(self):
+        with self.pool.connection('a') as connection:
+            pass
+        self.now = 20.0
+        connection.healthy = False
+        with self.pool.connection('a') as replacement:
+            self.assertIsNot(replacement, connection)
+        self.assertTrue(connection.closed)
+        self.assertRaises(drmaa2.DrmCommunicationException, self._fail)
+        self.assertEqual(self.pool.stats()['connections'], {})
+        with self.pool.connection('a') as connection:
+            pass
+        self.now = 100.0
+        self.assertEqual(self.pool.evict_idle(), 1)
+        self.assertTrue(connection.closed)
+        stats = self.pool.stats()
+        self.assertEqual((stats['opened'], stats['failed_checks'], stats['evicted']), (3, 1, 1))
+
+    def _fail(self):
+        with self.pool.connection('a'):
+            raise drmaa2.DrmCommunicationException("Connection lost.")
+
+
+class FlakyJobSession(object):
+    """ Raises the queued exceptions on submission, before succeeding. """
+    contact = session_name = job_categories = None
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+
+    def run_job(self, job_template):
+        if self.errors:
+            raise self.errors.pop(0)
+        return job_template
+
+
+class PolicyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.sleeps = []
+        self.policy = policy.Policy(rate=10, burst=2, retries=2, backoff=1.0, failure_threshold=2, reset_timeout=5,
+                                    clock=lambda: self.now, sleep=self.sleep, random=lambda: 0.5)
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def test_token_bucket(self):
+        session = policy.PolicyJobSession(FlakyJobSession([]), self.policy)
+        for _ in range(4):
+            session.run_job('job')
+        self.assertEqual(self.sleeps, [0.1, 0.1])
+        self.assertEqual(self.policy.stats()['throttled'], 2)
+        bucket = policy.TokenBucket(1, 1, clock=lambda: self.now, sleep=self.sleep)
+        bucket.acquire()
+        self.assertRaises(drmaa2.TryLaterException, bucket.acquire, 1, 0.5)
+        self.assertEqual(bucket.acquire(1, 1.0), 1.0)
+
+    def test_backoff(self):
+        session = policy.PolicyJobSession(FlakyJobSession([drmaa2.TryLaterException()] * 2), self.policy)
+        self.assertEqual(session.run_job('job'), 'job')
+        self.assertEqual([delay for delay in self.sleeps if delay >= 0.5], [0.5, 1.0])
+        session = policy.PolicyJobSession(FlakyJobSession([drmaa2.TryLaterException()] * 3), self.policy)
+        self.assertRaises(drmaa2.TryLaterException, session.run_job, 'job')
+        stats = self.policy.stats()
+        self.assertEqual((stats['retries'], stats['failures']), (4, 1))
+
+    def test_circuit_breaker(self):
+        errors = [drmaa2.DrmCommunicationException()] * 3
+        session = policy.PolicyJobSession(FlakyJobSession(errors), self.policy)
+        self.assertRaises(drmaa2.DrmCommunicationException, session.run_job, 'job')
+        self.assertRaises(drmaa2.DrmCommunicationException, session.run_job, 'job')
+        self.assertEqual(self.policy.breaker.state, policy.OPEN)
+        self.assertRaises(drmaa2.DrmCommunicationException, session.run_job, 'job')
+        self.assertEqual(len(session.session.errors), 1)
+        self.now += 5
+        self.assertRaises(drmaa2.DrmCommunicationException, session.run_job, 'job')
+        self.assertEqual(self.policy.breaker.state, policy.OPEN)
+        self.now += 5
+        self.assertEqual(session.run_job('job'), 'job')
+        self.assertEqual(self.policy.breaker.state, policy.CLOSED)
+        self.assertEqual(self.policy.stats()['rejected'], 1)
+
+    def test_circuit_breaker_trial_error(self):
+        errors = [drmaa2.DrmCommunicationException()] * 2 + [drmaa2.InvalidArgumentException()]
+        session = policy.PolicyJobSession(FlakyJobSession(errors), self.policy)
+        for _ in range(2):
+            self.assertRaises(drmaa2.DrmCommunicationException, session.run_job, 'job')
+        self.assertEqual(self.policy.breaker.state, policy.OPEN)
+        self.now += 10
+        # The DRM system answered the trial call, if with an error
+        self.assertRaises(drmaa2.InvalidArgumentException, session.run_job, 'job')
+        self.assertEqual(self.policy.breaker.state, policy.CLOSED)
+        self.assertEqual(session.run_job('job'), 'job')
+
+
+class InstrumentTestCase(unittest.TestCase):
+    def tearDown(self):
+        instrument.disable('local')
+        instrument.reset()
+
+    def test_snapshot(self):
+        run_job, wait_terminated = local.JobSession.run_job, local.Job.wait_terminated
+        instrument.enable('local')
+        self.assertTrue(instrument.enabled('local'))
+        session = drmaa2.backend.load('local').create_job_session()
+        job = session.run_job(drmaa2.JobTemplate(remote_command='true'))
+        job.wait_terminated(drmaa2.INFINITE_TIME)
+        self.assertRaises(drmaa2.InvalidArgumentException, session.get_job_array, 'missing')
+        session.close()
+        local.destroy_session(session.session_name)
+        stats = instrument.snapshot()[local.__name__]
+        self.assertEqual(stats['create_job_session']['count'], 1)
+        self.assertEqual(stats['JobSession.run_job']['count'], 1)
+        self.assertEqual(stats['Job.wait_terminated']['count'], 1)
+        self.assertEqual(stats['JobSession.get_job_array']['errors'], 1)
+        self.assertEqual(sum(count for _, count in stats['JobSession.run_job']['buckets']), 1)
+        self.assertTrue(stats['JobSession.run_job']['p50'] <= stats['JobSession.run_job']['max'])
+        instrument.disable('local')
+        self.assertIs(local.JobSession.run_job, run_job)
+        self.assertIs(local.Job.wait_terminated, wait_terminated)
+        instrument.reset()
+        self.assertEqual(instrument.snapshot(), {})
+
+    def test_hooks(self):
+        calls = []
+
+        def hook(backend_name, method):
+            calls.append(method)
+            return lambda seconds, error: calls.append((method, error is None))
+        instrument.add_hook(hook)
+        try:
+            instrument.enable('local')
+            local.get_job_session_names()
+        finally:
+            instrument.remove_hook(hook)
+        self.assertEqual(calls, ['get_job_session_names', ('get_job_session_names', True)])
+
+    def test_histogram(self):
+        histogram = instrument.Histogram()
+        for seconds in (0.000001, 0.001, 0.001, 0.002, 1.0):
+            histogram.add(seconds, None)
+        summary = histogram.summary()
+        self.assertEqual((summary['count'], summary['min'], summary['max']), (5, 0.000001, 1.0))
+        self.assertTrue(0.001 <= summary['p50'] <= 0.002)
+        self.assertEqual(summary['p99'], 1.0)
+
+
+class ReservationCalendarTestCase(unittest.TestCase):
+    def setUp(self):
+        self.calendar = reservations.ReservationCalendar({'a': 4, 'b': 2}, clock=lambda: 0.0)
+
+    def _info(self, reservation_id, start, end, machines):
+        return drmaa2.ReservationInfo(reservation_id=reservation_id, reserved_start_time=start, reserved_end_time=end,
+                                      reserved_machines=[drmaa2.SlotInfo(name, slots) for name, slots in machines])
+
+    def test_interval_tree(self):
+        tree = reservations.IntervalTree()
+        for key in range(200):
+            tree.add(key, key + 10, key)
+        self.assertEqual([key for _, _, key, _ in tree.overlapping(100, 102)], list(range(91, 102)))
+        for key in range(0, 200, 2):
+            tree.remove(key)
+        self.assertEqual([key for _, _, key, _ in tree.overlapping(100, 102)], list(range(91, 102, 2)))
+        self.assertEqual(tree.overlapping(300, 400), [])
+        self.assertEqual(len(tree), 100)
+
+    def test_queries(self):
+        self.calendar.add(self._info('1', 0, 10, [('a', 3)]))
+        self.calendar.add(self._info('2', 5, 20, [('a', 1), ('b', 2)]))
+        self.calendar.add(self._info('3', 30, None, [('b', 1)]))
+        self.assertEqual([info.reservation_id for info in self.calendar.overlapping(8, 12)], ['1', '2'])
+        self.assertEqual([info.reservation_id for info in self.calendar.overlapping(8, 12, ['b'])], ['2'])
+        self.assertEqual([info.reservation_id for info in self.calendar.overlapping(100)], ['3'])
+        self.assertEqual(self.calendar.free_slots(0, 10), {'a': 0, 'b': 0})
+        self.assertEqual(self.calendar.free_slots(10, 20), {'a': 3, 'b': 0})
+        self.assertEqual(self.calendar.earliest_fit(5, 4), (20, {'a': 4, 'b': 2}))
+        self.assertEqual(self.calendar.earliest_fit(15, 5), (20, {'a': 4, 'b': 1}))
+        self.assertEqual(self.calendar.earliest_fit(15, 6), None)
+        self.assertEqual(self.calendar.earliest_fit(5, 3, ['a']), (10, {'a': 3}))
+        self.assertTrue(self.calendar.remove('1'))
+        self.assertEqual(self.calendar.free_slots(0, 5), {'a': 4, 'b': 2})
+
+    def test_earliest_fit_sweep(self):
+        # The sweep agrees with checking free_slots() at each candidate start time
+        generator = random.Random(1)
+        for number in range(20):
+            self.calendar.add(self._info(str(number), generator.randint(0, 40), generator.randint(41, 60),
+                                         [(generator.choice('ab'), 1)]))
+            self.calendar.add(self._info('%u.late' % number, generator.randint(0, 50), generator.randint(50, 70),
+                                         [('a', 1)]))
+        for duration, slots in ((1, 1), (5, 2), (10, 4), (None, 1), (20, 6)):
+            fit = self.calendar.earliest_fit(duration, slots)
+            if fit is None:
+                self.assertLess(sum(self.calendar.free_slots(70).values()), slots)
+                continue
+            start, free = fit
+            end = None if duration is None else start + duration
+            self.assertEqual(free, self.calendar.free_slots(start, end))
+            self.assertGreaterEqual(sum(free.values()), slots)
+            for earlier in range(int(start)):
+                later = None if duration is None else earlier + duration
+                self.assertLess(sum(self.calendar.free_slots(earlier, later).values()), slots)
+        tree = self.calendar._machines['a']
+        self.assertEqual(sorted(tree.ends_after(55)), sorted(end for _, end in tree._intervals.values() if end > 55))
+
+    def test_admit(self):
+        template = drmaa2.ReservationTemplate(duration=10, min_slots=4, max_slots=6)
+        outcomes = self.calendar.admit_all([template, template, drmaa2.ReservationTemplate(duration=10, min_slots=7)])
+        self.assertEqual((outcomes[0].reserved_start_time, outcomes[0].reserved_slots), (0.0, 6))
+        self.assertEqual((outcomes[1].reserved_start_time, outcomes[1].reserved_end_time), (10.0, 20.0))
+        self.assertIsInstance(outcomes[2], drmaa2.DeniedByDrmsException)
+        self.assertRaises(drmaa2.DeniedByDrmsException, self.calendar.admit,
+                          drmaa2.ReservationTemplate(start_time=0, end_time=15, duration=10, min_slots=1))
+        self.assertEqual(len(self.calendar), 2)
+
+
+class FakeJob(object):
+    def __init__(self, job_id):
+        self.job_id = job_id
+
+
+class CountingJobSession(object):
+    """ Answers bulk status queries with the job states set by the test, counting the queries. """
+    contact = session_name = job_categories = None
+
+    def __init__(self):
+        self.states = {}
+        self.queries = []
+        self.delay = 0
+
+    def get_job_infos(self, jobs):
+        self.queries.append(sorted(job.job_id for job in jobs))
+        if self.delay:
+            threading.Event().wait(self.delay)
+        return dict((job.job_id, drmaa2.JobInfo(job_id=job.job_id, job_state=self.states[job.job_id]))
+                    for job in jobs)
+
+
+class StatusCoalescerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.session = CountingJobSession()
+        self.sleeps = []
+        self.coalescer = status.StatusCoalescer(self.session, window=0.05, max_age=1.0, clock=lambda: self.now,
+                                                sleep=self.sleep)
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        threading.Event().wait(seconds)
+
+    def _job(self, job_id, job_state):
+        self.session.states[job_id] = job_state
+        return FakeJob(job_id)
+
+    def test_coalesce(self):
+        self.session.delay = 0.05
+        jobs = [self._job(str(number), drmaa2.JobState.RUNNING) for number in range(8)]
+        threads = [threading.Thread(target=self.coalescer.get_state, args=(job,)) for job in jobs + jobs]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sum(len(query) for query in self.session.queries), 8)
+        self.assertTrue(len(self.session.queries) < 8)
+        self.assertEqual(self.coalescer.get_state(jobs[0])[0], drmaa2.JobState.RUNNING)
+        self.assertEqual(sum(len(query) for query in self.session.queries), 8)
+
+    def test_freshness(self):
+        running = self._job('1', drmaa2.JobState.RUNNING)
+        done = self._job('2', drmaa2.JobState.DONE)
+        self.coalescer.get_info(running)
+        self.coalescer.get_info(done)
+        self.session.states['1'] = drmaa2.JobState.DONE
+        self.assertEqual(self.coalescer.get_state(running)[0], drmaa2.JobState.RUNNING)
+        self.now += 2
+        self.assertEqual(self.coalescer.get_state(running)[0], drmaa2.JobState.DONE)
+        self.assertEqual(self.coalescer.get_state(done)[0], drmaa2.JobState.DONE)
+        self.assertEqual(self.session.queries, [['1'], ['2'], ['1']])
+        self.coalescer.invalidate()
+        self.assertEqual(self.coalescer.stats()['cached'], 2)
+        self.coalescer.forget('2')
+        self.assertEqual(self.coalescer.stats()['cached'], 1)
+
+    def test_sequential(self):
+        jobs = [self._job(str(number), drmaa2.JobState.RUNNING) for number in range(5)]
+        self.coalescer.prefetch(jobs)
+        self.assertEqual(self.session.queries, [['0', '1', '2', '3', '4']])
+        polled = jobs[:4]
+        self.now += 0.5
+        self.assertEqual([self.coalescer.get_state(job)[0] for job in polled], [drmaa2.JobState.RUNNING] * 4)
+        self.now += 0.7
+        # The first miss refreshes the outdated jobs asked for recently, without waiting for other queries
+        states = [self.coalescer.get_state(job)[0] for job in polled]
+        self.assertEqual(states, [drmaa2.JobState.RUNNING] * 4)
+        self.assertEqual(self.session.queries[1:], [['0', '1', '2', '3']])
+        self.assertEqual(self.sleeps, [])
+        # The job not asked for since the prefetch was dropped instead
+        self.assertEqual(self.coalescer.stats()['cached'], 4)
+        self.coalescer.prefetch(polled)
+        self.assertEqual(len(self.session.queries), 2)
+        # Jobs no longer polled are neither refreshed nor kept
+        self.now += 2
+        self.coalescer.get_state(jobs[0])
+        self.assertEqual(self.session.queries[2:], [['0']])
+        self.assertEqual(self.coalescer.stats()['cached'], 1)
+
+    def test_local_backend(self):
+        session = status.CoalescingJobSession(local.create_job_session(), window=0)
+        try:
+            template = drmaa2.JobTemplate(remote_command='true')
+            job = session.run_job(template)
+            self.assertIs(job.job_template, template)
+            session.prefetch([job])
+            job.wait_terminated(drmaa2.INFINITE_TIME)
+            self.assertEqual(job.get_state()[0], drmaa2.JobState.DONE)
+            self.assertEqual(job.get_info().exit_status, 0)
+            job.reap()
+            self.assertRaises(drmaa2.InvalidArgumentException, job.get_state)
+            self.assertEqual(session.coalescer.stats()['hits'], 1)
+        finally:
+            session.close()
+            local.destroy_session(session.session_name)
+
+
+class DispatcherTestCase(unittest.TestCase):
+    def setUp(self):
+        self.delivered = []
+        self.gate = threading.Event()
+
+    def _callback(self, notification):
+        self.gate.wait()
+        self.delivered.append(notification)
+
+    def _notification(self, job_id, job_state, event=drmaa2.Event.NEW_STATE):
+        return drmaa2.Notification(event, job_id, 'session', job_state)
+
+    def test_coalesce(self):
+        dispatcher = dispatch.Dispatcher(self._callback, batch_size=1)
+        dispatcher.post(self._notification('0', drmaa2.JobState.QUEUED))
+        for job_state in (drmaa2.JobState.QUEUED, drmaa2.JobState.RUNNING, drmaa2.JobState.DONE):
+            dispatcher.post(self._notification('1', job_state))
+        dispatcher.post(self._notification('2', drmaa2.JobState.RUNNING))
+        self.gate.set()
+        dispatcher.flush()
+        self.assertEqual(dispatcher.stats()['delivered'], len(self.delivered))
+        self.assertEqual(self.delivered[-1], self._notification('2', drmaa2.JobState.RUNNING))
+        self.assertIn(self._notification('1', drmaa2.JobState.DONE), self.delivered)
+        self.assertNotIn(self._notification('1', drmaa2.JobState.RUNNING), self.delivered)
+        dispatcher.close()
+
+    def test_drop(self):
+        dispatcher = dispatch.Dispatcher(self._callback, maxsize=2, batch_size=1, policy=dispatch.DROP_NEWEST)
+        for job_id in range(10):
+            dispatcher.post(self._notification(str(job_id), drmaa2.JobState.DONE))
+        self.gate.set()
+        dispatcher.flush()
+        stats = dispatcher.stats()
+        self.assertEqual(stats['posted'], 10)
+        self.assertEqual(stats['delivered'] + stats['dropped'], 10)
+        self.assertTrue(stats['dropped'] >= 7)
+        self.assertEqual(self.delivered[0].job_id, '0')
+        dispatcher.close()
+
+    def test_flush_timeout(self):
+        dispatcher = dispatch.Dispatcher(self._callback, batch_size=1)
+        for job_id in range(5):
+            dispatcher.post(self._notification(str(job_id), drmaa2.JobState.DONE))
+        self.assertFalse(dispatcher.flush(0.05))
+        # Each delivered batch wakes the flushing thread, which keeps waiting while time remains
+        timer = threading.Timer(0.1, self.gate.set)
+        timer.start()
+        self.assertTrue(dispatcher.flush(10))
+        self.assertEqual(len(self.delivered), 5)
+        timer.join()
+        dispatcher.close()
+
+    def test_local_backend(self):
+        local.register_event_notification(self._callback)
+        self.gate.set()
+        try:
+            session = local.create_job_session()
+            job = session.run_job(drmaa2.JobTemplate(remote_command='true'))
+            job.wait_terminated(drmaa2.INFINITE_TIME)
+            local.get_dispatcher().flush()
+            self.assertIn(drmaa2.Notification(drmaa2.Event.NEW_STATE, job.job_id, session.session_name,
+                                              drmaa2.JobState.DONE), self.delivered)
+            session.close()
+            local.destroy_session(session.session_name)
+        finally:
+            local.register_event_notification(None)
+
+
+@unittest.skipIf(aio is None, "asyncio interface requires Python 3.5 or later")
+class AsyncioTestCase(unittest.TestCase):
+    # The coroutines are driven one by one, async syntax would keep this module from compiling on Python 2
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.run = self.loop.run_until_complete
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_wait_terminated(self):
+        run = self.run
+        session = run(aio.create_job_session(backend=local))
+        slow = run(session.run_job(drmaa2.JobTemplate(remote_command='sleep', args=['60'])))
+        fast = run(session.run_job(drmaa2.JobTemplate(remote_command='true')))
+        self.assertIs(run(session.wait_any_terminated([slow, fast], 10)), fast)
+        self.assertRaises(drmaa2.TimeoutException, run, slow.wait_terminated(drmaa2.ZERO_TIME))
+        self.assertRaises(drmaa2.TimeoutException, run, slow.wait_terminated(0.05))
+        run(slow.terminate())
+        run(slow.wait_terminated(drmaa2.INFINITE_TIME))
+        self.assertEqual(run(slow.get_state())[0], drmaa2.JobState.FAILED)
+        self.assertEqual(len(session.session._state.waiters), 0)
+        run(session.close())
+        run(aio.destroy_session(session.session_name, backend=local))
+
+    def test_lazy_array(self):
+        run = self.run
+        session = run(aio.create_job_session(backend=local))
+        template = drmaa2.JobTemplate(remote_command='true', submit_as_hold=True)
+        array = run(session.run_bulk_jobs(template, 1, 3 * local.BULK_CHUNK_SIZE, 1))
+        self.assertEqual(len(array.jobs), 3 * local.BULK_CHUNK_SIZE)
+        # Wrapping a task does not create the pending ones
+        self.assertEqual(array.jobs[-1].job_id, array.job_array.jobs[-1].job_id)
+        self.assertLess(len(array.job_array._state.jobs), 3 * local.BULK_CHUNK_SIZE)
+        self.assertEqual([job.job_id for job in array.jobs[:2]], [job.job_id for job in array.job_array.jobs[:2]])
+        run(array.terminate())
+        run(session.close())
+        run(aio.destroy_session(session.session_name, backend=local))
+
 if __name__ == '__main__':
     unittest.main()